@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+""" Headless batch scoring for model files saved by the GUI (模型 > 保存模型).
+
+    python batch_score.py model.joblib input.csv -o scored.csv
+    python batch_score.py model.joblib input.parquet -o scored.parquet --keep id --jobs 8
+
+The input is streamed in chunks, checked against the columns the model needs, scored on a thread pool
+and written incrementally, so memory stays bounded by --chunk-rows x --jobs. Output columns match the
+GUI export: `预测_<target>` and, for classifiers, one `概率_<class>` column per class.
+Deliberately imports neither PyQt6 nor matplotlib (fast start on servers).
+"""
+import sys
+import os
+import argparse
+import time
+import collections
+import concurrent.futures
+
+import pandas as pd
+import joblib
+
+from model_input import score_frame # Same model input and output columns as the GUI
+
+DEFAULT_CHUNK_ROWS = 200_000
+
+
+def load_bundle(path):
+    """ Loads and sanity-checks a model bundle; older files without a preprocessor are scored as-is. """
+    bundle = joblib.load(path)
+    if not isinstance(bundle, dict) or 'model' not in bundle or not bundle.get('trained_feature_names'):
+        raise ValueError(f"{path}: 不是有效的模型文件 (缺少 model / trained_feature_names)")
+    bundle.setdefault('preprocessor', None)
+    bundle.setdefault('label_mapping', None)
+    if not bundle.get('input_feature_names'): bundle['input_feature_names'] = bundle['trained_feature_names']
+    return bundle
+
+
+def text_columns(bundle):
+    """ Input columns feeding an encoder. Read as text so a chunk where such a column happens to be empty
+        or all-numeric is not parsed as float and rejected by the fitted encoder. """
+    preprocessor = bundle['preprocessor']
+    if preprocessor is None: return []
+    cols = []
+    for _, transformer, columns in getattr(preprocessor, 'transformers_', []):
+        steps = getattr(transformer, 'named_steps', {})
+        if ('encode' in steps or 'native' in steps) and all(isinstance(c, str) for c in columns): cols += list(columns)
+    return cols
+
+
+def _is_parquet(path): return path.lower().endswith(('.parquet', '.pq'))
+
+
+def input_columns(path):
+    if _is_parquet(path):
+        import pyarrow.parquet as pq
+        return pq.ParquetFile(path).schema_arrow.names
+    return pd.read_csv(path, nrows=0).columns.astype(str).tolist()
+
+
+def read_chunks(path, columns, chunk_rows, text_cols=()):
+    """ Yields DataFrame chunks containing only `columns`. """
+    if _is_parquet(path):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows, columns=columns):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, usecols=columns, chunksize=chunk_rows, dtype={c: 'str' for c in text_cols if c in columns})
+
+
+class ChunkWriter:
+    """ Appends scored chunks to CSV or Parquet (schema fixed by the first chunk). """
+    def __init__(self, path):
+        self.path = path; self._parquet = None; self._first = True
+
+    def write(self, df):
+        if _is_parquet(self.path):
+            import pyarrow as pa, pyarrow.parquet as pq
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._parquet is None: self._parquet = pq.ParquetWriter(self.path, table.schema)
+            else: table = table.cast(self._parquet.schema)
+            self._parquet.write_table(table)
+        else:
+            df.to_csv(self.path, mode='w' if self._first else 'a', header=self._first, index=False)
+        self._first = False
+
+    def close(self):
+        if self._parquet is not None: self._parquet.close()
+
+
+def limit_model_threads(model):
+    """ One thread per model call: parallelism comes from scoring several chunks at once. """
+    estimator = getattr(model, 'steps', [(None, model)])[-1][1]
+    if hasattr(estimator, 'get_params') and 'n_jobs' in estimator.get_params():
+        try: estimator.set_params(n_jobs=1)
+        except Exception: pass
+
+
+def run(args):
+    bundle = load_bundle(args.model)
+    available = input_columns(args.input)
+    missing = [c for c in bundle['input_feature_names'] if c not in available]
+    if missing:
+        print(f"错误: 输入文件缺少模型需要的列: {', '.join(missing)}", file=sys.stderr)
+        return 2
+    if args.predictions_only: keep = []
+    elif args.keep: keep = args.keep
+    else: keep = available
+    unknown = [c for c in keep if c not in available]
+    if unknown:
+        print(f"错误: --keep 指定的列不存在: {', '.join(unknown)}", file=sys.stderr)
+        return 2
+    needed = list(dict.fromkeys(list(bundle['input_feature_names']) + keep))
+    read_cols = [c for c in available if c in set(needed)] # File order; parquet/usecols need existing names
+
+    jobs = max(1, args.jobs)
+    if jobs > 1: limit_model_threads(bundle['model'])
+    print(f"模型: {bundle['model'].__class__.__name__} ({bundle.get('model_type')}), "
+          f"{len(bundle['input_feature_names'])} 个输入列, 预处理: {'有' if bundle['preprocessor'] is not None else '无'}, "
+          f"{jobs} 线程", file=sys.stderr)
+
+    writer = ChunkWriter(args.output)
+    start, n_rows = time.perf_counter(), 0
+    pending = collections.deque() # In-order futures; bounded so memory stays ~ (jobs + 1) chunks
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as pool:
+            for chunk in read_chunks(args.input, read_cols, args.chunk_rows, text_columns(bundle)):
+                pending.append(pool.submit(score_frame, chunk, bundle, keep))
+                while len(pending) > jobs or (pending and pending[0].done()):
+                    n_rows += _write_next(pending, writer)
+                    _report(n_rows, start)
+            while pending:
+                n_rows += _write_next(pending, writer)
+                _report(n_rows, start)
+    finally:
+        writer.close()
+    print(f"\n完成: {n_rows:,} 行 -> {args.output} ({time.perf_counter() - start:.1f}s)", file=sys.stderr)
+    return 0
+
+
+def _write_next(pending, writer):
+    scored = pending.popleft().result()
+    writer.write(scored)
+    return len(scored)
+
+
+def _report(n_rows, start):
+    elapsed = time.perf_counter() - start
+    print(f"\r已评分 {n_rows:,} 行 ({n_rows / max(elapsed, 1e-9):,.0f} 行/秒)", end="", file=sys.stderr, flush=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="使用已保存的 .joblib 模型对 CSV/Parquet 数据批量评分 (无界面)。")
+    parser.add_argument("model", help="GUI 保存的 .joblib 模型文件")
+    parser.add_argument("input", help="输入数据 (.csv / .parquet)")
+    parser.add_argument("-o", "--output", required=True, help="输出文件 (.csv / .parquet)")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS, help=f"每块行数 (默认 {DEFAULT_CHUNK_ROWS:,})")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="并行评分线程数 (默认: CPU 核数)")
+    parser.add_argument("--keep", nargs="+", metavar="COL", help="复制到输出的输入列 (默认: 全部)")
+    parser.add_argument("--predictions-only", action="store_true", help="只输出预测列")
+    args = parser.parse_args(argv)
+    if os.path.abspath(args.input) == os.path.abspath(args.output): parser.error("输出文件不能与输入文件相同")
+    try:
+        return run(args)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"\n错误: {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
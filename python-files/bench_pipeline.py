@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+""" Headless end-to-end benchmark of the ML client's data pipeline: load -> preprocess -> train -> evaluate.
+
+    python bench_pipeline.py                                   # 10k, 1M and 10M rows, all algorithms
+    python bench_pipeline.py --sizes 10k,1m --algorithms rf,lgbm --history bench/pipeline.jsonl
+
+A synthetic dataset with mixed dtypes is generated once per size and seed, as a CSV in --data-dir. The app's
+worker functions are then called directly, without the GUI or the job pool, in the same order the GUI uses:
+_load_data_thread (CSV parse, then again from the dataset cache), _preprocess_data_thread (cold, then again
+with every step served from the step cache, then with sketch-based approximate imputation, then cold and
+column-parallel on all cores), _train_model_thread for each algorithm (split, fit, predict, metrics) and
+_calculate_metrics alone, then with bootstrap confidence intervals (BOOTSTRAP_DEFAULT_RESAMPLES resamples).
+With more than one algorithm, _compare_models_thread finally trains them all concurrently on one shared split.
+The preprocessing page defaults are median imputation, standard scaling and one-hot encoding.
+
+Every stage records wall time, CPU time and peak RSS. CPU time and RSS include child processes such as
+loky CV workers and the killable fit process; psutil is needed for those, otherwise only this process's
+CPU time is recorded. The results are printed as a table, followed by a per-row scaling summary between
+consecutive sizes that flags cliffs. One JSON line per stage is appended to --history.
+"""
+import sys
+import os
+import argparse
+import datetime
+import json
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+try: import psutil
+except ImportError: psutil = None
+
+from bench_startup import load_app_module, git_commit
+
+DATASET_FORMAT = 1 # Bump when make_dataset changes so cached CSVs are regenerated
+DEFAULT_SIZES = "10k,1m,10m"
+DEFAULT_HISTORY = os.path.join("bench_results", "pipeline_history.jsonl")
+CLIFF_FACTOR = 2.0 # Per-row cost growing more than this between consecutive sizes is flagged
+ALGORITHMS = { # CLI key -> (GUI algorithm name, fixed benchmark parameters)
+    'rf': ("随机森林", {'n_estimators': 50, 'max_depth': 12, 'min_samples_split': 2, 'min_samples_leaf': 1}),
+    'mlp': ("神经网络(MLP)", {'hidden_layer_sizes': (64, 32), 'activation': 'relu', 'solver': 'adam', 'alpha': 1e-4, 'max_iter': 20}),
+    'lgbm': ("LightGBM", {'n_estimators': 100, 'learning_rate': 0.1, 'max_depth': -1, 'num_leaves': 31}),
+    'xgb': ("XGBoost", {'n_estimators': 100, 'learning_rate': 0.1, 'max_depth': 6, 'subsample': 1.0, 'colsample_bytree': 1.0}),
+}
+PREPROCESS_PARAMS = {'impute_strategy': "中位数 (Median)", 'impute_constant': None,
+                     'scale_strategy': "标准化 (StandardScaler)", 'encode_strategy': "独热编码 (One-Hot)"}
+
+
+class _Signal:
+    """ Stand-in for the Worker signals; prints status messages with --verbose. """
+    def __init__(self, verbose=False): self.verbose = verbose
+
+    def emit(self, value):
+        if self.verbose and isinstance(value, str): print(f"    {value}", file=sys.stderr)
+
+
+def parse_size(text):
+    text = text.strip().lower()
+    factor = {'k': 1_000, 'm': 1_000_000}.get(text[-1:], 1)
+    return int(float(text[:-1] if factor > 1 else text) * factor)
+
+
+def make_dataset(n_rows, task, seed):
+    """ Mixed-dtype frame: skewed floats with missing values, ints, a bool, a 5-level and a 200-level text column. """
+    rng = np.random.default_rng(seed)
+    num_a = rng.normal(size=n_rows)
+    num_b = rng.lognormal(size=n_rows)
+    int_c = rng.integers(0, 1000, n_rows)
+    flag = rng.random(n_rows) < 0.3
+    region = rng.choice(np.array(["north", "south", "east", "west", "center"]), n_rows)
+    product = np.char.add("p", rng.integers(0, 200, n_rows).astype(str))
+    signal = num_a + np.log1p(num_b) - int_c / 500 + flag + (region == "north") + rng.normal(scale=0.5, size=n_rows)
+    df = pd.DataFrame({'num_a': num_a, 'num_b': num_b, 'int_c': int_c, 'flag': flag, 'region': region, 'product': product})
+    df.loc[rng.random(n_rows) < 0.05, 'num_a'] = np.nan
+    df.loc[rng.random(n_rows) < 0.02, 'region'] = None
+    df['target'] = np.where(signal > np.median(signal), "yes", "no") if task == 'classification' else signal
+    return df
+
+
+def dataset_path(data_dir, n_rows, task, seed):
+    """ CSV for (size, task, seed), generated on first use. """
+    path = os.path.join(data_dir, f"pipeline_{task}_{n_rows}_s{seed}_v{DATASET_FORMAT}.csv")
+    if not os.path.exists(path):
+        print(f"生成 {n_rows:,} 行数据 -> {path}", file=sys.stderr)
+        os.makedirs(data_dir, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        make_dataset(n_rows, task, seed).to_csv(tmp_path, index=False)
+        os.replace(tmp_path, path)
+    return path
+
+
+class StageMeter:
+    """ Wall time, CPU time and peak RSS of a block. A sampler thread polls RSS and per-process CPU time of
+        this process and all its descendants (psutil), so work done in loky/fit child processes counts. """
+    def __init__(self, interval=0.02):
+        self.interval = interval
+        self._proc = psutil.Process() if psutil else None
+        self._stop = threading.Event()
+        self.cpu_start, self.cpu_last = {}, {} # pid -> user+system seconds
+        self.rss_start = self.rss_peak = None
+
+    def _processes(self):
+        try: return [self._proc] + self._proc.children(recursive=True)
+        except psutil.Error: return [self._proc]
+
+    def _sample(self, first=False):
+        rss = 0
+        for p in self._processes():
+            try:
+                times = p.cpu_times(); rss += p.memory_info().rss
+            except psutil.Error: continue # Exited between listing and sampling
+            if first: self.cpu_start[p.pid] = times.user + times.system
+            self.cpu_last[p.pid] = times.user + times.system
+        self.rss_peak = max(self.rss_peak or 0, rss)
+        return rss
+
+    def _run(self):
+        while not self._stop.wait(self.interval): self._sample()
+
+    def __enter__(self):
+        self.wall_start, self.process_start = time.perf_counter(), time.process_time()
+        if self._proc is not None:
+            self.rss_start = self._sample(first=True)
+            self._thread = threading.Thread(target=self._run, daemon=True); self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.wall = time.perf_counter() - self.wall_start
+        if self._proc is None:
+            self.cpu = time.process_time() - self.process_start
+        else:
+            self._stop.set(); self._thread.join(); self._sample()
+            self.cpu = sum(last - self.cpu_start.get(pid, 0.0) for pid, last in self.cpu_last.items())
+        return False
+
+    def record(self, **fields):
+        cores = os.cpu_count() or 1
+        mb = lambda b: None if b is None else round(b / 1024**2, 1)
+        return {**fields, 'wall_s': round(self.wall, 4), 'cpu_s': round(self.cpu, 4),
+                'cpu_util_pct': round(100 * self.cpu / max(self.wall, 1e-9) / cores, 1),
+                'peak_rss_mb': mb(self.rss_peak), 'rss_delta_mb': mb(None if self.rss_peak is None else self.rss_peak - self.rss_start)}
+
+
+def run_size(app, n_rows, args, signal):
+    """ Runs every stage for one dataset size; returns the stage records. """
+    csv_path = dataset_path(args.data_dir, n_rows, args.task, args.seed)
+    cls = app.MLClientApp
+    records = []
+
+    def measured(stage, algorithm, func):
+        print(f"  {n_rows:>10,}  {stage:<22}{algorithm or ''}", file=sys.stderr)
+        with StageMeter() as meter: result = func()
+        records.append(meter.record(rows=n_rows, stage=stage, algorithm=algorithm))
+        return result
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        app.dataset_cache = app.DatasetCache(cache_dir=cache_dir) # Never touch the user's dataset cache
+        df, _ = measured("load", None, lambda: cls._load_data_thread(signal, signal, csv_path))
+        df, _ = measured("load (cached)", None, lambda: cls._load_data_thread(signal, signal, csv_path))
+        features = [c for c in df.columns if c != 'target']
+        params = {**PREPROCESS_PARAMS, 'selected_cols': features}
+        app.PREPROCESS_CACHE_DIR = os.path.join(cache_dir, "preprocess") # ...nor its preprocessing step cache
+        measured("preprocess", None, lambda: cls._preprocess_data_thread(signal, signal, df, params))
+        processed, preprocessor, _ = measured("preprocess (cached)", None, lambda: cls._preprocess_data_thread(signal, signal, df, params))
+        approx_params = {**params, 'impute_approx_error': app.APPROX_IMPUTE_DEFAULT_ERROR}
+        measured("preprocess (approx)", None, lambda: cls._preprocess_data_thread(signal, signal, df, approx_params))
+        app.PREPROCESS_CACHE_DIR = os.path.join(cache_dir, "preprocess-parallel") # Cold again
+        parallel_params = {**params, 'parallel_jobs': os.cpu_count() or 1}
+        measured("preprocess (parallel)", None, lambda: cls._preprocess_data_thread(signal, signal, df, parallel_params))
+    model_features = [c for c in processed.columns if c != 'target']
+
+    compared = {}
+    for key in args.algorithms:
+        algo_name, algo_params = ALGORITHMS[key]
+        if key == 'rf': algo_params = {**algo_params, 'criterion': 'gini' if args.task == 'classification' else 'squared_error'}
+        if (key == 'lgbm' and not app.lgb) or (key == 'xgb' and not app.xgb):
+            print(f"  跳过 {algo_name}: 未安装", file=sys.stderr); continue
+        compared[key] = (algo_name, algo_params)
+        result = measured("train", key, lambda: cls._train_model_thread(
+            signal, signal, processed, model_features, 'target', algo_name, algo_params, args.cv > 1, args.cv, df, preprocessor))
+        measured("metrics", key, lambda: cls._calculate_metrics(
+            result['y_test'], result['y_pred'], result['y_pred_proba'], result['model_type'], signal))
+        measured("metrics (bootstrap)", key, lambda: cls._evaluate(
+            result['y_test'], result['y_pred'], result['y_pred_proba'], result['model_type'], signal, app.BOOTSTRAP_DEFAULT_RESAMPLES))
+        del result
+    if len(compared) > 1:
+        measured("compare", "+".join(compared), lambda: cls._compare_models_thread(
+            signal, signal, processed, model_features, 'target', dict(compared.values()), None, df, preprocessor))
+    return records
+
+
+def print_table(records):
+    print(f"{'rows':>11}  {'stage':<22}{'algorithm':<17}{'wall s':>9}{'CPU s':>9}{'CPU %':>7}{'peak MB':>9}{'+MB':>8}{'rows/s':>12}")
+    for r in records:
+        peak = '-' if r['peak_rss_mb'] is None else f"{r['peak_rss_mb']:.0f}"
+        delta = '-' if r['rss_delta_mb'] is None else f"{r['rss_delta_mb']:.0f}"
+        print(f"{r['rows']:>11,}  {r['stage']:<22}{r['algorithm'] or '':<17}{r['wall_s']:>9.2f}{r['cpu_s']:>9.2f}"
+              f"{r['cpu_util_pct']:>7.0f}{peak:>9}{delta:>8}{r['rows'] / max(r['wall_s'], 1e-9):>12,.0f}")
+
+
+def print_scaling(records):
+    """ Per-row wall time between consecutive sizes of each (stage, algorithm); > CLIFF_FACTOR is flagged. """
+    series = {}
+    for r in records: series.setdefault((r['stage'], r['algorithm']), []).append(r)
+    lines = []
+    for (stage, algorithm), runs in series.items():
+        runs = sorted(runs, key=lambda r: r['rows'])
+        for small, large in zip(runs, runs[1:]):
+            per_row = (large['wall_s'] / large['rows']) / max(small['wall_s'] / small['rows'], 1e-12)
+            flag = "  << 扩展性断崖" if per_row > CLIFF_FACTOR else ""
+            lines.append(f"  {stage + (' / ' + algorithm if algorithm else ''):<28}{small['rows']:>11,} -> {large['rows']:<11,}"
+                         f" 每行耗时 x{per_row:.2f}{flag}")
+    if lines: print("\n扩展性 (每行耗时相对上一规模):"); print("\n".join(lines))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ML 客户端数据流水线基准 (加载 -> 预处理 -> 训练 -> 评估, 无界面)。")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help=f"数据行数, 逗号分隔 (默认 {DEFAULT_SIZES})")
+    parser.add_argument("--algorithms", default=",".join(ALGORITHMS), help=f"算法: {', '.join(ALGORITHMS)} (默认: 全部)")
+    parser.add_argument("--task", choices=("classification", "regression"), default="classification")
+    parser.add_argument("--cv", type=int, default=0, help="交叉验证折数 (默认 0: 只做单次拆分)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "mlclient_bench_data"), help="合成数据缓存目录")
+    parser.add_argument("--history", default=DEFAULT_HISTORY, help=f"追加结果的 JSONL 文件 (默认 {DEFAULT_HISTORY}; 空字符串不写)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="显示各阶段状态信息")
+    args = parser.parse_args(argv)
+    sizes = [parse_size(s) for s in args.sizes.split(",") if s.strip()]
+    args.algorithms = [a.strip() for a in args.algorithms.split(",") if a.strip()]
+    unknown = [a for a in args.algorithms if a not in ALGORITHMS]
+    if unknown: parser.error(f"未知算法: {', '.join(unknown)}")
+    if psutil is None: print("Warning: psutil not installed. Peak RSS and child-process CPU time are not recorded.", file=sys.stderr)
+
+    app = load_app_module()
+    app.warm_imports(None, None) # Import cost belongs to startup (bench_startup.py), not to the first stage
+    signal = _Signal(args.verbose)
+    run_id = datetime.datetime.now().isoformat(timespec='seconds')
+    meta = {'run': run_id, 'commit': git_commit(), 'app_version': app.VERSION, 'task': args.task, 'cv': args.cv,
+            'seed': args.seed, 'cpu_count': os.cpu_count(), 'python': sys.version.split()[0]}
+    records = []
+    for n_rows in sizes:
+        records += run_size(app, n_rows, args, signal)
+
+    print_table(records)
+    print_scaling(records)
+    if args.history:
+        os.makedirs(os.path.dirname(os.path.abspath(args.history)), exist_ok=True)
+        with open(args.history, 'a', encoding='utf-8') as f:
+            for r in records: f.write(json.dumps({**meta, **r}, ensure_ascii=False) + "\n")
+        print(f"\n结果已追加到 {args.history}", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+""" Startup benchmark for the ML client GUI. Runs offscreen, so no display is needed.
+
+    python bench_startup.py -o bench/startup-new.json
+    python bench_startup.py --baseline bench/startup-old.json -o bench/startup-new.json
+
+Cold start runs the real app (--startup-report --exit-after-startup) in fresh processes and keeps the median
+of every phase: imports, main window, first paint, remaining pages, background imports. The in-process part
+times MLClientApp.__init__, each _create_*_page builder, a theme switch and _update_icons on one window, with
+the job pool disabled and the ML stack already imported (both are covered by the cold start).
+Results are written as JSON. --baseline compares against an earlier file; a benchmark regresses when its
+median is more than --threshold slower (relative) and more than --min-delta-ms slower (absolute, filters timer
+noise on sub-millisecond steps). Exit code 1 on regression.
+"""
+import sys
+import os
+import argparse
+import datetime
+import importlib.util
+import json
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+
+APP_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "第三版（定稿）.py")
+PAGE_BUILDERS = ('_create_welcome_page', '_create_preview_page', '_create_preprocess_page',
+                 '_create_config_page', '_create_model_page', '_create_results_page')
+DEFAULT_THRESHOLD = 0.20
+DEFAULT_MIN_DELTA_MS = 5.0
+
+
+def _stats(samples_ms):
+    return {'median_ms': round(statistics.median(samples_ms), 2), 'min_ms': round(min(samples_ms), 2),
+            'first_ms': round(samples_ms[0], 2), 'runs': len(samples_ms)}
+
+
+def cold_start(repeat):
+    """ Median startup phases of `repeat` fresh app processes (ms since the script started). """
+    env = dict(os.environ, QT_QPA_PLATFORM='offscreen')
+    runs = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for i in range(repeat):
+            report_path = os.path.join(tmp, f"startup{i}.json")
+            proc = subprocess.run([sys.executable, APP_FILE, '--startup-report', report_path, '--exit-after-startup'],
+                                  env=env, capture_output=True, text=True, encoding='utf-8', errors='replace', timeout=600)
+            if proc.returncode != 0 or not os.path.exists(report_path):
+                raise RuntimeError(f"app exited with code {proc.returncode}:\n{proc.stderr[-2000:]}")
+            with open(report_path, encoding='utf-8') as f: runs.append(json.load(f))
+            print(f"\r冷启动 {i + 1}/{repeat}", end="", file=sys.stderr, flush=True)
+    print(file=sys.stderr)
+    results = {}
+    for phase in runs[0]['phases_ms']:
+        results[f"cold_start/{phase}"] = _stats([run['phases_ms'][phase] for run in runs if phase in run['phases_ms']])
+    return results, runs[-1]['app_version']
+
+
+def load_app_module():
+    spec = importlib.util.spec_from_file_location("mlclient_app", APP_FILE)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def in_process(repeat):
+    """ Times window construction, page builders, theme switch and icon refresh in this process. """
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    app_module = load_app_module()
+    app_module.JOB_POOL_WORKERS = 0 # GUI code only; spawning workers is part of the cold start
+    app_module.warm_imports(None, None, app_module.GUI_WARM_IMPORTS)
+    from PyQt6.QtWidgets import QApplication
+    from PyQt6.QtCore import QEvent
+    qapp = QApplication.instance() or QApplication(sys.argv[:1])
+    results, keep = {}, [] # Built pages stay alive: the window's attributes point into the newest ones
+
+    def timed(name, func):
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            keep.append(func())
+            samples.append(1000 * (time.perf_counter() - start))
+            qapp.processEvents()
+        results[name] = _stats(samples)
+
+    def discard(windows):
+        for w in windows: w.close(); w.deleteLater()
+        qapp.sendPostedEvents(None, QEvent.Type.DeferredDelete.value)
+
+    windows = []
+    timed("MLClientApp.__init__", lambda: windows.append(app_module.MLClientApp()))
+    discard(windows[:-1]) # Theme cost scales with the number of live widgets: measure on one window
+    window = windows[-1]
+    window._build_pages()
+    themes = iter(("dark", "light") * repeat)
+    timed("set_theme (switch)", lambda: window.set_theme(next(themes)))
+    timed("_update_icons", window._update_icons)
+    for builder in PAGE_BUILDERS:
+        timed(f"page/{builder}", getattr(window, builder))
+    discard([window])
+    return results
+
+
+def git_commit():
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=os.path.dirname(APP_FILE),
+                             capture_output=True, text=True, timeout=10)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(baseline, current, threshold, min_delta_ms):
+    """ Prints a baseline/current table; returns the names of regressed benchmarks. """
+    regressions = []
+    print(f"{'benchmark':<40}{'baseline':>11}{'current':>11}{'change':>9}")
+    for name, stats in current['benchmarks'].items():
+        base = baseline['benchmarks'].get(name)
+        if base is None:
+            print(f"{name:<40}{'-':>11}{stats['median_ms']:>11.1f}{'new':>9}"); continue
+        before, after = base['median_ms'], stats['median_ms']
+        change = (after - before) / before if before > 0 else 0.0
+        regressed = after - before > min_delta_ms and change > threshold
+        if regressed: regressions.append(name)
+        print(f"{name:<40}{before:>11.1f}{after:>11.1f}{change:>+9.0%}{'  << 回归' if regressed else ''}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ML 客户端启动性能基准 (离屏运行)。")
+    parser.add_argument("-o", "--output", help="结果 JSON 文件")
+    parser.add_argument("--baseline", help="与之比较的历史结果 JSON; 有回归时退出码为 1")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help=f"相对变慢阈值 (默认 {DEFAULT_THRESHOLD:.0%})")
+    parser.add_argument("--min-delta-ms", type=float, default=DEFAULT_MIN_DELTA_MS, help=f"绝对变慢阈值 (默认 {DEFAULT_MIN_DELTA_MS} ms)")
+    parser.add_argument("--cold-repeat", type=int, default=3, help="冷启动进程数 (默认 3)")
+    parser.add_argument("--repeat", type=int, default=10, help="进程内每项重复次数 (默认 10)")
+    parser.add_argument("--skip-cold", action="store_true", help="只运行进程内基准")
+    args = parser.parse_args(argv)
+
+    benchmarks, app_version = {}, None
+    if not args.skip_cold:
+        cold, app_version = cold_start(max(1, args.cold_repeat))
+        benchmarks.update(cold)
+    benchmarks.update(in_process(max(1, args.repeat)))
+    result = {'meta': {'timestamp': datetime.datetime.now().isoformat(timespec='seconds'), 'commit': git_commit(),
+                       'app_version': app_version or sys.modules['mlclient_app'].VERSION, 'python': platform.python_version(),
+                       'platform': platform.platform(), 'cpu_count': os.cpu_count(),
+                       'cold_repeat': 0 if args.skip_cold else args.cold_repeat, 'repeat': args.repeat},
+              'benchmarks': benchmarks}
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f: json.dump(result, f, indent=2, ensure_ascii=False)
+    if not args.baseline:
+        print(f"{'benchmark':<40}{'median':>11}{'min':>11}{'first':>11}")
+        for name, stats in benchmarks.items():
+            print(f"{name:<40}{stats['median_ms']:>11.1f}{stats['min_ms']:>11.1f}{stats['first_ms']:>11.1f}")
+        return 0
+    with open(args.baseline, encoding='utf-8') as f: baseline = json.load(f)
+    regressions = compare(baseline, result, args.threshold, args.min_delta_ms)
+    if regressions:
+        print(f"\n{len(regressions)} 项回归 (>{args.threshold:.0%} 且 >{args.min_delta_ms} ms): {', '.join(regressions)}", file=sys.stderr)
+        return 1
+    print("\n无回归。", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
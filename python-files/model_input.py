@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+""" Fitted preprocessor output -> model input, shared by the GUI and batch_score.py.
+
+    native_categories       {column: levels} of the fitted 'native' encoder steps
+    to_native_categorical   ordinal codes of those columns -> category dtype (LightGBM / XGBoost)
+    select_features         model input columns in training order (DataFrame or CSR matrix)
+    prepare_model_input     raw data -> model input for a saved model bundle
+    score_frame             raw data -> `预测_<target>` / `概率_<class>` output columns (GUI export and batch_score)
+
+Kept in its own Qt-free module so that headless scoring builds exactly the same input as training did.
+"""
+import numpy as np
+import pandas as pd
+
+
+def native_categories(preprocessor):
+    """ {column: levels} of the fitted 'native' steps of a preprocessor (empty for None / other encodings). """
+    levels = {}
+    for _, transformer, cols in getattr(preprocessor, 'transformers_', []):
+        encoder = getattr(transformer, 'named_steps', {}).get('native')
+        if encoder is not None:
+            categories = encoder.categories_[0]
+            levels[cols[0]] = categories[:-1] if len(categories) and pd.isna(categories[-1]) else categories # Missing is not a level
+    return levels
+
+
+def to_native_categorical(transformed: pd.DataFrame, preprocessor):
+    """ Turns the ordinal codes of 'native' columns back into category dtype with the fitted levels, so LightGBM /
+        XGBoost split on them as categories. Codes and levels come from the same fit: train and predict agree. """
+    for col, levels in native_categories(preprocessor).items():
+        if col in transformed.columns:
+            codes = transformed[col].to_numpy(dtype=float, na_value=np.nan)
+            transformed[col] = pd.Categorical.from_codes(np.where(np.isnan(codes), -1, codes).astype(np.int64), categories=levels)
+    return transformed
+
+
+def select_features(transformed: pd.DataFrame, features, preprocessor=None):
+    """ Model input columns in training order; one-hot levels unseen when the preprocessor was fitted are 0.
+        Columns of the fitted `preprocessor`'s 'native' steps are cast to category dtype. Sparse output of a
+        preprocessor in sparse mode (see with_sparse_onehot) stays a CSR matrix with columns picked by name. """
+    if hasattr(transformed, 'tocsr'):
+        from scipy import sparse
+        position = {name: i for i, name in enumerate(preprocessor.get_feature_names_out())}
+        missing = transformed.shape[1] # Index of an all-zero column appended for unseen levels
+        columns = [position.get(f, missing) for f in features]
+        if missing in columns: transformed = sparse.hstack([transformed, sparse.csr_matrix((transformed.shape[0], 1))])
+        return transformed.tocsr()[:, columns]
+    return to_native_categorical(transformed.reindex(columns=list(features), fill_value=0), preprocessor)
+
+
+def prepare_model_input(df: pd.DataFrame, bundle):
+    """ Raw (or already processed) data -> model input for a model bundle (see MLClientApp._model_bundle). """
+    preprocessor = bundle.get('preprocessor')
+    if preprocessor is None: return df[bundle['trained_feature_names']]
+    return select_features(preprocessor.transform(df[bundle['input_feature_names']]), bundle['trained_feature_names'], preprocessor)
+
+
+def score_frame(df: pd.DataFrame, bundle, keep=None):
+    """ Predictions (and, for classifiers, one `概率_<class>` column per class) for a model bundle, behind the
+        input columns in `keep` (all of them if None). Labels are mapped back through the bundle's label_mapping. """
+    model, label_mapping = bundle['model'], bundle.get('label_mapping')
+    X = prepare_model_input(df, bundle)
+    pred = model.predict(X)
+    out = (df if keep is None else df[keep]).copy(deep=False)
+    target = bundle.get('target_name') or "target"
+    out[f"预测_{target}"] = np.asarray(label_mapping, dtype=object)[pred.astype(int)] if label_mapping is not None else pred
+    if bundle.get('model_type') == 'classification' and hasattr(model, "predict_proba"):
+        classes = label_mapping if label_mapping is not None else list(getattr(model, 'classes_', []))
+        for i, proba in enumerate(model.predict_proba(X).T):
+            out[f"概率_{classes[i] if i < len(classes) else i}"] = proba
+    return out
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+""" Streaming sketches for approximate imputation statistics on very large columns.
+
+    QuantileSketch        quantiles (median) with a guaranteed rank error
+    FrequentItemsSketch   most frequent value (Misra-Gries) with a guaranteed count error
+    ApproxImputer         SimpleImputer-like transformer ('median' / 'most_frequent') fitted from the sketches
+
+Columns are fed in chunks of `chunk_rows`; each sketch keeps O(log(n) / error) values instead of sorting or
+counting the whole column. Tolerances, with n the non-missing values of a column and e = `error`:
+  median        the returned value has a rank within e*n of n/2 (it lies between the (0.5-e) and (0.5+e) quantiles)
+  most_frequent the returned value occurs at most e*n times less often than the true mode
+Both bounds are deterministic; the fitted ApproxImputer records the bound actually reached per column in
+`error_bounds_` (usually far below e). Kept in its own module so that fitted preprocessors pickled into
+model files can be loaded by batch_score.py as well as by the GUI.
+"""
+import math
+
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator, TransformerMixin
+
+DEFAULT_ERROR = 0.001
+DEFAULT_CHUNK_ROWS = 1_000_000
+
+
+class QuantileSketch:
+    """ Deterministic compactor sketch (the KLL/MRL family without randomisation). Level h holds values of
+        weight 2**h; a level over 2*k values is sorted and every other value moves up one level, which
+        shifts any rank by at most 2**h. `k` is sized from `expected_n` so the accumulated shift stays
+        within error * n; rank_error() reports the bound actually reached. """
+    def __init__(self, error=DEFAULT_ERROR, expected_n=10**9):
+        self.k = max(64, math.ceil(math.log2(max(expected_n, 2)) / (2 * error)))
+        self.levels = [np.empty(0)]
+        self.n = 0
+        self.shift = 0 # Sum of compaction weights: bound on the absolute rank error
+        self._offsets = [0]
+
+    def update(self, values):
+        """ Adds a chunk of non-missing numeric values. """
+        values = np.asarray(values, dtype=np.float64)
+        if not len(values): return
+        self.n += len(values)
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        h = 0
+        while h < len(self.levels):
+            if len(self.levels[h]) > 2 * self.k: self._compact(h)
+            h += 1
+
+    def _compact(self, h):
+        buf = np.sort(self.levels[h])
+        if len(buf) % 2: buf, rest = buf[:-1], buf[-1:] # An odd value out stays on this level
+        else: rest = np.empty(0)
+        if h + 1 == len(self.levels): self.levels.append(np.empty(0)); self._offsets.append(0)
+        self.levels[h + 1] = np.concatenate([self.levels[h + 1], buf[self._offsets[h]::2]])
+        self._offsets[h] ^= 1 # Alternate kept halves so the shifts do not all point the same way
+        self.levels[h] = rest
+        self.shift += 2 ** h
+
+    def quantile(self, q):
+        """ Value whose sketch rank is q * n (NaN for an empty sketch). """
+        if not self.n: return np.nan
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(level), 2.0 ** h) for h, level in enumerate(self.levels)])
+        order = np.argsort(values, kind='stable')
+        cumulative = np.cumsum(weights[order])
+        return float(values[order][min(np.searchsorted(cumulative, q * cumulative[-1]), len(values) - 1)])
+
+    def rank_error(self):
+        """ Guaranteed |sketch rank - true rank| as a fraction of n. """
+        return self.shift / self.n if self.n else 0.0
+
+
+class FrequentItemsSketch:
+    """ Mergeable Misra-Gries summary with `capacity` = ceil(1 / error) counters. A chunk is counted exactly
+        (np.unique for numbers, value_counts otherwise), reduced and merged in; a reduction subtracts the
+        (capacity+1)-th largest count from all counts and drops the non-positive ones. Counts are
+        underestimated by at most count_error() * n <= n / (capacity + 1). """
+    def __init__(self, error=DEFAULT_ERROR):
+        self.capacity = max(1, math.ceil(1 / error))
+        self.counts = pd.Series(dtype=np.float64)
+        self.n = 0
+        self.decrement = 0.0
+
+    def update(self, values):
+        """ Adds a chunk of non-missing values (any hashable dtype). """
+        if not len(values): return
+        self.n += len(values)
+        if isinstance(values, np.ndarray) and values.dtype.kind in 'biuf':
+            keys, counts = np.unique(values, return_counts=True)
+            chunk = pd.Series(counts.astype(np.float64), index=keys)
+        else:
+            chunk = pd.Series(values).value_counts(sort=False).astype(np.float64)
+        chunk = self._reduce(chunk) # Both sides at most `capacity` long before the index union
+        self.counts = self._reduce(self.counts.add(chunk, fill_value=0) if len(self.counts) else chunk)
+
+    def _reduce(self, counts):
+        if len(counts) <= self.capacity: return counts
+        values = counts.to_numpy()
+        cut = np.partition(values, len(values) - self.capacity - 1)[len(values) - self.capacity - 1]
+        self.decrement += cut
+        return counts[values > cut] - cut
+
+    def most_frequent(self):
+        """ Value with the largest (under-)estimated count; ties go to the smallest value, as in SimpleImputer. """
+        if not len(self.counts): return np.nan
+        top = self.counts[self.counts == self.counts.max()].index
+        try: return min(top)
+        except TypeError: return top[0]
+
+    def count_error(self):
+        """ Guaranteed count underestimate as a fraction of n. """
+        return self.decrement / self.n if self.n else 0.0
+
+
+class ApproxImputer(TransformerMixin, BaseEstimator):
+    """ Fills missing values with the approximate median or most frequent value of each column, computed
+        chunk-wise with QuantileSketch / FrequentItemsSketch (see the module docstring for the tolerance).
+        Like SimpleImputer(keep_empty_features=True), an all-missing column is filled with 0. Output keeps
+        the input type (DataFrame in, DataFrame out). """
+    def __init__(self, strategy='median', error=DEFAULT_ERROR, chunk_rows=DEFAULT_CHUNK_ROWS):
+        self.strategy = strategy
+        self.error = error
+        self.chunk_rows = chunk_rows
+
+    def fit(self, X, y=None):
+        if self.strategy not in ('median', 'most_frequent'): raise ValueError(f"ApproxImputer: unknown strategy {self.strategy!r}")
+        frame = X if isinstance(X, pd.DataFrame) else pd.DataFrame(X)
+        if isinstance(X, pd.DataFrame): self.feature_names_in_ = np.asarray(X.columns, dtype=object)
+        self.n_features_in_ = frame.shape[1]
+        statistics, bounds = [], []
+        for col in frame.columns:
+            column = frame[col]
+            if self.strategy == 'median':
+                if not pd.api.types.is_numeric_dtype(column): raise ValueError(f"ApproxImputer: median needs a numeric column, got {column.dtype} ({col})")
+                sketch = QuantileSketch(self.error, expected_n=len(column))
+            else:
+                sketch = FrequentItemsSketch(self.error)
+            for start in range(0, len(column), self.chunk_rows):
+                chunk = column.iloc[start:start + self.chunk_rows].dropna()
+                sketch.update(chunk.to_numpy() if pd.api.types.is_numeric_dtype(chunk) and not isinstance(chunk.dtype, pd.CategoricalDtype) else chunk)
+            if self.strategy == 'median': value, bound = sketch.quantile(0.5), sketch.rank_error()
+            else: value, bound = sketch.most_frequent(), sketch.count_error()
+            statistics.append(0 if sketch.n == 0 else value)
+            bounds.append(bound)
+        self.statistics_ = np.asarray(statistics, dtype=object if self.strategy == 'most_frequent' else np.float64)
+        self.error_bounds_ = np.asarray(bounds)
+        return self
+
+    def transform(self, X):
+        if isinstance(X, pd.DataFrame):
+            return X.fillna({col: value for col, value in zip(X.columns, self.statistics_)})
+        X = np.array(X, dtype=object if self.statistics_.dtype == object else np.float64)
+        missing = pd.isna(X)
+        X[missing] = np.broadcast_to(self.statistics_, X.shape)[missing]
+        return X
+
+    def get_feature_names_out(self, input_features=None):
+        if input_features is not None: return np.asarray(input_features, dtype=object)
+        if hasattr(self, 'feature_names_in_'): return self.feature_names_in_
+        return np.asarray([f"x{i}" for i in range(self.n_features_in_)], dtype=object)
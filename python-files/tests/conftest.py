@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+""" Shared setup: the scripts in python-files/ are importable and the GUI module is loaded once, offscreen. """
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+
+class Signal:
+    """ Stand-in for the progress/status signals worker functions emit to. """
+    def __init__(self): self.values = []
+
+    def emit(self, *args): self.values.append(args[0] if len(args) == 1 else args)
+
+
+@pytest.fixture(scope='session')
+def app():
+    from bench_startup import load_app_module
+    return sys.modules.get('mlclient_app') or load_app_module()
+
+
+@pytest.fixture
+def signal(): return Signal()
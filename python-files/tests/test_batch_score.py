@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+""" batch_score.py writes the same prediction / probability columns as the GUI export (_predict_thread). """
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import LinearRegression, LogisticRegression
+
+import batch_score
+
+
+def _frame(n=700):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({'id': np.arange(n), 'a': rng.random(n), 'b': np.where(np.arange(n) % 7 == 0, np.nan, rng.random(n)),
+                       'c': rng.choice(['x', 'y', 'z'], n).astype(object)})
+    df['label'] = np.where(df['a'] + (df['c'] == 'x') > 1, 'yes', 'no')
+    df['amount'] = 3 * df['a'] + (df['c'] == 'y') + rng.normal(0, 0.1, n)
+    return df
+
+
+def _bundle(app, signal, df, model_type):
+    """ A bundle as MLClientApp._model_bundle saves it: fitted preprocessor, model on its output, label mapping. """
+    params = {'selected_cols': ['a', 'b', 'c'], 'impute_strategy': "中位数 (Median)", 'impute_constant': None,
+              'scale_strategy': "标准化 (StandardScaler)", 'encode_strategy': "独热编码 (One-Hot)"}
+    processed, preprocessor, _ = app.MLClientApp._preprocess_data_thread(signal, signal, df[['a', 'b', 'c']], params)
+    features = list(processed.columns)
+    if model_type == 'classification':
+        label_mapping = sorted(df['label'].unique())
+        model = LogisticRegression().fit(processed[features], df['label'].map(label_mapping.index))
+        target = 'label'
+    else:
+        label_mapping, model, target = None, LinearRegression().fit(processed[features], df['amount']), 'amount'
+    return {'model': model, 'trained_feature_names': features, 'input_feature_names': ['a', 'b', 'c'],
+            'preprocessor': preprocessor, 'label_mapping': label_mapping, 'target_name': target, 'model_type': model_type}
+
+
+@pytest.mark.parametrize("model_type", ['classification', 'regression'])
+@pytest.mark.parametrize("input_format", ['csv', 'parquet'])
+def test_cli_matches_gui_export(app, signal, tmp_path, monkeypatch, model_type, input_format):
+    if input_format == 'parquet': pytest.importorskip('pyarrow')
+    df = _frame()
+    bundle = _bundle(app, signal, df, model_type)
+    model_path = tmp_path / "model.joblib"
+    joblib.dump(bundle, model_path)
+    data = df[['id', 'a', 'b', 'c']]
+    input_path = tmp_path / f"input.{input_format}"
+    if input_format == 'csv': data.to_csv(input_path, index=False)
+    else: data.to_parquet(input_path, index=False)
+
+    monkeypatch.setattr(app, 'PREDICT_CHUNK_ROWS', 250) # Several chunks on both sides, split differently
+    gui_path = tmp_path / "gui.csv"
+    assert app.MLClientApp._predict_thread(signal, signal, data, bundle, str(gui_path)) == len(data)
+    cli_path = tmp_path / "cli.csv"
+    assert batch_score.main([str(model_path), str(input_path), '-o', str(cli_path), '--chunk-rows', '170', '--jobs', '2']) == 0
+
+    gui, cli = pd.read_csv(gui_path), pd.read_csv(cli_path)
+    expected = ['id', 'a', 'b', 'c', f"预测_{bundle['target_name']}"]
+    if model_type == 'classification': expected += ["概率_no", "概率_yes"]
+    assert list(gui.columns) == expected
+    pd.testing.assert_frame_equal(cli, gui)
+
+
+def test_keep_and_predictions_only(app, signal, tmp_path):
+    df = _frame(200)
+    bundle = _bundle(app, signal, df, 'classification')
+    model_path, input_path = tmp_path / "model.joblib", tmp_path / "input.csv"
+    joblib.dump(bundle, model_path); df.to_csv(input_path, index=False)
+    assert batch_score.main([str(model_path), str(input_path), '-o', str(tmp_path / "keep.csv"), '--keep', 'id']) == 0
+    assert list(pd.read_csv(tmp_path / "keep.csv").columns) == ['id', "预测_label", "概率_no", "概率_yes"]
+    assert batch_score.main([str(model_path), str(input_path), '-o', str(tmp_path / "only.csv"), '--predictions-only']) == 0
+    assert list(pd.read_csv(tmp_path / "only.csv").columns) == ["预测_label", "概率_no", "概率_yes"]
+
+
+def test_missing_input_column(app, signal, tmp_path):
+    df = _frame(100)
+    model_path, input_path = tmp_path / "model.joblib", tmp_path / "input.csv"
+    joblib.dump(_bundle(app, signal, df, 'regression'), model_path)
+    df.drop(columns='b').to_csv(input_path, index=False)
+    assert batch_score.main([str(model_path), str(input_path), '-o', str(tmp_path / "out.csv")]) == 2
+    assert not (tmp_path / "out.csv").exists()
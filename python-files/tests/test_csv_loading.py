@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+""" read_csv_chunked must give back what pd.read_csv parses, only in more compact dtypes. """
+import numpy as np
+import pandas as pd
+import pytest
+
+CHUNK_ROWS = 1_000
+
+
+def assert_same_values(result, expected):
+    assert list(result.columns) == list(expected.columns) and len(result) == len(expected)
+    for col in expected.columns:
+        got = result[col]
+        if isinstance(got.dtype, pd.CategoricalDtype): got = got.astype(got.cat.categories.dtype)
+        pd.testing.assert_series_equal(got, expected[col], check_dtype=False, check_exact=True, obj=col)
+
+
+@pytest.fixture
+def csv_file(tmp_path):
+    rng = np.random.default_rng(0)
+    n = 4 * CHUNK_ROWS + 123
+    df = pd.DataFrame({
+        'inexact': rng.random(n) * 100, # Not representable in float32
+        'exact': rng.integers(0, 1000, n) / 4, # Quarter steps: float32 is lossless
+        'levels': np.where(np.arange(n) < CHUNK_ROWS, rng.choice(['a', 'b'], n), rng.choice(['c', 'd', 'a'], n)), # Level set differs per chunk
+        'ids': np.where(np.arange(n) < CHUNK_ROWS, 'x', np.char.add('id', np.arange(n).astype(str))), # Looks categorical in chunk 1 only
+        'small_int': rng.integers(-100, 100, n),
+        'big_int': rng.integers(0, 2**40, n),
+    })
+    late_nan = df['small_int'].astype(float); late_nan[3 * CHUNK_ROWS + 5] = np.nan # Int column, NaN only in a later chunk
+    df['late_nan'] = late_nan
+    path = tmp_path / 'data.csv'
+    df.to_csv(path, index=False)
+    return path
+
+
+def test_chunked_read_round_trips(app, csv_file):
+    result = app.read_csv_chunked(str(csv_file), chunk_rows=CHUNK_ROWS)
+    expected = pd.read_csv(csv_file)
+    assert_same_values(result, expected)
+    assert result['inexact'].dtype == np.float64
+    assert result['exact'].dtype == np.float32
+    assert isinstance(result['levels'].dtype, pd.CategoricalDtype) and set(result['levels'].cat.categories) == {'a', 'b', 'c', 'd'}
+    assert not isinstance(result['ids'].dtype, pd.CategoricalDtype) # Decided over all rows, not from chunk 1
+    assert result['small_int'].dtype == np.int16 and result['big_int'].dtype == np.int64
+    assert result['late_nan'].dtype == np.float32 and result['late_nan'].isna().sum() == 1
+
+
+def test_chunk_size_does_not_change_the_result(app, csv_file):
+    single = app.read_csv_chunked(str(csv_file), chunk_rows=10**6)
+    chunked = app.read_csv_chunked(str(csv_file), chunk_rows=CHUNK_ROWS)
+    assert single.dtypes.astype(str).to_dict() == chunked.dtypes.astype(str).to_dict()
+    assert_same_values(chunked, single.astype({c: single[c].cat.categories.dtype for c in single if isinstance(single[c].dtype, pd.CategoricalDtype)}))
+
+
+def test_downcast_series_keeps_inexact_floats(app):
+    s = pd.Series([0.1, 1 / 3, np.nan])
+    assert app.downcast_series(s).dtype == np.float64
+    assert app.downcast_series(pd.Series([0.5, 2.25, np.nan])).dtype == np.float32
+    assert app.downcast_series(pd.Series([1e300])).dtype == np.float64 # Would overflow to inf
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+""" MetricsEngine (through MLClientApp._calculate_metrics / _evaluate) against the sklearn / scipy functions it replaced. """
+import numpy as np
+import pytest
+from scipy.stats import spearmanr
+from sklearn.metrics import (accuracy_score, f1_score, mean_absolute_error, mean_squared_error, precision_score, r2_score,
+                             recall_score, roc_auc_score)
+
+
+def reference_metrics(y_true, y_pred, y_pred_proba, problem_type):
+    """ What _calculate_metrics computed with sklearn / scipy before MetricsEngine. """
+    metrics = {}
+    if problem_type == 'classification':
+        metrics['Accuracy'] = accuracy_score(y_true, y_pred)
+        n_classes = len(np.unique(y_true))
+        average = 'binary' if n_classes <= 2 else 'weighted'
+        metrics['Precision'] = precision_score(y_true, y_pred, average=average, zero_division=0)
+        metrics['Recall'] = recall_score(y_true, y_pred, average=average, zero_division=0)
+        metrics['F1-Score'] = f1_score(y_true, y_pred, average=average, zero_division=0)
+        if n_classes == 2: metrics['AUC'] = roc_auc_score(y_true, y_pred_proba[:, 1])
+        else: metrics['AUC (OvR)'] = roc_auc_score(y_true, y_pred_proba, multi_class='ovr', average='weighted', labels=np.arange(n_classes))
+    else:
+        metrics['R²'] = r2_score(y_true, y_pred)
+        metrics['MAE'] = mean_absolute_error(y_true, y_pred)
+        metrics['MSE'] = mean_squared_error(y_true, y_pred)
+        metrics['RMSE'] = np.sqrt(metrics['MSE'])
+    metrics['Spearman Rho'] = spearmanr(y_true, y_pred)[0]
+    return metrics
+
+
+def random_case(rng, problem_type, n_classes=2, n=None):
+    n = n or int(rng.integers(20, 3000))
+    if problem_type == 'regression':
+        y_true = rng.normal(size=n)
+        if rng.random() < 0.5: y_true = np.round(y_true, 1) # Ties
+        return y_true, y_true + rng.normal(scale=rng.uniform(0.1, 2), size=n), None
+    y_true = np.r_[np.arange(n_classes), rng.integers(0, n_classes, n - n_classes)] # Every class present
+    noisy = rng.random(n) < rng.uniform(0.1, 0.9)
+    y_pred = np.where(noisy, rng.integers(0, n_classes, n), y_true)
+    logits = rng.normal(size=(n, n_classes)) + 2 * np.eye(n_classes)[y_true] * rng.uniform(0, 1)
+    if rng.random() < 0.5: logits = np.round(logits, 1) # Tied scores
+    proba = np.exp(logits) / np.exp(logits).sum(axis=1, keepdims=True)
+    return y_true, y_pred, proba
+
+
+CASES = [('classification', 2)] * 40 + [('classification', 3)] * 20 + [('classification', 6)] * 20 + [('regression', 0)] * 40
+
+
+@pytest.mark.parametrize('case', range(len(CASES)))
+def test_metrics_match_sklearn_and_scipy(app, signal, case):
+    problem_type, n_classes = CASES[case]
+    y_true, y_pred, proba = random_case(np.random.default_rng(case), problem_type, n_classes)
+    metrics = app.MLClientApp._calculate_metrics(y_true, y_pred, proba, problem_type, signal)
+    expected = reference_metrics(y_true, y_pred, proba, problem_type)
+    assert metrics.keys() == expected.keys()
+    for name, value in expected.items(): assert metrics[name] == pytest.approx(value, rel=1e-9, abs=1e-12), name
+
+
+def test_parallel_path_matches_serial(app, signal, monkeypatch):
+    rng = np.random.default_rng(7)
+    for problem_type, n_classes in (('classification', 4), ('regression', 0)):
+        y_true, y_pred, proba = random_case(rng, problem_type, n_classes, n=5000)
+        serial = app.MLClientApp._calculate_metrics(y_true, y_pred, proba, problem_type, signal)
+        monkeypatch.setattr(app, 'METRICS_PARALLEL_MIN_ROWS', 100)
+        engine = app.MetricsEngine(y_true, y_pred, proba, problem_type, n_jobs=4)
+        assert engine.compute() == pytest.approx(serial)
+        monkeypatch.undo()
+
+
+def test_not_applicable_texts(app, signal):
+    y_true = np.array([0, 1, 1, 0]); y_pred = np.array([0, 1, 0, 0])
+    assert app.MLClientApp._calculate_metrics(y_true, y_pred, None, 'classification', signal)['AUC'] == 'N/A (No probabilities)'
+    metrics = app.MLClientApp._calculate_metrics(y_true, y_pred, np.ones((4, 1)), 'classification', signal)
+    assert metrics['AUC'] == 'N/A (Proba shape)'
+
+
+@pytest.mark.parametrize('max_rows', [None, 300]) # 300: m-out-of-n bootstrap on a subset of the test rows
+@pytest.mark.parametrize('problem_type,n_classes', [('classification', 2), ('classification', 4), ('regression', 0)])
+def test_bootstrap_intervals_contain_point_estimate(app, signal, monkeypatch, max_rows, problem_type, n_classes):
+    if max_rows: monkeypatch.setattr(app, 'BOOTSTRAP_MAX_ROWS', max_rows)
+    y_true, y_pred, proba = random_case(np.random.default_rng(n_classes), problem_type, n_classes, n=2000)
+    metrics, bootstrap = app.MLClientApp._evaluate(y_true, y_pred, proba, problem_type, signal, bootstrap=400)
+    assert bootstrap['rows'] == (max_rows or 2000) and bootstrap['resamples'] == 400
+    numeric = {name for name, value in metrics.items() if isinstance(value, float)}
+    assert set(bootstrap['intervals']) == numeric
+    for name, (low, high) in bootstrap['intervals'].items():
+        assert low <= metrics[name] <= high, (name, low, metrics[name], high)
+        assert low < high, name
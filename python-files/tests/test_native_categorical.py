@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+""" Regression: boosters with native categorical handling after the preprocessing page ran with step memory.
+
+    python -m pytest -q tests
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+from bench_startup import load_app_module
+from model_input import prepare_model_input
+
+app = load_app_module()
+
+
+class _Signal:
+    def emit(self, *args): pass
+
+
+def _frame(n=600):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({'a': rng.random(n), 'b': np.where(np.arange(n) % 7 == 0, np.nan, rng.random(n)),
+                       'c': pd.Series(rng.choice(['x', 'y', 'z'], n)).astype(object)})
+    df['y'] = (df['a'] + (df['c'] == 'x') > 1).astype(int)
+    return df
+
+
+@pytest.mark.parametrize("encoding", ["独热编码 (One-Hot)", "序号编码 (Ordinal)", app.NATIVE_CATEGORICAL_ENCODING])
+def test_booster_native_categorical_after_cached_preprocessing(tmp_path, monkeypatch, encoding):
+    booster = next((name for name, module in (("LightGBM", app.lgb), ("XGBoost", app.xgb)) if module), None)
+    if booster is None: pytest.skip("LightGBM / XGBoost not installed")
+    monkeypatch.setattr(app, 'PREPROCESS_CACHE_DIR', str(tmp_path))
+    df, signal = _frame(), _Signal()
+    params = {'selected_cols': ['a', 'b', 'c'], 'impute_strategy': "中位数 (Median)", 'impute_constant': None,
+              'scale_strategy': "标准化 (StandardScaler)", 'encode_strategy': encoding}
+    processed, preprocessor, _ = app.MLClientApp._preprocess_data_thread(signal, signal, df, params)
+    features = [c for c in processed.columns if c != 'y']
+    results = app.MLClientApp._train_model_thread(signal, signal, processed, features, 'y', booster, {'n_estimators': 10},
+                                                  False, 3, df, preprocessor, None, True)
+    assert 'native' in results['preprocessor'].named_transformers_['c'].named_steps
+    bundle = {'model': results['model'], 'preprocessor': results['preprocessor'],
+              'trained_feature_names': results['feature_names'], 'input_feature_names': results['input_feature_names']}
+    assert len(results['model'].predict(prepare_model_input(df, bundle))) == len(df)
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+""" PandasModel (data preview) renders cells as the original per-cell formatting did and reaches every row. """
+import numpy as np
+import pandas as pd
+import pytest
+from PyQt6.QtCore import Qt
+from PyQt6.QtWidgets import QApplication
+
+ROLES = (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.ToolTipRole, Qt.ItemDataRole.TextAlignmentRole)
+LEFT = int(Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter)
+RIGHT = int(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+
+
+@pytest.fixture(scope='module')
+def qapp(): return QApplication.instance() or QApplication([])
+
+
+def reference_cell(value):
+    """ (display, tooltip, alignment) as PandasModel.data() formatted each cell from df.iloc before it was vectorized. """
+    if pd.isna(value): display = "NaN"
+    elif isinstance(value, (float, np.floating)): display = "Inf" if np.isinf(value) else f"{value:.4f}"
+    else: display = str(value)
+    numeric = isinstance(value, (int, float, np.number)) and not pd.isna(value)
+    return display, str(value), RIGHT if numeric else LEFT
+
+
+def cells(model, row, col):
+    index = model.index(row, col)
+    return tuple(model.data(index, role).value() for role in ROLES)
+
+
+def _frame(n=700):
+    rng = np.random.default_rng(0)
+    floats = rng.normal(0, 1e3, n); floats[::7] = np.nan; floats[3::50] = np.inf; floats[4::50] = -np.inf
+    floats[5::60] = 1 / 3; floats[6::60] = -0.0; floats[8::60] = 1e-7
+    days = pd.Series(pd.date_range('2024-01-01', periods=n, freq='D')); days[::9] = pd.NaT
+    times = pd.Series(pd.date_range('2024-01-01 08:30', periods=n, freq='37min')); times[1::9] = pd.NaT
+    labels = rng.choice(['a', 'bb', 'ccc'], n).astype(object); labels[::11] = None
+    return pd.DataFrame({
+        'float': floats,
+        'float32': floats.astype(np.float32),
+        'all_nan': np.full(n, np.nan),
+        'int': rng.integers(-10**9, 10**9, n),
+        'uint8': rng.integers(0, 255, n).astype(np.uint8),
+        'bool': rng.random(n) < 0.5,
+        'category': pd.Categorical(labels),
+        'int_category': pd.Categorical(np.where(np.arange(n) % 5 == 0, np.nan, rng.integers(1, 4, n))).rename_categories(int),
+        'float_category': pd.Categorical(np.where(np.arange(n) % 5 == 1, np.nan, rng.choice([0.5, 1 / 3, 2.0], n))),
+        'date': days,
+        'datetime': times,
+        'datetime_tz': times.dt.tz_localize('UTC'),
+        'text': labels,
+        'nullable_int': pd.array(np.where(np.arange(n) % 6 == 0, None, np.arange(n)), dtype='Int64'),
+        'nullable_float': pd.array(np.where(np.arange(n) % 6 == 1, None, floats), dtype='Float64'),
+    })
+
+
+@pytest.mark.parametrize("column", list(_frame(1).columns))
+def test_data_matches_per_cell_formatting(app, qapp, column):
+    df = _frame()
+    model = app.PandasModel(df)
+    col = list(df.columns).index(column)
+    # Rows span several PREVIEW_BLOCK_ROWS blocks and are read out of order
+    rows = np.random.default_rng(1).permutation(len(df))
+    got = {row: cells(model, row, col) for row in rows}
+    assert [got[row] for row in range(len(df))] == [reference_cell(df.iloc[row, col]) for row in range(len(df))]
+
+
+def test_block_cache_is_bounded(app, qapp, monkeypatch):
+    monkeypatch.setattr(app, 'PREVIEW_CACHE_BLOCKS', 3)
+    df = _frame()
+    model = app.PandasModel(df)
+    for row in range(0, len(df), 50):
+        for col in range(len(df.columns)): assert cells(model, row, col) == reference_cell(df.iloc[row, col])
+    assert len(model._block_cache) == 3
+
+
+def test_fetch_more_reaches_last_row(app, qapp, monkeypatch):
+    monkeypatch.setattr(app, 'PREVIEW_FETCH_ROWS', 300)
+    df = _frame(1234)
+    model = app.PandasModel(df)
+    inserted = []
+    model.rowsInserted.connect(lambda parent, first, last: inserted.append((first, last)))
+    assert model.rowCount() == 300 and model.canFetchMore()
+    assert not model.data(model.createIndex(300, 0)).isValid() # Not exposed yet
+    while model.canFetchMore(): model.fetchMore()
+    assert inserted == [(300, 599), (600, 899), (900, 1199), (1200, 1233)]
+    assert model.rowCount() == len(df) and not model.canFetchMore()
+    model.fetchMore()
+    assert model.rowCount() == len(df)
+    last = len(df) - 1
+    assert [cells(model, last, col) for col in range(len(df.columns))] == [reference_cell(v) for v in df.iloc[last]]
+    assert model.headerData(last, Qt.Orientation.Vertical).value() == str(len(df))
+
+    model.update_dataframe(df.head(10))
+    assert model.rowCount() == 10 and not model.canFetchMore()
+    model.update_dataframe(None)
+    assert model.rowCount() == 0 and model.columnCount() == 0 and not model.canFetchMore()
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+""" Search-space parsing of the per-parameter text fields and the successive-halving / Hyperband schedules. """
+import pytest
+
+
+@pytest.mark.parametrize("kind, text, expected", [
+    ('int', "", None),
+    ('int', "   ", None),
+    ('int', "50, 100, 200", ('values', [50, 100, 200])),
+    ('int', "1, 1, 2,", ('values', [1, 2])),
+    ('int', "2..20", ('range', 2, 20, False)),
+    ('int', " 15 .. 255 log ", ('range', 15, 255, True)),
+    ('float', "0.01..0.3 log", ('range', 0.01, 0.3, True)),
+    ('float', "0.6..1.0", ('range', 0.6, 1.0, False)),
+    ('float', "0.1, 1e-3", ('values', [0.1, 0.001])),
+    ('int_or_none', "None, 10, 20", ('values', [None, 10, 20])),
+    ('int_or_none', "无, -1, 5", ('values', [None, 5])),
+    ('int_or_none', "3..8", ('range', 3, 8, False)),
+    ('choice', "relu, tanh", ('values', ['relu', 'tanh'])),
+    ('choice', "a..b", ('values', ['a..b'])),
+    ('layers', "64,32; 128; 128,64", ('values', [(64, 32), (128,), (128, 64)])),
+    ('layers', "64, 32", ('values', [(64, 32)])),
+    ('layers', "64 , 32 ;; 16;", ('values', [(64, 32), (16,)])),
+])
+def test_parse_search_space(app, kind, text, expected):
+    space = app.parse_search_space({'p': text}, {'p': kind})
+    assert space == ({} if expected is None else {'p': expected})
+
+
+@pytest.mark.parametrize("kind, text", [
+    ('int', "abc"),
+    ('int', "1.5"),
+    ('int', ","),
+    ('int', "20..2"),
+    ('int', "1.."),
+    ('int', "..5"),
+    ('int', "1..5 lin"),
+    ('int', "1..5 log log"),
+    ('float', "0..1 log"),
+    ('float', "-1..1 log"),
+    ('float', "1e..2"),
+    ('int_or_none', "none..5"),
+    ('choice', " , , "),
+    ('layers', ","),
+    ('layers', ";"),
+    ('layers', "64; 32,x"),
+    ('layers', "1.5"),
+])
+def test_parse_search_space_rejects(app, kind, text):
+    with pytest.raises(ValueError, match="'p'"):
+        app.parse_search_space({'ok': "1, 2", 'p': text}, {'ok': 'int', 'p': kind})
+
+
+def test_parse_search_space_all_fields(app):
+    kinds = {param: kind for param, (kind, _) in app.SEARCH_PARAM_SPECS["神经网络(MLP)"].items()}
+    texts = dict.fromkeys(kinds, "")
+    texts.update(hidden_layer_sizes="64,32; 128", alpha="0.00001..0.01 log")
+    assert app.parse_search_space(texts, kinds) == {'hidden_layer_sizes': ('values', [(64, 32), (128,)]),
+                                                    'alpha': ('range', 0.00001, 0.01, True)}
+
+
+@pytest.mark.parametrize("method, n_configs, max_rows, min_rows, eta, expected", [
+    # Not a halving method: every config on all rows
+    ('random', 20, 5000, 300, 3, [[(20, 5000)]]),
+    ('grid', 7, 100, 300, 3, [[(7, 100)]]),
+    # Successive halving: eta^s <= n_configs and the first rung still has min_rows
+    ('halving', 27, 8100, 300, 3, [[(27, 300), (9, 900), (3, 2700), (1, 8100)]]),
+    ('halving', 30, 1000, 300, 3, [[(30, 333), (10, 1000)]]),
+    ('halving', 16, 1600, 100, 2, [[(16, 100), (8, 200), (4, 400), (2, 800), (1, 1600)]]),
+    # Fewer rows than SEARCH_MIN_ROWS: no rungs to halve
+    ('halving', 27, 200, 300, 3, [[(27, 200)]]),
+    ('hyperband', 40, 200, 300, 3, [[(40, 200)]]),
+    ('halving', 27, 899, 300, 3, [[(27, 899)]]), # A first rung of 899 // 3 = 299 rows would be too small
+    # Fewer configs than eta: nothing to keep the best 1/eta of
+    ('halving', 2, 100_000, 300, 3, [[(2, 100_000)]]),
+    ('hyperband', 2, 100_000, 300, 3, [[(2, 100_000)]]),
+    ('halving', 1, 100_000, 300, 3, [[(1, 100_000)]]),
+    # Hyperband: configs shared between brackets, each ending on all rows
+    ('hyperband', 20, 90_000, 300, 3, [[(11, 10_000), (3, 30_000), (1, 90_000)], [(6, 30_000), (2, 90_000)], [(4, 90_000)]]),
+])
+def test_halving_brackets(app, method, n_configs, max_rows, min_rows, eta, expected):
+    assert app.halving_brackets(method, n_configs, max_rows, min_rows=min_rows, eta=eta) == expected
+
+
+def test_hyperband_matches_li_et_al(app):
+    """ Li et al., "Hyperband" (JMLR 2018), table 1: R = 81, eta = 3, budget B = (s_max + 1) R, so the brackets
+        start 81, 34, 15, 8 and 5 configurations (143 in total) on 1, 3, 9, 27 and 81 resource units. """
+    expected = [[(81, 1), (27, 3), (9, 9), (3, 27), (1, 81)],
+                [(34, 3), (11, 9), (3, 27), (1, 81)],
+                [(15, 9), (5, 27), (1, 81)],
+                [(8, 27), (2, 81)],
+                [(5, 81)]]
+    assert app.halving_brackets('hyperband', 143, 81, min_rows=1, eta=3) == expected
+    # Same schedule in rows: one resource unit = the fewest rows a trial is fitted on
+    rows = [[(n, r * app.SEARCH_MIN_ROWS) for n, r in bracket] for bracket in expected]
+    assert app.halving_brackets('hyperband', 143, 81 * app.SEARCH_MIN_ROWS) == rows
+
+
+@pytest.mark.parametrize("method", ['halving', 'hyperband'])
+@pytest.mark.parametrize("n_configs", [1, 3, 10, 50, 200])
+@pytest.mark.parametrize("max_rows", [100, 1000, 50_000, 2_000_000])
+def test_halving_bracket_invariants(app, method, n_configs, max_rows):
+    brackets = app.halving_brackets(method, n_configs, max_rows)
+    for bracket in brackets:
+        assert bracket[-1][1] == max_rows # The last rung scores on all rows
+        assert len(bracket) == 1 or bracket[0][1] >= app.SEARCH_MIN_ROWS
+        assert all(n >= 1 for n, _ in bracket)
+        assert [n for n, _ in bracket] == sorted((n for n, _ in bracket), reverse=True)
+        assert [r for _, r in bracket] == sorted(r for _, r in bracket)
+    if method == 'halving': assert len(brackets) == 1 and brackets[0][0][0] == n_configs
+    else: assert abs(sum(bracket[0][0] for bracket in brackets) - n_configs) <= len(brackets)
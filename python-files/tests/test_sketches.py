@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+""" The deterministic error bounds promised by sketches.py, on adversarial orders and heavy ties. """
+import numpy as np
+import pandas as pd
+import pytest
+
+from sketches import ApproxImputer
+
+N = 200_000
+CHUNK_SIZES = [999, 7_777, 50_000, N]
+
+
+def column(kind, rng):
+    if kind == 'normal': return rng.normal(size=N)
+    if kind == 'sorted': return np.sort(rng.lognormal(size=N))
+    if kind == 'reverse': return np.sort(rng.lognormal(size=N))[::-1].copy()
+    if kind == 'integer': return rng.integers(0, 50, N).astype(np.float64) # Ties everywhere
+    if kind == 'zipf': return np.minimum(rng.zipf(1.3, N), 10**6).astype(np.float64)
+    raise ValueError(kind)
+
+
+def with_missing(values, rng):
+    values = values.copy(); values[rng.random(len(values)) < 0.1] = np.nan
+    return values
+
+
+@pytest.mark.parametrize('chunk_rows', CHUNK_SIZES)
+@pytest.mark.parametrize('kind', ['normal', 'sorted', 'reverse', 'integer', 'zipf'])
+@pytest.mark.parametrize('error', [0.01, 0.002])
+def test_median_rank_within_error(kind, chunk_rows, error):
+    values = with_missing(column(kind, np.random.default_rng(0)), np.random.default_rng(1))
+    imputer = ApproxImputer('median', error=error, chunk_rows=chunk_rows).fit(pd.DataFrame({'x': values}))
+    median, present = imputer.statistics_[0], values[~np.isnan(values)]
+    n = len(present)
+    below, at_most = (present < median).sum(), (present <= median).sum()
+    # Some rank in [below, at_most] (the positions of `median` in sorted order) is within error * n of n / 2
+    assert below <= n / 2 + error * n and at_most >= n / 2 - error * n, (below / n, at_most / n)
+    assert imputer.error_bounds_[0] <= error
+
+
+@pytest.mark.parametrize('chunk_rows', CHUNK_SIZES)
+@pytest.mark.parametrize('kind', ['integer', 'zipf', 'sorted'])
+@pytest.mark.parametrize('error', [0.01, 0.002])
+def test_most_frequent_count_within_error(kind, chunk_rows, error):
+    rng = np.random.default_rng(2)
+    values = column(kind, rng)
+    if kind == 'sorted': values = np.round(values, 1) # Many distinct values, a clear mode near the peak
+    values = with_missing(values, rng)
+    imputer = ApproxImputer('most_frequent', error=error, chunk_rows=chunk_rows).fit(pd.DataFrame({'x': values}))
+    counts = pd.Series(values).value_counts()
+    n = int(counts.sum())
+    assert counts.get(imputer.statistics_[0], 0) >= counts.max() - error * n
+    assert imputer.error_bounds_[0] <= error
+
+
+@pytest.mark.parametrize('chunk_rows', [3, 1_000])
+def test_most_frequent_text_column(chunk_rows):
+    values = pd.Series(['a'] * 500 + ['b'] * 300 + [None] * 100 + [f"u{i}" for i in range(200)]).sample(frac=1, random_state=0)
+    imputer = ApproxImputer('most_frequent', error=0.05, chunk_rows=chunk_rows).fit(values.to_frame('c'))
+    assert imputer.statistics_[0] == 'a'
+
+
+@pytest.mark.parametrize('strategy', ['median', 'most_frequent'])
+def test_all_missing_column_is_filled_with_zero(strategy):
+    X = pd.DataFrame({'empty': np.full(1000, np.nan), 'x': np.arange(1000.0)})
+    imputer = ApproxImputer(strategy, chunk_rows=100).fit(X)
+    assert imputer.statistics_[0] == 0 and imputer.error_bounds_[0] == 0
+    assert (imputer.transform(X)['empty'] == 0).all()
+
+
+@pytest.mark.parametrize('strategy', ['median', 'most_frequent'])
+def test_dataframe_and_ndarray_input_agree(strategy):
+    rng = np.random.default_rng(3)
+    X = pd.DataFrame({'a': with_missing(rng.integers(0, 20, 5000).astype(float), rng), 'b': with_missing(rng.normal(size=5000), rng)})
+    from_frame = ApproxImputer(strategy, error=0.01, chunk_rows=700).fit(X)
+    from_array = ApproxImputer(strategy, error=0.01, chunk_rows=700).fit(X.to_numpy())
+    assert list(from_frame.statistics_) == list(from_array.statistics_)
+    filled_frame, filled_array = from_frame.transform(X), from_array.transform(X.to_numpy())
+    assert isinstance(filled_frame, pd.DataFrame) and isinstance(filled_array, np.ndarray)
+    np.testing.assert_array_equal(filled_frame.to_numpy(dtype=float), filled_array.astype(float))
+    assert not np.isnan(filled_array.astype(float)).any()
+    assert list(from_frame.get_feature_names_out()) == ['a', 'b'] and list(from_array.get_feature_names_out()) == ['x0', 'x1']
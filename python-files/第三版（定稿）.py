@@ -1,11 +1,36 @@
 # -*- coding: utf-8 -*-
+from __future__ import annotations # pd.DataFrame etc. in signatures must not import pandas at startup
+import time # Timing of CV folds and of startup
+_STARTUP_T0 = time.perf_counter()
 import sys
-import pandas as pd
-import numpy as np
+import os
 import traceback
-import joblib # For model saving/loading
-import io # Moved import to top - Used for DataFrame.info redirection
+import io # Profiler text capture
+import warnings
 import datetime # For default save filenames
+import hashlib # For dataset cache keys
+import importlib
+import importlib.util
+import inspect
+import types
+import threading
+import json
+import argparse
+import contextlib
+import cProfile
+import pstats
+import marshal
+import tempfile # Cancellation marker files
+import uuid
+import multiprocessing # Killable child process for non-incremental fits
+import signal # Terminating pool workers at exit
+import weakref
+import heapq # Job priority queue
+import itertools
+import queue
+import concurrent.futures
+import pickle # Model sizes in comparison runs
+from collections import OrderedDict, deque # LRU caches, profiling job queue
 
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QGridLayout,
@@ -34,96 +59,318 @@ except ImportError:
           "Install with: pip install qtawesome")
     QTA_LOADED = False
 
-# --- Matplotlib Embedding ---
-from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg as FigureCanvas
-from matplotlib.figure import Figure
-import matplotlib.pyplot as plt
-# from matplotlib.cm import get_cmap # get_cmap is deprecated, use plt.get_cmap
-
-# --- ML Libraries ---
-from sklearn.model_selection import train_test_split, cross_val_score # Added cross_val_score (though not fully implemented in training yet)
-from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
-from sklearn.neural_network import MLPClassifier, MLPRegressor
-from sklearn.metrics import (accuracy_score, precision_score, recall_score, f1_score,
-                             r2_score, mean_absolute_error, mean_squared_error, roc_auc_score)
-                             # Removed confusion_matrix, roc_curve
-from sklearn.preprocessing import StandardScaler, MinMaxScaler, OneHotEncoder, OrdinalEncoder # Added preprocessors
-from sklearn.impute import SimpleImputer # Added imputer
-from sklearn.compose import ColumnTransformer # For applying different transforms (conceptually useful)
-from sklearn.pipeline import Pipeline # For structured preprocessing (conceptually useful)
-from scipy.stats import spearmanr
-# Optional: Only import if installed and used
-try: import lightgbm as lgb
-except ImportError: lgb = None; print("Warning: lightgbm not installed.")
-try: import xgboost as xgb
-except ImportError: xgb = None; print("Warning: xgboost not installed.")
+# --- Deferred Imports ---
+# Only Qt and the standard library are imported before the window appears. pandas, numpy, joblib, pyarrow and
+# the boosters are _LazyModule placeholders that import on first use; sklearn, scipy and matplotlib are imported
+# inside the functions that use them. warm_imports() loads all of it on a background thread once the window is up.
+_import_log = [] # (module, seconds, trigger) of each deferred import, for the startup report
+_import_lock = threading.RLock()
+
+def import_timed(name, trigger):
+    """ importlib.import_module() that records how long a first import took (cumulative, like -X importtime). """
+    if name in sys.modules: return sys.modules[name]
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    _import_log.append((name, time.perf_counter() - start, trigger))
+    return module
+
+class _LazyModule(types.ModuleType):
+    """ Stand-in for `import <name> as <alias>`. The first attribute access imports the module and rebinds
+        the global `alias` in this file to it, so later lookups cost nothing. bool() only checks that the
+        module is installed (replaces the old `lgb = None` fallbacks) and never imports it. """
+    def __init__(self, name, alias, missing_warning=None):
+        super().__init__(name)
+        self._alias = alias; self._module = None
+        self._installed = importlib.util.find_spec(name.partition('.')[0]) is not None
+        if not self._installed and missing_warning: print(f"Warning: {missing_warning}")
+
+    def __bool__(self): return self._installed
+
+    def __reduce__(self): return (_LazyModule, (self.__name__, self._alias)) # cloudpickle'd functions may capture it
+
+    def _load(self, trigger="first use"):
+        if self._module is None:
+            with _import_lock: self._module = import_timed(self.__name__, trigger)
+        if globals().get(self._alias) is self: globals()[self._alias] = self._module
+        return self._module
+
+    def __getattr__(self, attr): return getattr(self._load(), attr)
+
+pd = _LazyModule('pandas', 'pd')
+np = _LazyModule('numpy', 'np')
+joblib = _LazyModule('joblib', 'joblib') # For model saving/loading
+lgb = _LazyModule('lightgbm', 'lgb', "lightgbm not installed.")
+xgb = _LazyModule('xgboost', 'xgb', "xgboost not installed.")
+pa_feather = _LazyModule('pyarrow.feather', 'pa_feather', "pyarrow not installed. Dataset cache disabled.") # Columnar dataset cache
+pa = _LazyModule('pyarrow', 'pa') # Arrow IPC snapshots of frames handed to pool workers
+psutil = _LazyModule('psutil', 'psutil') # Optional: RSS for profiling spans (falls back to /proc)
+model_input = _LazyModule('model_input', 'model_input') # Preprocessor output -> model input, shared with batch_score.py
+_LAZY_MODULES = (pd, np, joblib, lgb, xgb, pa_feather, pa, psutil, model_input)
+
+# Loaded ahead of first use, in this order, by the GUI's warm-up thread and by each pool worker
+WARM_IMPORTS = ('numpy', 'pandas', 'pyarrow', 'pyarrow.feather', 'joblib', 'scipy.stats', 'sklearn.base',
+                'sklearn.model_selection', 'sklearn.ensemble', 'sklearn.neural_network', 'sklearn.metrics',
+                'sklearn.preprocessing', 'sklearn.impute', 'sklearn.compose', 'sklearn.pipeline', 'lightgbm', 'xgboost')
+GUI_WARM_IMPORTS = WARM_IMPORTS + ('matplotlib.figure', 'matplotlib.style', 'matplotlib.backends.backend_qtagg')
+
+def warm_imports(progress_signal, status_signal, modules=WARM_IMPORTS):
+    """ Worker function: imports `modules` so the first load/train does not pay for them, then binds the
+        placeholders. Modules that are not installed are skipped. Returns the import log. """
+    for i, name in enumerate(modules):
+        if importlib.util.find_spec(name.partition('.')[0]) is None: continue
+        try:
+            with _import_lock: import_timed(name, "warm-up")
+        except Exception as e: # A broken optional install must not take the app down; reported again on use
+            print(f"Warning: background import of {name} failed: {e}")
+        if progress_signal is not None: progress_signal.emit(100 * (i + 1) // len(modules))
+    for module in _LAZY_MODULES:
+        if module.__name__ in sys.modules: module._load("warm-up")
+    return list(_import_log)
+
+_startup_marks = [] # (phase, seconds since the script started)
+
+def mark_startup(phase): _startup_marks.append((phase, time.perf_counter() - _STARTUP_T0))
+
+def startup_report():
+    """ Startup phases and deferred imports as a dict (written by --startup-report PATH). """
+    return {'app_version': VERSION, 'python': sys.version.split()[0], 'platform': sys.platform,
+            'phases_ms': {phase: round(1000 * at, 1) for phase, at in _startup_marks},
+            'imports_ms': [{'module': name, 'ms': round(1000 * sec, 1), 'trigger': trigger} for name, sec, trigger in _import_log]}
+
+def format_startup_report(report):
+    lines = ["startup report (ms since the script started)", f"  {'phase':<28}{'at':>9}{'took':>9}"]
+    previous = 0.0
+    for phase, at in report['phases_ms'].items():
+        lines.append(f"  {phase:<28}{at:>9.1f}{at - previous:>9.1f}"); previous = at
+    lines.append(f"deferred imports (cumulative ms, -X importtime style)")
+    for entry in sorted(report['imports_ms'], key=lambda e: -e['ms']):
+        lines.append(f"  {entry['module']:<36}{entry['ms']:>9.1f}  {entry['trigger']}")
+    return "\n".join(lines)
 
 # --- Constants ---
 APP_NAME = "智能机器学习分析平台"
 DEFAULT_THEME = "light"
-VERSION = "0.3.2" # Incremented version (removed plots)
-MAX_PREVIEW_ROWS = 500 # Limit rows shown in preview tables
+VERSION = "0.4.0" # Model files now carry the fitted preprocessing pipeline
+MAX_PREVIEW_ROWS = 500 # Limit rows shown in the predictions preview
+PREVIEW_FETCH_ROWS = 50_000 # Rows exposed per fetchMore() step of PandasModel
+PREVIEW_BLOCK_ROWS = 256 # Rows per rendered-string cache block
+PREVIEW_CACHE_BLOCKS = 256 # LRU size in blocks; bounds preview memory regardless of frame size
+CSV_CHUNK_ROWS = 200_000 # Rows parsed per chunk when streaming CSV files
+CATEGORY_MAX_LEVELS = 1000 # Object columns with at most this many levels (per chunk)...
+CATEGORY_MAX_RATIO = 0.5 # ...and at most this unique/rows ratio are stored as 'category'
+DATASET_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".ml_client_cache", "datasets")
+DATASET_CACHE_MAX_BYTES = 4 * 1024**3 # LRU-evicted beyond this total size
+DATASET_CACHE_FORMAT = 1 # Bump when loading/normalisation changes so old sidecars are ignored
+PREPROCESS_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".ml_client_cache", "preprocess")
+PREPROCESS_CACHE_MAX_BYTES = 2 * 1024**3 # Memoized preprocessing step results, LRU-evicted beyond this size
+PREPROCESS_CACHE_FORMAT = 1 # Bump when build_preprocessor changes what a step produces
+PREPROCESS_REPORT_MAX_COLUMNS = 50 # Columns listed in the step cache tooltip on the preprocessing page
+PREPROCESS_PARALLEL_MIN_CELLS = 5_000_000 # Smaller selections are preprocessed serially: worker start-up would dominate
+PREPROCESS_PARTITIONS_PER_JOB = 4 # Column partitions per parallel worker: balances uneven columns, finer progress
+APPROX_IMPUTE_DEFAULT_ERROR = 0.001 # Default error bound of sketch-based median/most-frequent imputation (fraction of rows)
+JOB_POOL_WORKERS = 2 # Persistent worker processes for load/preprocess/train jobs (0 = run jobs in QThreads)
+JOB_POOL_POLL_MS = 50 # How often the GUI drains progress/status events from the pool
+SNAPSHOT_PREFIX = "mlclient_frame_" # Temp-dir Arrow files backing frames handed to/from pool workers
+JOB_PRIORITY_LOAD, JOB_PRIORITY_PREPROCESS, JOB_PRIORITY_TRAIN = 20, 10, 0 # Higher runs first when workers are busy
+JOB_PRIORITY_PREDICT = 5
+JOB_PRIORITY_PROFILE = -10 # Background data profiling: queued behind user-started jobs and kept off one pool worker
+METRICS_PARALLEL_MIN_ROWS = 1_000_000 # Test sets from this size compute their sort-based metrics on parallel threads
+BOOTSTRAP_DEFAULT_RESAMPLES = 1000
+BOOTSTRAP_CONFIDENCE = 0.95
+BOOTSTRAP_MAX_ROWS = 200_000 # Row-level resampling (AUC, Spearman, regression) uses at most this many test rows (m-out-of-n)
+BOOTSTRAP_BATCH_CELLS = 2_000_000 # Resamples x rows per vectorized batch: bounds each thread's weight matrices (~16 MB each)
+PROFILE_BLOCK_CELLS = 20_000_000 # Cells (rows x columns) per profiling job: bounds the float block it builds
+PROFILE_BLOCK_MAX_COLUMNS = 256 # ...and the columns per job, so results keep arriving on narrow-but-long frames
+PROFILE_TOP_K = 3 # Most frequent values shown per column
+HLL_PRECISION = 12 # HyperLogLog registers = 2**12: ~1.6% relative error on distinct counts
+PROFILE_TABLE_HEADERS = ["列名", "类型", "缺失率 (%)", "唯一值 (≈)", "最小值", "最大值", "均值", "标准差", "常见值", "内存 (MB)"]
+PREDICT_CHUNK_ROWS = 200_000 # Rows scored / written per step when exporting predictions
+PROFILE_MODES = {"关闭": None, "cProfile": 'cprofile', "pyinstrument": 'pyinstrument'} # Training profiler choices
+PROFILE_TOP_FUNCTIONS = 40 # Rows of the cProfile summary shown in the performance report
+SEARCH_METHODS = {"随机搜索": 'random', "网格搜索": 'grid', "逐次减半 (Successive Halving)": 'halving', "Hyperband": 'hyperband'}
+SEARCH_GRID_POINTS = 4 # Values a `lo..hi` range expands to in grid search
+SEARCH_HALVING_FACTOR = 3 # Successive halving keeps the best 1/eta configs per rung, with eta times the rows
+SEARCH_MIN_ROWS = 300 # Fewest training rows a trial is fitted on in the first halving rung
+SEARCH_VALIDATION_FRACTION = 0.2 # Share of the training rows that scores search trials
+BOOSTING_ALGORITHMS = ("LightGBM", "XGBoost") # Split on category-dtype features natively (no one-hot / ordinal encoding)
+SPARSE_ONEHOT_MIN_COLUMNS = 100 # One-hot levels from which model inputs are a CSR matrix instead of a DataFrame...
+SPARSE_INPUT_ALGORITHMS = ("随机森林", "神经网络(MLP)", "SGD 线性模型", "LightGBM") # ...for these (XGBoost reads absent CSR entries as missing, not 0)
+BOOSTING_VALIDATION_FRACTION = 0.1 # Training rows held out as the early-stopping eval set of LightGBM/XGBoost
+INCREMENTAL_ALGORITHMS = ("神经网络(MLP)", "SGD 线性模型", "LightGBM", "XGBoost") # Trainable chunk by chunk from disk
+INCREMENTAL_CHUNK_ROWS = 100_000 # Default rows per chunk streamed by incremental training
+INCREMENTAL_EVAL_FRACTION = 0.1 # Rows (fixed by row number) held out as the evaluation stream
+INCREMENTAL_EVAL_SAMPLE_ROWS = 100_000 # Held-out rows kept in memory as XGBoost's early-stopping eval set
 
 # =============================================================================
 # Helper Classes and Functions
 # =============================================================================
 
 class PandasModel(QAbstractTableModel):
-    """ A model to interface a Pandas DataFrame with QTableView. """
+    """ A virtualized model to interface a Pandas DataFrame with QTableView.
+
+        All rows are reachable: they are exposed PREVIEW_FETCH_ROWS at a time through
+        canFetchMore/fetchMore. Column dtype kind and alignment are resolved once in
+        update_dataframe; cells are then formatted a PREVIEW_BLOCK_ROWS row block at a time
+        with vectorized NumPy/pandas string ops, and the display text, tooltip and alignment of
+        each block are kept in a small LRU that serves every role.
+    """
+    ALIGN_LEFT = int(Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter)
+    ALIGN_RIGHT = int(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+
     def __init__(self, dataframe: pd.DataFrame = None, parent=None):
         QAbstractTableModel.__init__(self, parent)
-        self._dataframe = dataframe if dataframe is not None else pd.DataFrame()
+        self._set_dataframe(dataframe)
+
+    def _set_dataframe(self, dataframe):
+        self._dataframe = dataframe # None for the empty model (no pandas import needed)
+        self._n_rows = len(dataframe) if dataframe is not None else 0
+        self._columns = []; self._column_kinds = []
+        for i in range(len(dataframe.columns) if dataframe is not None else 0):
+            kind, values = self._extract_column(self._dataframe.iloc[:, i])
+            self._column_kinds.append(kind); self._columns.append(values)
+        self._column_align = [self.ALIGN_RIGHT if kind in 'fi' else self.ALIGN_LEFT for kind in self._column_kinds]
+        self._loaded_rows = min(PREVIEW_FETCH_ROWS, self._n_rows)
+        self._block_cache = OrderedDict() # (column, block) -> (display, tooltip, alignment)
+
+    @classmethod
+    def _format_value(cls, value):
+        """ (display, tooltip, alignment) of a single value: floats to 4 decimals, numbers right-aligned. """
+        if isinstance(value, (float, np.floating)) and np.isinf(value): return "Inf", str(value), cls.ALIGN_RIGHT
+        if isinstance(value, (float, np.floating)): return f"{value:.4f}", str(value), cls.ALIGN_RIGHT
+        return str(value), str(value), cls.ALIGN_RIGHT if isinstance(value, (int, np.number)) else cls.ALIGN_LEFT
+
+    @classmethod
+    def _extract_column(cls, series):
+        """ Returns (kind, values): 'f'/'i'/'b' with a zero-copy NumPy array, 'c' with category
+            codes and rendered labels, or 'n' (nullable Int64/Float64) / 'o' with the Series itself
+            (sliced lazily per block). """
+        dtype = series.dtype
+        if isinstance(dtype, np.dtype) and dtype.kind in 'biuf':
+            return ('i' if dtype.kind == 'u' else dtype.kind), series.to_numpy()
+        if not isinstance(dtype, np.dtype) and getattr(dtype, 'kind', 'O') in 'iuf': return 'n', series
+        if isinstance(dtype, pd.CategoricalDtype):
+            # Labels look like cells of the categories' dtype; code -1 (missing) indexes the trailing NaN entry
+            rendered = [cls._format_value(label) for label in series.cat.categories] + [("NaN", "nan", cls.ALIGN_LEFT)]
+            display, tooltip, align = (np.array(part, dtype=object) for part in zip(*rendered))
+            return 'c', (series.cat.codes.to_numpy(), display, tooltip, align)
+        return 'o', series
+
+    def _format_block(self, col, start, stop):
+        """ Vectorized rendering of rows [start, stop) of one column for all roles. """
+        kind, values = self._column_kinds[col], self._columns[col]
+        align = self._column_align[col]
+        if kind == 'f':
+            block = values[start:stop]
+            nan, inf = np.isnan(block), np.isinf(block)
+            display = np.where(nan, "NaN", np.where(inf, "Inf", np.char.mod('%.4f', block)))
+            tooltip = block.astype(str)
+            align = np.where(nan, self.ALIGN_LEFT, self.ALIGN_RIGHT).tolist()
+        elif kind in 'ib':
+            display = tooltip = values[start:stop].astype(str)
+        elif kind == 'c':
+            codes, display_labels, tooltip_labels, align_labels = values
+            codes = codes[start:stop]
+            display, tooltip, align = display_labels[codes], tooltip_labels[codes], align_labels[codes].tolist()
+        elif kind == 'n':
+            block = values.iloc[start:stop]
+            na = block.isna().to_numpy()
+            tooltip = display = block.to_numpy(dtype=object).astype(str)
+            if block.dtype.kind == 'f':
+                numbers = block.to_numpy(dtype=float, na_value=np.nan)
+                display = np.where(np.isinf(numbers), "Inf", np.char.mod('%.4f', numbers))
+            display = np.where(na, "NaN", display)
+            align = np.where(na, self.ALIGN_LEFT, self.ALIGN_RIGHT).tolist()
+        else:
+            block = values.iloc[start:stop]
+            # str() of each element, as the cell value itself prints (Timestamp, NaT, None, <NA>...)
+            tooltip = block.to_numpy(dtype=object).astype(str)
+            display = np.where(block.isna().to_numpy(), "NaN", tooltip)
+        return display.tolist(), tooltip.tolist(), align
+
+    def _cell_block(self, col, block):
+        """ Cached (display, tooltip, alignment) of one row block of one column. """
+        key = (col, block)
+        cached = self._block_cache.get(key)
+        if cached is not None:
+            self._block_cache.move_to_end(key)
+            return cached
+        start = block * PREVIEW_BLOCK_ROWS
+        rendered = self._format_block(col, start, min(start + PREVIEW_BLOCK_ROWS, self._n_rows))
+        self._block_cache[key] = rendered
+        if len(self._block_cache) > PREVIEW_CACHE_BLOCKS: self._block_cache.popitem(last=False)
+        return rendered
 
     def rowCount(self, parent=QModelIndex()) -> int:
-        if not parent.isValid(): return min(MAX_PREVIEW_ROWS, len(self._dataframe)) # Limit rows for performance
+        if not parent.isValid(): return self._loaded_rows
         return 0
 
     def columnCount(self, parent=QModelIndex()) -> int:
-        if not parent.isValid(): return len(self._dataframe.columns)
+        if not parent.isValid(): return len(self._columns)
         return 0
 
+    def canFetchMore(self, parent=QModelIndex()) -> bool:
+        if parent.isValid(): return False
+        return self._loaded_rows < self._n_rows
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid(): return
+        n_new = min(PREVIEW_FETCH_ROWS, self._n_rows - self._loaded_rows)
+        if n_new <= 0: return
+        self.beginInsertRows(QModelIndex(), self._loaded_rows, self._loaded_rows + n_new - 1)
+        self._loaded_rows += n_new
+        self.endInsertRows()
+
     def data(self, index: QModelIndex, role=Qt.ItemDataRole.DisplayRole):
-        if not index.isValid() or not (0 <= index.row() < self.rowCount() and 0 <= index.column() < self.columnCount()):
+        if not index.isValid(): return QVariant()
+        row, col = index.row(), index.column()
+        if not (0 <= row < self._loaded_rows and 0 <= col < len(self._columns)):
             return QVariant()
-        try:
-            value = self._dataframe.iloc[index.row(), index.column()]
-        except IndexError:
-             print(f"Warning: IndexError accessing data at {index.row()}, {index.column()}")
-             return QVariant()
 
         if role == Qt.ItemDataRole.DisplayRole:
-            if pd.isna(value): return QVariant("NaN")
-            if isinstance(value, (float, np.floating)):
-                if np.isinf(value): return QVariant("Inf")
-                return QVariant(f"{value:.4f}")
-            return QVariant(str(value))
+            return QVariant(self._cell_block(col, row // PREVIEW_BLOCK_ROWS)[0][row % PREVIEW_BLOCK_ROWS])
         elif role == Qt.ItemDataRole.ToolTipRole:
-            return QVariant(str(value))
+            return QVariant(self._cell_block(col, row // PREVIEW_BLOCK_ROWS)[1][row % PREVIEW_BLOCK_ROWS])
         elif role == Qt.ItemDataRole.TextAlignmentRole:
-            if isinstance(value, (int, float, np.number)) and not pd.isna(value):
-                 return QVariant(int(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter))
-            else:
-                 return QVariant(int(Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter))
+            align = self._cell_block(col, row // PREVIEW_BLOCK_ROWS)[2]
+            return QVariant(align if isinstance(align, int) else align[row % PREVIEW_BLOCK_ROWS])
         return QVariant()
 
     def headerData(self, section: int, orientation: Qt.Orientation, role=Qt.ItemDataRole.DisplayRole):
         if role == Qt.ItemDataRole.DisplayRole:
             if orientation == Qt.Orientation.Horizontal:
-                if 0 <= section < len(self._dataframe.columns): return QVariant(str(self._dataframe.columns[section]))
+                if 0 <= section < len(self._columns): return QVariant(str(self._dataframe.columns[section]))
             if orientation == Qt.Orientation.Vertical:
-                if self._dataframe.index.name:
-                     if 0 <= section < self.rowCount(): return QVariant(str(self._dataframe.index[section]))
+                if self._dataframe is not None and self._dataframe.index.name:
+                     if 0 <= section < self._loaded_rows: return QVariant(str(self._dataframe.index[section]))
                 return QVariant(str(section + 1))
         return QVariant()
 
     def get_dataframe(self): return self._dataframe
 
     def update_dataframe(self, new_dataframe: pd.DataFrame = None):
+        """ Swaps the frame; re-resolves column kinds/alignment and drops the block cache. """
         self.beginResetModel()
-        self._dataframe = new_dataframe if new_dataframe is not None else pd.DataFrame()
+        self._set_dataframe(new_dataframe)
         self.endResetModel()
-        if not self._dataframe.empty:
-            print(f"PandasModel updated. Displaying {self.rowCount()} of {len(self._dataframe)} rows.")
+        if self._dataframe is not None and not self._dataframe.empty:
+            print(f"PandasModel updated. {self._loaded_rows} of {self._n_rows} rows exposed (more fetched on scroll).")
+
+
+class CancelToken:
+    """ Cancellation flag that also works across processes: a marker file in the temp dir.
+        It is picklable and cheap to poll (one stat call), so fits in loky/child processes can check it. """
+    def __init__(self):
+        self.path = os.path.join(tempfile.gettempdir(), f"mlclient_cancel_{os.getpid()}_{uuid.uuid4().hex}")
+
+    def set(self):
+        try: open(self.path, 'w').close()
+        except OSError as e: print(f"Warning: could not write cancel marker {self.path}: {e}")
+
+    def is_set(self): return os.path.exists(self.path)
+
+    def discard(self):
+        try: os.remove(self.path)
+        except OSError: pass
 
 
 class Worker(QThread):
@@ -132,11 +379,13 @@ class Worker(QThread):
     error = pyqtSignal(tuple)
     progress = pyqtSignal(int) # Emit percentage progress
     status_update = pyqtSignal(str) # Emit text status updates
+    cancelled = pyqtSignal() # Emitted once the job has actually stopped after stop()
 
     def __init__(self, func, *args, **kwargs):
         super().__init__()
         self.func = func; self.args = args; self.kwargs = kwargs
         self._is_running = True
+        self.cancel_token = CancelToken()
 
     def run(self):
         try:
@@ -148,9 +397,15 @@ class Worker(QThread):
                 exc_type, exc_value, tb = sys.exc_info()
                 tb_str = "".join(traceback.format_exception(exc_type, exc_value, tb))
                 self.error.emit((exc_type, exc_value, tb_str))
+        finally:
+            if not self._is_running: self.cancelled.emit()
+            self.cancel_token.discard()
+
+    def is_cancelled(self): return not self._is_running
 
     def stop(self):
         self._is_running = False
+        if self.isRunning(): self.cancel_token.set() # Polled by fits, also inside child processes
         self.status_update.emit("操作已取消...")
 
 
@@ -174,6 +429,1741 @@ def get_icon(name, fallback_name=None, color=None, color_disabled=None):
             pass
     return QIcon()
 
+# --- Data Ingestion ---
+def _is_text_dtype(dtype):
+    """ True for object columns and pandas string columns. """
+    return dtype == object or isinstance(dtype, pd.StringDtype)
+
+def downcast_series(s: pd.Series, category_max_levels=CATEGORY_MAX_LEVELS, category_max_ratio=CATEGORY_MAX_RATIO):
+    """ Returns a compact version of a column: int64->int16/int32, float64->float32 (only if every value
+        survives the round trip), low-cardinality text->category. Other dtypes are returned unchanged. """
+    if s.dtype == np.int64:
+        if s.empty: return s
+        lo, hi = s.min(), s.max()
+        for target in (np.int16, np.int32):
+            info = np.iinfo(target)
+            if info.min <= lo and hi <= info.max: return s.astype(target)
+        return s
+    if s.dtype == np.float64:
+        values = s.to_numpy()
+        with np.errstate(over='ignore'): compact = values.astype(np.float32) # Overflow gives inf: not equal, kept
+        if np.array_equal(values, compact, equal_nan=True): return pd.Series(compact, index=s.index, name=s.name)
+        return s
+    if _is_text_dtype(s.dtype) and len(s) > 0:
+        n_unique = s.nunique(dropna=True)
+        if n_unique <= category_max_levels and n_unique <= category_max_ratio * len(s):
+            return s.astype('category')
+    return s
+
+def downcast_dataframe(df: pd.DataFrame, **kwargs):
+    """ Applies downcast_series to every column (column by column, so only one extra column is alive). """
+    for col in df.columns:
+        df[col] = downcast_series(df[col], **kwargs)
+    return df
+
+def _concat_column_parts(parts, category_max_levels=CATEGORY_MAX_LEVELS, category_max_ratio=CATEGORY_MAX_RATIO):
+    """ Concatenates the per-chunk pieces of one column and decides its final dtype once, over all rows.
+
+        The pieces are only compacted losslessly (see read_csv_chunked), so concatenating promotes them to
+        a common dtype (int16 + int32 -> int32, float32 + float64 -> float64, ...) that downcast_series
+        then shrinks again from the whole column, never from what a single chunk happened to contain.
+    """
+    n_rows = sum(len(p) for p in parts)
+    if all(isinstance(p.dtype, pd.CategoricalDtype) for p in parts):
+        # Chunks usually see different level sets; union them instead of falling back to object
+        merged = pd.Series(pd.api.types.union_categoricals(parts, ignore_order=True), name=parts[0].name)
+        n_levels = len(merged.cat.categories)
+        if n_levels <= category_max_levels and n_levels <= category_max_ratio * n_rows: return merged
+        return merged.astype(merged.cat.categories.dtype)
+    parts = [p.astype(p.cat.categories.dtype) if isinstance(p.dtype, pd.CategoricalDtype) else p for p in parts]
+    return downcast_series(pd.concat(parts, ignore_index=True), category_max_levels=0)
+
+def read_csv_chunked(file_path, progress_signal=None, status_signal=None, chunk_rows=CSV_CHUNK_ROWS,
+                     progress_range=(5, 90)):
+    """ Streams a CSV file in chunks of `chunk_rows` rows and builds a compact DataFrame.
+
+        Every chunk is compacted losslessly right after parsing and stored per column. Columns are then
+        concatenated one at a time, their final dtype decided over all rows, and their chunk pieces
+        released, so peak memory is roughly 1x the final compact frame + its largest column + one raw
+        (un-downcast) chunk, independent of the size of the CSV text. Progress is reported from the real
+        byte offset.
+    """
+    file_size = max(os.path.getsize(file_path), 1)
+    p_start, p_end = progress_range
+    column_parts = {}; column_order = None; n_rows = 0
+
+    with open(file_path, 'rb') as fh, pd.read_csv(fh, chunksize=chunk_rows) as reader:
+        for chunk in reader:
+            if column_order is None:
+                column_order = list(chunk.columns)
+                column_parts = {col: [] for col in column_order}
+            for col in column_order:
+                # Lossless per-chunk compaction only: the level-ratio test needs the whole column
+                column_parts[col].append(downcast_series(chunk[col], category_max_ratio=1.0))
+            n_rows += len(chunk)
+            del chunk
+            check_cancelled()
+            if progress_signal is not None:
+                progress_signal.emit(p_start + int((p_end - p_start) * min(fh.tell() / file_size, 1.0)))
+            if status_signal is not None:
+                status_signal.emit(f"已读取 {n_rows:,} 行 ({fh.tell() / 1024**2:,.0f} / {file_size / 1024**2:,.0f} MB)...")
+
+    if column_order is None: return pd.DataFrame()
+
+    if status_signal is not None: status_signal.emit("合并数据块...")
+    columns = {}
+    for col in column_order:
+        columns[col] = _concat_column_parts(column_parts.pop(col))
+    return pd.DataFrame(columns, copy=False)
+
+
+class DatasetCache:
+    """ On-disk Feather cache of loaded (normalised) datasets, keyed by path + size + mtime.
+
+        Files are written uncompressed and as a single record batch so they can be memory-mapped on load.
+        Hits refresh the file mtime, which is used as the LRU clock when the total size exceeds `max_bytes`.
+    """
+    SUFFIX = ".feather"
+
+    def __init__(self, cache_dir=DATASET_CACHE_DIR, max_bytes=DATASET_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    @property
+    def enabled(self): return bool(pa_feather)
+
+    def _key(self, file_path):
+        st = os.stat(file_path)
+        ident = f"{os.path.abspath(file_path)}|{st.st_size}|{st.st_mtime_ns}|{DATASET_CACHE_FORMAT}"
+        return hashlib.sha1(ident.encode('utf-8')).hexdigest()
+
+    def _entry_path(self, file_path):
+        return os.path.join(self.cache_dir, self._key(file_path) + self.SUFFIX)
+
+    def _entries(self):
+        """ (path, size, mtime) of all cache files, oldest first. """
+        if not os.path.isdir(self.cache_dir): return []
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(self.SUFFIX): continue
+            path = os.path.join(self.cache_dir, name)
+            try: st = os.stat(path)
+            except OSError: continue
+            entries.append((path, st.st_size, st.st_mtime))
+        return sorted(entries, key=lambda e: e[2])
+
+    def cached_path(self, file_path):
+        """ Path of the (uncompressed Feather) cache entry for `file_path`, or None on a miss. """
+        if not self.enabled: return None
+        try: path = self._entry_path(file_path)
+        except OSError: return None
+        return path if os.path.exists(path) else None
+
+    def load(self, file_path):
+        """ Returns the cached DataFrame for `file_path` or None on a miss. Columns Arrow hands over without
+            conversion (numeric without missing values, str) are read-only views of the mapped file; the
+            others (with NaN, category) are converted into memory. """
+        if not self.enabled: return None
+        try:
+            path = self._entry_path(file_path)
+            if not os.path.exists(path): return None
+            # No block consolidation (it would copy the mapped columns); converted Arrow columns freed as they go
+            df = pa_feather.read_table(path, memory_map=True).to_pandas(split_blocks=True, self_destruct=True)
+            os.utime(path) # LRU touch
+            return df
+        except Exception as e:
+            print(f"Warning: dataset cache read failed for {file_path}: {e}")
+            return None
+
+    def store(self, file_path, df: pd.DataFrame):
+        """ Writes `df` as the cache entry for `file_path`, then evicts old entries. Returns True on success. """
+        if not self.enabled: return False
+        tmp_path = None
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = self._entry_path(file_path)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            # One record batch: several would have to be concatenated (copied) to form a column on load
+            pa_feather.write_feather(df.reset_index(drop=True), tmp_path, compression='uncompressed', chunksize=max(len(df), 1))
+            os.replace(tmp_path, path)
+            self.evict()
+            return True
+        except Exception as e:
+            print(f"Warning: dataset cache write failed for {file_path}: {e}")
+            if tmp_path and os.path.exists(tmp_path):
+                try: os.remove(tmp_path)
+                except OSError: pass
+            return False
+
+    def evict(self):
+        """ Removes least recently used entries until the cache fits in `max_bytes`. """
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total <= self.max_bytes: break
+            try: os.remove(path); total -= size
+            except OSError as e: print(f"Warning: could not evict cache file {path}: {e}")
+
+    def size_bytes(self): return sum(size for _, size, _ in self._entries())
+
+    def clear(self):
+        """ Deletes all cache entries. Returns the number of bytes freed. """
+        freed = 0
+        for path, size, _ in self._entries():
+            try: os.remove(path); freed += size
+            except OSError as e: print(f"Warning: could not remove cache file {path}: {e}")
+        return freed
+
+
+dataset_cache = DatasetCache()
+
+
+# --- Instrumentation ---
+_rss_process = None
+
+def current_rss_bytes():
+    """ Resident set size of this process (psutil, else /proc on Linux), or None if unavailable. """
+    global _rss_process
+    if psutil:
+        if _rss_process is None: _rss_process = psutil.Process()
+        return _rss_process.memory_info().rss
+    try:
+        with open('/proc/self/statm') as f: return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+class SpanRecorder:
+    """ Nested, timed spans of one job with the RSS change over each span. Spans are plain dicts, so the
+        recorder travels back from pool workers inside the job result. """
+    def __init__(self):
+        self.spans = []; self._depth = 0
+        self.origin = time.perf_counter(); self.pid = os.getpid()
+
+    @contextlib.contextmanager
+    def span(self, name, **args):
+        entry = {'name': name, 'start': time.perf_counter() - self.origin, 'depth': self._depth,
+                 'pid': self.pid, 'tid': threading.get_ident(), 'args': args}
+        rss_before = current_rss_bytes()
+        self._depth += 1
+        try: yield entry
+        finally:
+            self._depth -= 1
+            entry['duration'] = time.perf_counter() - self.origin - entry['start']
+            rss_after = current_rss_bytes()
+            entry['rss_delta'] = rss_after - rss_before if rss_after is not None and rss_before is not None else None
+            self.spans.append(entry)
+
+    def ordered(self): return sorted(self.spans, key=lambda s: (s['start'], s['depth']))
+
+@contextlib.contextmanager
+def profile_capture(mode, out):
+    """ Runs the block under cProfile or pyinstrument (`mode` from PROFILE_MODES; None does nothing).
+        Fills `out` with 'mode', 'text' (summary) and 'pstats' (marshalled cProfile stats) or 'html'. """
+    if mode == 'pyinstrument':
+        try: from pyinstrument import Profiler as _Pyinstrument
+        except ImportError:
+            print("Warning: pyinstrument not installed, profiling with cProfile instead.")
+            mode = 'cprofile'
+    if mode is None:
+        yield; return
+    out['mode'] = mode
+    if mode == 'pyinstrument':
+        profiler = _Pyinstrument(); profiler.start()
+        try: yield
+        finally:
+            profiler.stop()
+            out['text'] = profiler.output_text(unicode=True, color=False); out['html'] = profiler.output_html()
+        return
+    profiler = cProfile.Profile(); profiler.enable()
+    try: yield
+    finally:
+        profiler.disable(); profiler.create_stats()
+        out['pstats'] = marshal.dumps(profiler.stats) # Same format as dump_stats(); taken first, pstats.Stats() empties it
+        text = io.StringIO()
+        pstats.Stats(profiler, stream=text).sort_stats('cumulative').print_stats(PROFILE_TOP_FUNCTIONS)
+        out['text'] = text.getvalue()
+
+def format_span_report(spans):
+    """ Text table of spans (indented by nesting) with share of the outermost span and RSS change. """
+    if not spans: return "(无记录)"
+    total = max(s['duration'] for s in spans if s['depth'] == 0) or 1e-9
+    lines = [f"{'阶段':<40}{'耗时(ms)':>10}{'占比':>6}{'内存变化(MB)':>10}"] # CJK headers are two columns wide
+    for s in spans:
+        rss = f"{s['rss_delta'] / 1024**2:+14.1f}" if s['rss_delta'] is not None else f"{'-':>14}"
+        lines.append(f"{'  ' * s['depth'] + s['name']:<42}{1000 * s['duration']:>12.1f}{s['duration'] / total:>8.1%}{rss}")
+    return "\n".join(lines)
+
+def spans_to_chrome_trace(spans):
+    """ Chrome trace event JSON (chrome://tracing, Perfetto): one complete ('X') event per span. """
+    events = [{'name': s['name'], 'ph': 'X', 'ts': round(s['start'] * 1e6, 1), 'dur': round(s['duration'] * 1e6, 1),
+               'pid': s['pid'], 'tid': s['tid'], 'cat': 'job',
+               'args': {**{k: str(v) for k, v in s['args'].items()},
+                        **({'rss_delta_mb': round(s['rss_delta'] / 1024**2, 2)} if s['rss_delta'] is not None else {})}}
+              for s in spans]
+    return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+
+# --- Data Profiling ---
+def hll_distinct(hashes, precision=HLL_PRECISION):
+    """ HyperLogLog estimate of the number of distinct values given their 64-bit hashes (uint64 array).
+        Relative standard error is about 1.04 / sqrt(2**precision); small counts use linear counting. """
+    if len(hashes) == 0: return 0
+    m = 1 << precision
+    idx = (hashes >> np.uint64(64 - precision)).astype(np.intp)
+    rest = hashes & np.uint64((1 << (64 - precision)) - 1) # < 2**52 for precision >= 12: exact as float64
+    bit_length = np.zeros(len(rest), dtype=np.int64); nonzero = rest > 0
+    bit_length[nonzero] = np.floor(np.log2(rest[nonzero].astype(np.float64))).astype(np.int64) + 1
+    registers = np.zeros(m, dtype=np.int64)
+    np.maximum.at(registers, idx, 64 - precision - bit_length + 1) # Rank = leading zeros + 1
+    estimate = 0.7213 / (1 + 1.079 / m) * m * m / np.sum(np.ldexp(1.0, -registers))
+    empty = int(np.count_nonzero(registers == 0))
+    if estimate <= 2.5 * m and empty: estimate = m * np.log(m / empty)
+    return int(round(estimate))
+
+def profile_blocks(df: pd.DataFrame, block_cells=PROFILE_BLOCK_CELLS, max_columns=PROFILE_BLOCK_MAX_COLUMNS):
+    """ Splits the columns of `df` into profiling jobs of at most `block_cells` cells / `max_columns` columns. """
+    per_block = int(max(1, min(max_columns, block_cells // max(len(df), 1))))
+    columns = list(df.columns)
+    return [columns[i:i + per_block] for i in range(0, len(columns), per_block)]
+
+def profile_columns(df: pd.DataFrame, columns, top_k=PROFILE_TOP_K):
+    """ Data-quality statistics for a block of columns: null count, distinct estimate (HyperLogLog), min/max/
+        mean/std for numeric columns (one 2-D nan-aware pass over the whole numeric block), top-k values and
+        memory usage. Returns {column: stats}; values are plain Python types so results pickle cheaply. """
+    block = df[columns]
+    n_rows = len(block)
+    nulls = block.isna().sum().to_numpy()
+    memory = block.memory_usage(deep=True, index=False).to_numpy()
+    stats = {col: {'dtype': str(block[col].dtype), 'rows': n_rows, 'nulls': int(nulls[i]), 'memory': int(memory[i])}
+             for i, col in enumerate(columns)}
+
+    numeric = [col for col in columns if pd.api.types.is_numeric_dtype(block[col]) and not pd.api.types.is_bool_dtype(block[col])]
+    if numeric and n_rows:
+        values = block[numeric].to_numpy(dtype=np.float64, na_value=np.nan)
+        with warnings.catch_warnings(), np.errstate(all='ignore'):
+            warnings.simplefilter('ignore', RuntimeWarning) # All-NaN columns
+            summary = np.vstack([np.nanmin(values, axis=0), np.nanmax(values, axis=0), np.nanmean(values, axis=0), np.nanstd(values, axis=0, ddof=1)])
+        del values
+        for col, (lo, hi, mean, std) in zip(numeric, summary.T):
+            stats[col].update(min=float(lo), max=float(hi), mean=float(mean), std=float(std))
+    for col in columns:
+        check_cancelled()
+        series = block[col]
+        if pd.api.types.is_datetime64_any_dtype(series) and stats[col]['nulls'] < n_rows:
+            stats[col].update(min=str(series.min()), max=str(series.max()))
+        present = series.dropna()
+        distinct = hll_distinct(pd.util.hash_pandas_object(present, index=False).to_numpy()) if len(present) else 0
+        stats[col]['distinct'] = min(distinct, len(present))
+        if len(present) and distinct <= len(present) // 2: # Nearly-unique columns have no meaningful top values
+            counts = present.value_counts(sort=True).head(top_k)
+            stats[col]['top'] = [(str(value), int(count)) for value, count in counts.items()]
+    return stats
+
+
+# --- Preprocessing Pipeline ---
+NATIVE_CATEGORICAL_ENCODING = "原生类别 (仅 LightGBM/XGBoost)" # Encoding option: keep one category-dtype column
+IMPUTE_STRATEGIES = {"均值 (Mean)": 'mean', "中位数 (Median)": 'median', "众数 (Most Frequent)": 'most_frequent', "常量 (Constant)": 'constant'}
+
+class PreprocessStepCache:
+    """ On-disk memo of fitted preprocessing steps, plugged in as the `memory` of the per-column Pipelines.
+
+        Each step result (fitted transformer + output) is a node of a per-column DAG raw -> impute ->
+        scale/encode, keyed by the step's class and parameters plus the key of its input: a content hash
+        for the raw column, the producing node's key for intermediate outputs. Changing one option thus
+        misses only that step and the steps downstream of it. `log` records (column, step, hit) per call.
+        Hits refresh the file mtime, the LRU clock used by evict(), as in DatasetCache.
+    """
+    SUFFIX = ".joblib"
+    _IGNORED_ARGS = ('message_clsname', 'message', 'caller', 'callback_ctx') # Logging/callback plumbing, not inputs
+
+    def __init__(self, cache_dir=None, max_bytes=None):
+        self.cache_dir = cache_dir or PREPROCESS_CACHE_DIR # Resolved per instance: jobs create their own
+        self.max_bytes = PREPROCESS_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self.log = []
+        self._produced = {} # id(output frame) -> (weakref, node key), so step outputs are never rehashed
+
+    def __deepcopy__(self, memo): return self # clone() deep-copies Pipeline params; all clones must share one log
+
+    def _input_key(self, X):
+        ref, key = self._produced.get(id(X), (None, None))
+        if ref is not None and ref() is X: return key
+        digest = hashlib.sha1(repr((list(X.columns), [str(t) for t in X.dtypes])).encode('utf-8'))
+        digest.update(pd.util.hash_pandas_object(X, index=False).to_numpy().tobytes())
+        return digest.hexdigest()
+
+    def cache(self, func, ignore=()):
+        """ joblib.Memory.cache interface, as called by Pipeline._fit for its _fit_transform_one helper. """
+        import sklearn
+        ignored = set(ignore) | set(self._IGNORED_ARGS)
+
+        def fit_transform_one(transformer, X, *args, **kwargs):
+            key = joblib.hash((PREPROCESS_CACHE_FORMAT, sklearn.__version__, transformer, self._input_key(X), args,
+                               {k: v for k, v in kwargs.items() if k not in ignored}))
+            path = os.path.join(self.cache_dir, key + self.SUFFIX)
+            result = None
+            if os.path.exists(path):
+                try: result = joblib.load(path); os.utime(path) # LRU touch
+                except Exception as e: print(f"Warning: preprocessing cache read failed ({e}), recomputing.")
+            hit = result is not None
+            if not hit:
+                result = func(transformer, X, *args, **kwargs)
+                self._store(path, result)
+            try: self._produced[id(result[0])] = (weakref.ref(result[0]), key)
+            except TypeError: pass # Not weak-referenceable (e.g. a plain ndarray): hashed if it reaches another step
+            self.log.append((str(X.columns[0]) if len(X.columns) else "", type(transformer).__name__, hit))
+            return result
+        return fit_transform_one
+
+    def _store(self, path, result):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            joblib.dump(result, tmp_path)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"Warning: preprocessing cache write failed: {e}")
+            if os.path.exists(tmp_path):
+                try: os.remove(tmp_path)
+                except OSError: pass
+
+    def _entries(self):
+        """ (path, size, mtime) of all cache files, oldest first. """
+        if not os.path.isdir(self.cache_dir): return []
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(self.SUFFIX): continue
+            path = os.path.join(self.cache_dir, name)
+            try: st = os.stat(path)
+            except OSError: continue
+            entries.append((path, st.st_size, st.st_mtime))
+        return sorted(entries, key=lambda e: e[2])
+
+    def evict(self):
+        """ Removes least recently used entries until the cache fits in `max_bytes`. """
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total <= self.max_bytes: break
+            try: os.remove(path); total -= size
+            except OSError as e: print(f"Warning: could not evict cache file {path}: {e}")
+
+    def size_bytes(self): return sum(size for _, size, _ in self._entries())
+
+    def clear(self):
+        """ Deletes all cache entries. Returns the number of bytes freed. """
+        freed = 0
+        for path, size, _ in self._entries():
+            try: os.remove(path); freed += size
+            except OSError as e: print(f"Warning: could not remove cache file {path}: {e}")
+        return freed
+
+    def report(self):
+        """ {'hits', 'steps', 'by_step': {class: [hits, steps]}, 'columns': {column: [(class, hit), ...]}} for the UI. """
+        by_step, columns = {}, {}
+        for column, step, hit in self.log:
+            counts = by_step.setdefault(step, [0, 0]); counts[0] += hit; counts[1] += 1
+            columns.setdefault(column, []).append((step, hit))
+        return {'hits': sum(hit for _, _, hit in self.log), 'steps': len(self.log), 'by_step': by_step, 'columns': columns}
+
+def set_step_memory(preprocessor, memory):
+    """ Sets `memory` on every per-column Pipeline of a (fitted or unfitted) preprocessor; None detaches it,
+        so fitted preprocessors saved with models or cloned for training never carry the cache. """
+    for _, transformer, _ in list(preprocessor.transformers) + list(getattr(preprocessor, 'transformers_', [])):
+        if hasattr(transformer, 'memory'): transformer.memory = memory
+    return preprocessor
+
+def build_preprocessor(df: pd.DataFrame, params, status_signal=None, memory=None):
+    """ Turns the preprocessing page settings into an unfitted ColumnTransformer with one small Pipeline
+        per selected column (imputer -> scaler/encoder). Unselected columns pass through unchanged, and
+        output names match what the old in-place steps produced (one-hot columns are `<col>_<level>`).
+        With params['impute_approx_error'] set, median/most-frequent imputation uses streaming sketches
+        (sketches.ApproxImputer) within that error bound instead of SimpleImputer. With a `memory`
+        (PreprocessStepCache) the Pipelines memoize their steps; they then end in a 'passthrough' step,
+        because a Pipeline never caches its last step. """
+    from sklearn.base import clone
+    from sklearn.compose import ColumnTransformer
+    from sklearn.impute import SimpleImputer
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import StandardScaler, MinMaxScaler, OneHotEncoder, OrdinalEncoder
+    selected = [c for c in params['selected_cols'] if c in df.columns]
+    numeric = df[selected].select_dtypes(include=np.number).columns.tolist()
+    categorical = [c for c in selected if c not in set(numeric)]
+
+    num_imputer = cat_imputer = None
+    strategy = IMPUTE_STRATEGIES.get(params['impute_strategy'])
+    if strategy:
+        fill_value = params['impute_constant']
+        if strategy == 'constant':
+            try: num_imputer = SimpleImputer(strategy='constant', fill_value=float(fill_value), keep_empty_features=True)
+            except (ValueError, TypeError):
+                if numeric and status_signal: status_signal.emit(f"警告: 无法将常量 '{fill_value}' 转为数值，数值列改用均值填充。")
+                num_imputer = SimpleImputer(strategy='mean', keep_empty_features=True)
+            cat_imputer = SimpleImputer(strategy='constant', fill_value=fill_value, keep_empty_features=True)
+        elif params.get('impute_approx_error') and strategy in ('median', 'most_frequent'):
+            from sketches import ApproxImputer # Own module: pickled into model files, loaded by batch_score.py too
+            num_imputer = ApproxImputer(strategy=strategy, error=params['impute_approx_error'])
+            cat_imputer = ApproxImputer(strategy='most_frequent', error=params['impute_approx_error'])
+        else:
+            num_imputer = SimpleImputer(strategy=strategy, keep_empty_features=True)
+            cat_imputer = SimpleImputer(strategy='most_frequent', keep_empty_features=True)
+
+    scaler = {"标准化 (StandardScaler)": StandardScaler, "归一化 (MinMaxScaler)": MinMaxScaler}.get(params['scale_strategy'])
+    encoder = {"独热编码 (One-Hot)": lambda: OneHotEncoder(handle_unknown='ignore', sparse_output=False, dtype=np.uint8), # 0/1: 1 byte per cell
+               "序号编码 (Ordinal)": lambda: OrdinalEncoder(handle_unknown='use_encoded_value', unknown_value=-1),
+               NATIVE_CATEGORICAL_ENCODING: native_category_encoder}.get(params['encode_strategy'])
+    encode_step = 'native' if params['encode_strategy'] == NATIVE_CATEGORICAL_ENCODING else 'encode'
+
+    transformers = []
+    for col in selected:
+        steps = []
+        if col in numeric:
+            if num_imputer is not None: steps.append(('impute', clone(num_imputer)))
+            if scaler is not None: steps.append(('scale', scaler()))
+        else:
+            if cat_imputer is not None and df[col].dtype != bool: steps.append(('impute', clone(cat_imputer))) # SimpleImputer rejects bool; it has no NaN
+            if encoder is not None: steps.append((encode_step, encoder()))
+        if steps and memory is not None: steps.append(('memo', 'passthrough'))
+        if steps: transformers.append((col, Pipeline(steps, memory=memory), [col]))
+    if encoder is not None and not categorical and status_signal: status_signal.emit("编码步骤跳过：选择中无类别列")
+    return ColumnTransformer(transformers, remainder='passthrough', verbose_feature_names_out=False).set_output(transform='pandas')
+
+def _restore_column_order(out: pd.DataFrame, columns):
+    """ Keeps surviving input columns in their original order and appends new (e.g. one-hot) columns. """
+    kept = [c for c in columns if c in out.columns]
+    known = set(kept)
+    return out[kept + [c for c in out.columns if c not in known]]
+
+def partition_transformers(transformers, n_parts):
+    """ Splits (name, pipeline, columns) entries into at most `n_parts` groups of similar cost (longest
+        first onto the least loaded group). Encoders cost several times a numeric step (hashing/sorting
+        labels), which the estimate reflects; the order inside a group follows `transformers`. """
+    def cost(pipeline): return sum(4 if name in ('encode', 'native') else 1 for name, _ in pipeline.steps)
+    loads = [(0, i) for i in range(max(1, min(n_parts, len(transformers))))]
+    groups = [[] for _ in loads]
+    for index in sorted(range(len(transformers)), key=lambda i: -cost(transformers[i][1])):
+        load, group = heapq.heappop(loads)
+        groups[group].append(index)
+        heapq.heappush(loads, (load + cost(transformers[index][1]), group))
+    return [[transformers[i] for i in sorted(group)] for group in groups if group]
+
+def _fit_preprocess_partition(part_no, transformers, X, cancel_token=None, cache_dir=None):
+    """ Fits the per-column Pipelines of one column partition (runs in a loky worker process) with their
+        own PreprocessStepCache on the shared cache directory. Returns the fitted Pipelines, their outputs
+        as one frame (shared back as a snapshot) with each Pipeline's column span, and the cache log. """
+    global _process_cancel_token
+    previous_token, _process_cancel_token = _process_cancel_token, cancel_token
+    try:
+        start = time.perf_counter()
+        X = _unshare_frames(X)
+        memory = PreprocessStepCache(cache_dir) if cache_dir else None
+        fitted, outputs, spans, position = {}, [], {}, 0
+        for name, pipeline, columns in transformers:
+            check_cancelled()
+            pipeline.set_output(transform='pandas').memory = memory
+            out = pipeline.fit_transform(X[columns])
+            pipeline.memory = None
+            fitted[name] = pipeline; outputs.append(out)
+            spans[name] = (position, position + out.shape[1]); position += out.shape[1]
+        frame = pd.concat(outputs, axis=1) if outputs else pd.DataFrame(index=X.index)
+        return {'part': part_no, 'fitted': fitted, 'output': _share_frames(frame, []), 'spans': spans,
+                'log': memory.log if memory is not None else [], 'seconds': time.perf_counter() - start}
+    finally:
+        _process_cancel_token = previous_token
+
+class _PartitionOutput:
+    """ Stands in for a per-column Pipeline already fitted by a partition worker while the parent runs the
+        ColumnTransformer's own fit: it hands back the worker's output, so stacking, output_indices_ etc.
+        come out exactly as in a serial fit. Replaced by the fitted Pipeline right after. """
+    def __init__(self, output): self.output = output
+    def __sklearn_clone__(self): return self
+    def fit(self, X, y=None): return self
+    def fit_transform(self, X, y=None, **params): return self.output
+    def transform(self, X): return self.output
+
+def fit_transform_column_parallel(preprocessor, df: pd.DataFrame, n_jobs, memory=None, progress_signal=None, status_signal=None):
+    """ fit_transform of a build_preprocessor() ColumnTransformer with its per-column Pipelines split into
+        column partitions fitted in parallel on a loky process pool (each partition receives only its columns,
+        as a FrameSnapshot). Partition outputs come back as snapshots and are stacked once by the
+        ColumnTransformer itself; progress advances per finished partition. `memory` (PreprocessStepCache)
+        supplies the cache directory and collects the workers' logs. Same result as preprocessor.fit_transform(df). """
+    from sklearn.base import clone
+    entries = [(name, clone(pipeline).set_params(memory=None), columns) for name, pipeline, columns in preprocessor.transformers]
+    parts = partition_transformers(entries, n_jobs * PREPROCESS_PARTITIONS_PER_JOB)
+    handles, results, done = [], {}, 0
+    if status_signal: status_signal.emit(f"按列并行预处理: {len(entries)} 列分为 {len(parts)} 个分区, {min(n_jobs, len(parts))} 个进程...")
+    try:
+        with joblib.parallel_config(backend='loky', inner_max_num_threads=1):
+            tasks = joblib.Parallel(n_jobs=min(n_jobs, len(parts)), return_as='generator_unordered')(
+                joblib.delayed(_fit_preprocess_partition)(i, part, _share_frames(df[[c for _, _, cols in part for c in cols]], handles),
+                                                          current_cancel_token(), memory.cache_dir if memory is not None else None)
+                for i, part in enumerate(parts))
+            try:
+                for result in tasks:
+                    check_cancelled()
+                    handles.append(result['output'])
+                    result['output'] = _unshare_frames(result['output'])
+                    results.update({name: (result, span) for name, span in result['spans'].items()})
+                    if memory is not None: memory.log.extend(result['log'])
+                    done += 1
+                    if status_signal: status_signal.emit(f"列分区 {done}/{len(parts)} 完成 ({result['seconds']:.1f}s)")
+                    if progress_signal: progress_signal.emit(100 * done // len(parts))
+            finally:
+                tasks.close() # Abort partitions not yet started (cancel / error)
+
+        specs = preprocessor.transformers
+        preprocessor.transformers = [(name, _PartitionOutput(results[name][0]['output'].iloc[:, slice(*results[name][1])]), columns)
+                                     for name, _, columns in specs]
+        try: out = preprocessor.fit_transform(df)
+        finally: preprocessor.transformers = specs
+        fitted = {name: result['fitted'][name] for name, (result, _) in results.items()}
+        preprocessor.transformers_ = [(name, fitted.get(name, transformer), columns) for name, transformer, columns in preprocessor.transformers_]
+        return out
+    finally:
+        for handle in handles:
+            if isinstance(handle, FrameSnapshot): handle.release()
+
+def restrict_preprocessor(preprocessor: ColumnTransformer, features, sparse_onehot=False):
+    """ Unfitted copy of a fitted preprocessor reduced to the input columns that produce `features`. With
+        `sparse_onehot`, the copy outputs a CSR matrix if its one-hot encoders produced at least
+        SPARSE_ONEHOT_MIN_COLUMNS levels.
+        Returns (transformer, input_columns), or (None, None) if some feature is not one of its outputs. """
+    from sklearn.base import clone
+    from sklearn.compose import ColumnTransformer
+    wanted = set(features)
+    outputs = preprocessor.get_feature_names_out()
+    if not wanted.issubset(outputs): return None, None
+    inputs, transformers, onehot_levels = [], [], 0
+    for name, transformer, cols in preprocessor.transformers_:
+        produced = set(outputs[preprocessor.output_indices_[name]])
+        if name == 'remainder':
+            names = [preprocessor.feature_names_in_[c] if isinstance(c, (int, np.integer)) else c for c in cols]
+            inputs += [c for c in names if c in wanted] # Passthrough keeps names
+        elif produced & wanted:
+            transformers.append((name, clone(transformer), cols)); inputs += list(cols)
+            if _onehot_step(transformer) is not None: onehot_levels += len(produced)
+    restricted = ColumnTransformer(transformers, remainder='passthrough', verbose_feature_names_out=False)
+    return with_sparse_onehot(restricted, sparse_onehot and onehot_levels >= SPARSE_ONEHOT_MIN_COLUMNS), inputs
+
+def _onehot_step(transformer):
+    """ The OneHotEncoder 'encode' step of a per-column pipeline, or None. """
+    from sklearn.preprocessing import OneHotEncoder
+    encoder = getattr(transformer, 'named_steps', {}).get('encode')
+    return encoder if isinstance(encoder, OneHotEncoder) else None
+
+def with_sparse_onehot(preprocessor: ColumnTransformer, sparse_onehot):
+    """ Sets an unfitted ColumnTransformer to sparse mode (one-hot encoders emit CSR, combined with the other
+        outputs by scipy.sparse.hstack: memory and time follow the non-zeros, not rows x levels) or to the
+        usual dense DataFrame output. """
+    for _, transformer, _ in preprocessor.transformers:
+        encoder = _onehot_step(transformer)
+        if encoder is not None: encoder.set_params(sparse_output=sparse_onehot)
+    preprocessor.set_params(sparse_threshold=1.0 if sparse_onehot else 0.0)
+    return preprocessor.set_output(transform='default' if sparse_onehot else 'pandas')
+
+def native_category_encoder():
+    """ Ordinal codes for a 'native' pipeline step; unknown and missing values get -1 (NaN after casting). """
+    from sklearn.preprocessing import OrdinalEncoder
+    return OrdinalEncoder(handle_unknown='use_encoded_value', unknown_value=-1, encoded_missing_value=-1)
+
+def native_categorical_preprocessor(preprocessor, features, df: pd.DataFrame):
+    """ Like restrict_preprocessor, but each encoded (one-hot / ordinal) categorical column becomes one 'native'
+        category column instead; without a preprocessor, the non-numeric `features` of `df` get such a step.
+        Returns (unfitted transformer, input_columns, model_features) or None if no feature is categorical. """
+    from sklearn.base import clone
+    from sklearn.compose import ColumnTransformer
+    from sklearn.pipeline import Pipeline
+    if preprocessor is None:
+        categorical = [c for c in features if not (pd.api.types.is_numeric_dtype(df[c]) or pd.api.types.is_bool_dtype(df[c]))]
+        if not categorical: return None
+        transformers = [(c, Pipeline([('native', native_category_encoder())]), [c]) for c in categorical]
+        return (ColumnTransformer(transformers, remainder='passthrough', verbose_feature_names_out=False).set_output(transform='pandas'),
+                list(features), list(features))
+    wanted = set(features)
+    outputs = preprocessor.get_feature_names_out()
+    if not wanted.issubset(outputs): return None
+    source, inputs, transformers = {}, [], []
+    for name, transformer, cols in preprocessor.transformers_:
+        produced = list(outputs[preprocessor.output_indices_[name]])
+        if name == 'remainder':
+            names = [preprocessor.feature_names_in_[c] if isinstance(c, (int, np.integer)) else c for c in cols]
+            inputs += [c for c in names if c in wanted]; source.update((c, c) for c in names)
+            continue
+        if not wanted.intersection(produced): continue
+        steps = getattr(transformer, 'steps', [])
+        if any(step in ('encode', 'native') for step, _ in steps):
+            # the 'memo' passthrough only exists so a memoized Pipeline caches its real last step; 'native' now ends it
+            transformer = Pipeline([(step, est if est == 'passthrough' else clone(est)) for step, est in steps
+                                    if step not in ('encode', 'native', 'memo')] + [('native', native_category_encoder())])
+            source.update((c, cols[0]) for c in produced)
+        else:
+            transformer = clone(transformer); source.update((c, c) for c in produced)
+        transformers.append((name, transformer, cols)); inputs += list(cols)
+    if not any('native' in t.named_steps for _, t, _ in transformers if hasattr(t, 'named_steps')): return None
+    restricted = ColumnTransformer(transformers, remainder='passthrough', verbose_feature_names_out=False).set_output(transform='pandas')
+    return restricted, inputs, list(dict.fromkeys(source[f] for f in features))
+
+def head_rows(X, n):
+    """ First `n` rows of a model input (DataFrame or sparse matrix). """
+    return X[:n] if hasattr(X, 'tocsr') else X.iloc[:n]
+
+
+# --- Job Control ---
+class OperationCancelled(Exception):
+    """ Raised inside a job when the user cancelled it from the progress dialog. """
+
+_process_cancel_token = None # Token of the job running in this (child) process, if any
+
+def current_cancel_token():
+    """ CancelToken of the job running on this thread: the Worker's, or the one handed to a child process. """
+    thread = QThread.currentThread()
+    if isinstance(thread, Worker): return thread.cancel_token
+    return _process_cancel_token
+
+def is_cancel_requested():
+    """ True when the job running the current code has been asked to stop. """
+    token = current_cancel_token()
+    return token is not None and token.is_set()
+
+def check_cancelled():
+    if is_cancel_requested(): raise OperationCancelled("操作已取消")
+
+class _ProgressRange:
+    """ Maps 0-100 progress values emitted by a sub-task into [start, end] of the parent signal. """
+    def __init__(self, signal, start, end):
+        self.signal = signal; self.start = start; self.end = end
+
+    def emit(self, value):
+        self.signal.emit(int(self.start + (self.end - self.start) * value / 100))
+
+def split_core_budget(n_tasks, total_cores=None):
+    """ Splits the machine's cores between `n_tasks` concurrent tasks.
+        Returns (concurrent_tasks, threads_per_task) with their product <= cores. """
+    cores = total_cores or os.cpu_count() or 1
+    outer = max(1, min(n_tasks, cores))
+    return outer, max(1, cores // outer)
+
+
+# --- Process Pool ---
+class FrameSnapshot:
+    """ Immutable export of one DataFrame version: an Arrow IPC file in the temp dir that every process
+        memory-maps read-only. Columns Arrow can hand over without conversion (numeric without NaN, str)
+        are zero-copy views of the mapping, so handing a frame to a job costs no copy in the GUI process
+        and, for those columns, none in the worker either. Only the path crosses the process pipe. """
+    def __init__(self, df: pd.DataFrame, path=None):
+        self.path = path or os.path.join(tempfile.gettempdir(), f"{SNAPSHOT_PREFIX}{uuid.uuid4().hex}.arrow")
+        self.columns = None # All columns; see select()
+        self.frame_bytes = int(df.memory_usage(deep=True).sum())
+        table = pa.Table.from_pandas(df)
+        try:
+            with pa.OSFile(self.path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        except BaseException:
+            self.release()
+            raise
+        self.file_bytes = os.path.getsize(self.path)
+
+    def to_frame(self, report=None) -> pd.DataFrame:
+        """ Read-only, memory-mapped frame. `report` (dict) receives the zero-copy/copied byte counts. """
+        buf = pa.memory_map(self.path).read_buffer()
+        table = pa.ipc.open_file(buf).read_all()
+        if self.columns is not None: table = table.select(self.columns)
+        df = table.to_pandas(split_blocks=True) # No block consolidation copy
+        if report is not None:
+            lo, hi = buf.address, buf.address + buf.size
+            mapped = sum(int(df[col].memory_usage(index=False, deep=True)) for col in df.columns if _is_mapped(df[col], lo, hi))
+            frame_bytes = self.frame_bytes if self.columns is None else int(df.memory_usage(index=False, deep=True).sum())
+            report['zero_copy_bytes'] = report.get('zero_copy_bytes', 0) + mapped
+            report['copied_bytes'] = report.get('copied_bytes', 0) + frame_bytes - mapped
+        return df
+
+    def select(self, columns):
+        """ A view of the same file that a worker reads back as only `columns`: jobs on a few columns of a
+            wide frame then skip converting the rest. The view never owns the file (release() it via the original). """
+        view = object.__new__(FrameSnapshot)
+        view.__dict__.update(self.__dict__, columns=list(columns))
+        return view
+
+    def release(self):
+        """ Deletes the file. Mappings already open stay valid (POSIX); on Windows a mapped file cannot be
+            deleted yet, so it is left to the next sweep. """
+        try: os.remove(self.path)
+        except FileNotFoundError: pass
+        except OSError as e: print(f"Warning: snapshot {self.path} still in use, not deleted: {e}")
+
+def _is_mapped(series, lo, hi):
+    """ True if the column's data buffers all lie inside the address range [lo, hi) of a mapping. """
+    values = series.array
+    if hasattr(values, '_pa_array'): # Arrow-backed (e.g. pandas str)
+        addresses = [b.address for chunk in values._pa_array.chunks for b in chunk.buffers() if b is not None]
+    elif isinstance(series.dtype, np.dtype):
+        addresses = [series.to_numpy().__array_interface__['data'][0]]
+    else:
+        return False
+    return bool(addresses) and all(lo <= a < hi for a in addresses)
+
+class FrameSnapshotStore:
+    """ One FrameSnapshot per live DataFrame object (a frame version): created on first hand-off, or adopted
+        when the frame itself was produced from a snapshot by a worker, and deleted when the frame is
+        garbage collected. Frames must not be modified in place after being handed to a job (the app
+        replaces dataframe/processed_dataframe rather than mutating them). """
+    def __init__(self):
+        self._snapshots = {} # id(df) -> (weakref to df, FrameSnapshot)
+        self.sweep()
+
+    def get(self, df: pd.DataFrame):
+        """ Returns (snapshot, reused); `reused` is False when the frame had to be exported now. """
+        entry = self._snapshots.get(id(df))
+        if entry is not None and entry[0]() is df: return entry[1], True
+        snapshot = FrameSnapshot(df)
+        self.adopt(df, snapshot)
+        return snapshot, False
+
+    def adopt(self, df: pd.DataFrame, snapshot):
+        self._snapshots[id(df)] = (weakref.ref(df, lambda _, key=id(df): self._forget(key)), snapshot)
+
+    def _forget(self, key):
+        entry = self._snapshots.pop(key, None)
+        if entry is not None: entry[1].release()
+
+    def clear(self):
+        while self._snapshots: self._forget(next(iter(self._snapshots)))
+
+    @staticmethod
+    def sweep(max_age_seconds=24 * 3600):
+        """ Removes snapshot files left behind by crashed sessions. """
+        tmp = tempfile.gettempdir(); now = time.time()
+        try: names = [n for n in os.listdir(tmp) if n.startswith(SNAPSHOT_PREFIX)]
+        except OSError: return
+        for name in names:
+            path = os.path.join(tmp, name)
+            try:
+                if now - os.path.getmtime(path) > max_age_seconds: os.remove(path)
+            except OSError: pass
+
+def _share_frames(obj, handles):
+    """ Replaces DataFrames in (nested) tuples/lists/dicts with FrameSnapshots (also appended to `handles`). """
+    if pa and isinstance(obj, pd.DataFrame):
+        try: snapshot = FrameSnapshot(obj)
+        except (pa.ArrowException, OSError, TypeError, ValueError) as e:
+            print(f"Warning: snapshot transfer unavailable for this frame, pickling instead: {e}")
+            return obj
+        handles.append(snapshot)
+        return snapshot
+    if isinstance(obj, tuple): return tuple(_share_frames(v, handles) for v in obj)
+    if isinstance(obj, list): return [_share_frames(v, handles) for v in obj]
+    if isinstance(obj, dict): return {k: _share_frames(v, handles) for k, v in obj.items()}
+    return obj
+
+def _unshare_frames(obj, report=None, adopt=None):
+    """ Inverse of _share_frames: maps snapshots back to (read-only) frames. `adopt(df, snapshot)` is called
+        for each, so the receiver can keep the file as that frame's snapshot instead of exporting it again. """
+    if isinstance(obj, FrameSnapshot):
+        df = obj.to_frame(report)
+        if adopt is not None: adopt(df, obj)
+        return df
+    if isinstance(obj, tuple): return tuple(_unshare_frames(v, report, adopt) for v in obj)
+    if isinstance(obj, list): return [_unshare_frames(v, report, adopt) for v in obj]
+    if isinstance(obj, dict): return {k: _unshare_frames(v, report, adopt) for k, v in obj.items()}
+    return obj
+
+_pool_event_queue = None # multiprocessing.Queue back to the GUI, set in each pool worker
+
+class _QueueSignal:
+    """ Stand-in for a Worker signal inside a pool worker: .emit() posts (job_id, kind, value) to the GUI. """
+    def __init__(self, job_id, kind):
+        self.job_id = job_id; self.kind = kind; self._last = None
+
+    def emit(self, value):
+        if value == self._last: return # Progress callbacks repeat values a lot
+        self._last = value
+        _pool_event_queue.put((self.job_id, self.kind, value))
+
+def _pool_initializer(event_queue):
+    global _pool_event_queue
+    _pool_event_queue = event_queue
+    event_queue.put((None, 'pid', os.getpid())) # Lets the GUI terminate its workers without pool internals
+
+def _pool_warmup():
+    """ Forces a worker to start and imports the ML stack in it (importing this module alone no longer does). """
+    warm_imports(None, None)
+    return os.getpid()
+
+def _run_pool_job(job_id, func, args, kwargs, cancel_token):
+    """ Runs `func(progress, status, *args, **kwargs)` in a pool worker, like Worker.run does in a thread.
+        Result frames are exported as snapshots that the GUI adopts (and later deletes). """
+    global _process_cancel_token
+    _process_cancel_token = cancel_token
+    try:
+        report = {}
+        args, kwargs = _unshare_frames(args, report), _unshare_frames(kwargs, report)
+        if report: _pool_event_queue.put((job_id, 'memory', report))
+        result = func(_QueueSignal(job_id, 'progress'), _QueueSignal(job_id, 'status'), *args, **kwargs)
+        return _share_frames(result, [])
+    finally:
+        _process_cancel_token = None
+
+class ProcessJob(QObject):
+    """ A job run on the JobExecutor pool. Same signal surface as Worker (finished/error/progress/
+        status_update/cancelled, start/stop/isRunning), so the GUI code treats both alike.
+        `func` must be picklable (module-level function or classmethod) and must not touch widgets. """
+    finished = pyqtSignal(object)
+    error = pyqtSignal(tuple)
+    progress = pyqtSignal(int)
+    status_update = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+    def __init__(self, executor, func, *args, priority=0, **kwargs):
+        super().__init__()
+        self.executor = executor; self.func = func; self.args = args; self.kwargs = kwargs
+        self.priority = priority
+        self.cancel_token = CancelToken()
+        self._is_running = True; self._active = False
+        self.memory_report = None # Set by the executor when the worker reports how the input frames were mapped
+
+    def start(self):
+        self._active = True
+        self.executor.submit(self)
+
+    def isRunning(self): return self._active
+
+    def is_cancelled(self): return not self._is_running
+
+    def stop(self):
+        self._is_running = False
+        self.status_update.emit("操作已取消...")
+        if self._active and not self.executor.withdraw(self): self.cancel_token.set()
+
+    def _complete(self, kind, payload=None):
+        """ Called by the executor on the GUI thread once the job has left the pool. """
+        self._active = False
+        self.cancel_token.discard()
+        if not self._is_running or kind == 'cancelled': self.cancelled.emit()
+        elif kind == 'finished': self.finished.emit(payload)
+        else: self.error.emit(payload)
+
+class JobExecutor(QObject):
+    """ Long-lived pool of spawn-started worker processes that runs load/preprocess/train jobs off the
+        GUI process (no GIL contention with repaints) and keeps the heavy imports warm between jobs.
+        Jobs wait in a priority heap and are handed to the pool only when a worker is free, so a later
+        high-priority job is not stuck behind queued ones. Progress/status come back through one
+        multiprocessing queue that a QTimer drains; DataFrames travel through shared memory. """
+    _job_done = pyqtSignal(object, object) # (job, future); emitted from the pool's management thread
+    memory_report = pyqtSignal(object, dict) # (job, report) once a worker has mapped the job's input frames
+
+    def __init__(self, max_workers=None, parent=None):
+        super().__init__(parent)
+        self.max_workers = JOB_POOL_WORKERS if max_workers is None else max_workers
+        self.snapshots = FrameSnapshotStore()
+        self._pool = None; self._events = None
+        self._worker_pids = set() # Reported by _pool_initializer of each worker of the current pool
+        self._pending = []; self._seq = itertools.count()
+        self._jobs = {} # job_id -> job currently in the pool
+        self._job_done.connect(self._on_job_done)
+        self._poll_timer = QTimer(self); self._poll_timer.setInterval(JOB_POOL_POLL_MS)
+        self._poll_timer.timeout.connect(self._drain_events)
+
+    @property
+    def available(self): return self._pool is not None
+
+    def start(self):
+        """ Starts the worker processes and warms them up; False (jobs should use Worker threads) on failure. """
+        if self.max_workers <= 0: return False
+        try:
+            ctx = multiprocessing.get_context('spawn') # Never fork a process that has Qt running
+            self._events = ctx.Queue(); self._worker_pids = set()
+            self._pool = concurrent.futures.ProcessPoolExecutor(max_workers=self.max_workers, mp_context=ctx,
+                                                                initializer=_pool_initializer, initargs=(self._events,))
+            for _ in range(self.max_workers): self._pool.submit(_pool_warmup)
+            return True
+        except Exception as e:
+            print(f"Warning: could not start job process pool, falling back to threads: {e}")
+            self._pool = None
+            return False
+
+    def submit(self, job):
+        heapq.heappush(self._pending, (-job.priority, next(self._seq), job))
+        self._dispatch()
+
+    def withdraw(self, job):
+        """ Removes a job that has not reached the pool yet; True if it was still queued. """
+        for i, entry in enumerate(self._pending):
+            if entry[2] is job:
+                self._pending.pop(i); heapq.heapify(self._pending)
+                QTimer.singleShot(0, lambda: job._complete('cancelled'))
+                return True
+        return False
+
+    def _dispatch(self):
+        while self._pending and len(self._jobs) < self.max_workers:
+            _, job_id, job = heapq.heappop(self._pending)
+            try:
+                args, report = self._snapshot_args(job.args)
+                job.memory_report = report
+                future = self._pool.submit(_run_pool_job, job_id, job.func, args, job.kwargs, job.cancel_token)
+            except Exception as e: # Broken pool, unpicklable arguments...
+                job._complete('error', (type(e), e, traceback.format_exc()))
+                if isinstance(e, concurrent.futures.process.BrokenProcessPool): self._restart()
+                continue
+            self._jobs[job_id] = job
+            future.add_done_callback(lambda f, job=job, job_id=job_id: self._job_done.emit((job_id, job), f))
+        if self._jobs: self._poll_timer.start()
+
+    def _snapshot_args(self, args):
+        """ Swaps DataFrame arguments for their (cached) snapshots; nothing is copied in the GUI process. """
+        report = {'frames': 0, 'frame_bytes': 0, 'exported_bytes': 0}
+        swapped = []
+        for arg in args:
+            if pa and isinstance(arg, pd.DataFrame):
+                snapshot, reused = self.snapshots.get(arg)
+                report['frames'] += 1; report['frame_bytes'] += snapshot.frame_bytes
+                if not reused: report['exported_bytes'] += snapshot.file_bytes
+                arg = snapshot
+            swapped.append(arg)
+        return tuple(swapped), report
+
+    def _drain_events(self):
+        while True:
+            try: job_id, kind, value = self._events.get_nowait()
+            except queue.Empty: break
+            except (OSError, ValueError, EOFError): break # Queue closed during shutdown
+            if kind == 'pid':
+                self._worker_pids.add(value); continue
+            job = self._jobs.get(job_id)
+            if job is None: continue
+            if kind == 'progress': job.progress.emit(int(value))
+            elif kind == 'memory':
+                job.memory_report.update(value)
+                self.memory_report.emit(job, job.memory_report)
+            else: job.status_update.emit(str(value))
+        if not self._jobs: self._poll_timer.stop()
+
+    def _on_job_done(self, ident, future):
+        job_id, job = ident
+        self._drain_events() # Deliver the last progress/status before the result
+        self._jobs.pop(job_id, None)
+        try:
+            job._complete('finished', _unshare_frames(future.result(), adopt=self.snapshots.adopt))
+        except OperationCancelled:
+            job._complete('cancelled')
+        except concurrent.futures.CancelledError:
+            job._complete('cancelled')
+        except Exception as e:
+            job._complete('error', (type(e), e, "".join(traceback.format_exception(type(e), e, e.__traceback__))))
+            if isinstance(e, concurrent.futures.process.BrokenProcessPool): self._restart()
+        self._dispatch()
+
+    def _restart(self):
+        """ Replaces a pool whose worker died (e.g. out of memory); jobs still in it have already failed. """
+        print("Warning: job process pool broke, restarting it.")
+        try: self._pool.shutdown(wait=False, cancel_futures=True)
+        except Exception: pass
+        self.start()
+
+    def shutdown(self):
+        """ Cancels everything and stops the worker processes (application exit). """
+        for _, _, job in self._pending: job.cancel_token.discard()
+        self._pending.clear()
+        for job in self._jobs.values(): job.cancel_token.set()
+        if self._pool is not None:
+            if hasattr(self._pool, 'terminate_workers'): self._pool.terminate_workers() # Python 3.14+
+            else:
+                self._drain_events() # Collects the pids of workers started since the last poll
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                for pid in self._worker_pids:
+                    try: os.kill(pid, signal.SIGTERM) # TerminateProcess on Windows
+                    except OSError: pass # Already exited
+            self._pool = None; self._worker_pids = set()
+        for job in self._jobs.values(): job.cancel_token.discard()
+        self._jobs.clear(); self._poll_timer.stop()
+        self.snapshots.clear()
+
+
+# --- Cancellable Fitting ---
+def _lgbm_cancel_callback(progress_signal, total_rounds):
+    """ LightGBM callback: aborts training on cancel and reports per-round progress. """
+    def _callback(env):
+        check_cancelled()
+        if progress_signal is not None and total_rounds:
+            progress_signal.emit(100 * (env.iteration + 1) // total_rounds)
+    return _callback
+
+_XGBCancelCallback = None # Subclasses xgboost's TrainingCallback, so it is defined on first use
+
+def _xgb_cancel_callback(progress_signal, total_rounds):
+    """ XGBoost callback: aborts training on cancel and reports per-round progress. """
+    global _XGBCancelCallback
+    if _XGBCancelCallback is None:
+        class _XGBCancelCallback(xgb.callback.TrainingCallback):
+            def __init__(self, progress_signal, total_rounds):
+                super().__init__()
+                self.progress_signal = progress_signal; self.total_rounds = total_rounds
+
+            def after_iteration(self, model, epoch, evals_log):
+                check_cancelled()
+                if self.progress_signal is not None and self.total_rounds:
+                    self.progress_signal.emit(100 * (epoch + 1) // self.total_rounds)
+                return False
+    return _XGBCancelCallback(progress_signal, total_rounds)
+
+def early_stopping_rounds(model):
+    """ Early-stopping patience configured on a LightGBM/XGBoost model; 0 when it trains all rounds. """
+    if lgb and isinstance(model, lgb.LGBMModel): return model.get_params().get('early_stopping_round') or 0
+    if xgb and isinstance(model, xgb.XGBModel): return model.get_params().get('early_stopping_rounds') or 0
+    return 0
+
+def _early_stopping_split(model, X, y):
+    """ Holds out BOOSTING_VALIDATION_FRACTION of the rows (stratified for classifiers when possible) as eval set.
+        Returns (X_fit, y_fit, eval fit() kwargs); LightGBM >= 4.6 takes eval_X/eval_y instead of eval_set. """
+    from sklearn.base import is_classifier
+    from sklearn.model_selection import train_test_split
+    stratify = y if is_classifier(model) and pd.Series(y).value_counts().min() >= 2 else None
+    try: X_fit, X_val, y_fit, y_val = train_test_split(X, y, test_size=BOOSTING_VALIDATION_FRACTION, random_state=42, stratify=stratify)
+    except ValueError: X_fit, X_val, y_fit, y_val = train_test_split(X, y, test_size=BOOSTING_VALIDATION_FRACTION, random_state=42)
+    if 'eval_X' in inspect.signature(model.fit).parameters: return X_fit, y_fit, {'eval_X': (X_val,), 'eval_y': (y_val,)}
+    return X_fit, y_fit, {'eval_set': [(X_val, y_val)]}
+
+def boosting_summary(model):
+    """ Best iteration and validation learning curve of an early-stopped LightGBM/XGBoost model, else None. """
+    patience = early_stopping_rounds(model)
+    if not patience: return None
+    if lgb and isinstance(model, lgb.LGBMModel): evals, best = model.evals_result_, model.best_iteration_ # 1-based
+    else: evals, best = model.evals_result(), model.best_iteration + 1 # 0-based in XGBoost
+    if not evals: return None
+    metric, curve = next(iter(next(iter(evals.values())).items()))
+    return {'best_iteration': int(best), 'rounds_trained': len(curve), 'n_estimators': model.n_estimators,
+            'patience': patience, 'metric': metric, 'curve': [float(v) for v in curve]}
+
+FOREST_CHUNK_SECONDS = 0.5 # Target duration of one warm-start chunk (bounds the cancel latency)
+
+def _fit_forest_in_chunks(model, X, y, progress_signal):
+    """ Grows a random forest with warm_start in chunks of trees, checking for cancel between chunks.
+        The first chunk is one tree per core; later chunks are sized from the measured time per tree. """
+    total = model.n_estimators
+    n_jobs = model.n_jobs if model.n_jobs and model.n_jobs > 0 else (os.cpu_count() or 1)
+    chunk = n_jobs
+    model.set_params(warm_start=True)
+    try:
+        grown = 0
+        while grown < total:
+            check_cancelled()
+            step = min(total - grown, chunk)
+            start = time.perf_counter()
+            model.set_params(n_estimators=grown + step)
+            model.fit(X, y)
+            grown += step
+            per_tree = (time.perf_counter() - start) / step
+            chunk = max(n_jobs, int(FOREST_CHUNK_SECONDS / max(per_tree, 1e-6)) // n_jobs * n_jobs)
+            if progress_signal is not None: progress_signal.emit(100 * grown // total)
+    finally:
+        model.set_params(warm_start=False, n_estimators=total)
+
+def _fit_mlp_in_epochs(model, X, y, progress_signal):
+    """ Trains an MLP one partial_fit epoch at a time, re-implementing its validation-based early
+        stopping so training can be cancelled between epochs. """
+    from sklearn.base import is_classifier
+    from sklearn.model_selection import train_test_split
+    params = model.get_params()
+    classifier = is_classifier(model)
+    X_fit, y_fit, X_val, y_val = X, y, None, None
+    if params['early_stopping']:
+        X_fit, X_val, y_fit, y_val = train_test_split(X, y, test_size=params['validation_fraction'], random_state=params['random_state'],
+                                                      stratify=y if classifier else None)
+    classes = np.unique(y) if classifier else None
+    best_score, best_weights, no_improvement = -np.inf, None, 0
+    model.set_params(early_stopping=False) # partial_fit refuses it; validation is done here instead
+    try:
+        for epoch in range(params['max_iter']):
+            check_cancelled()
+            if classifier: model.partial_fit(X_fit, y_fit, classes=classes)
+            else: model.partial_fit(X_fit, y_fit)
+            if progress_signal is not None: progress_signal.emit(100 * (epoch + 1) // params['max_iter'])
+            score = model.score(X_val, y_val) if X_val is not None else -model.loss_
+            no_improvement = no_improvement + 1 if score < best_score + params['tol'] else 0
+            if score > best_score:
+                best_score = score
+                best_weights = ([c.copy() for c in model.coefs_], [b.copy() for b in model.intercepts_])
+            if no_improvement > params['n_iter_no_change']: break
+    finally:
+        model.set_params(early_stopping=params['early_stopping'])
+    if best_weights is not None and X_val is not None:
+        model.coefs_, model.intercepts_ = best_weights
+
+def _child_fit_entry(conn, model, X, y):
+    """ Target of the killable fit process: fits and sends the model (or the traceback) back. """
+    try:
+        model.fit(X, y)
+        conn.send(('ok', model))
+    except Exception:
+        conn.send(('error', traceback.format_exc()))
+    finally:
+        conn.close()
+
+def _fit_in_child_process(model, X, y, status_signal):
+    """ Fits in a separate process that is terminated on cancel (for estimators without an incremental API). """
+    ctx = multiprocessing.get_context('spawn')
+    recv_conn, send_conn = ctx.Pipe(duplex=False)
+    process = ctx.Process(target=_child_fit_entry, args=(send_conn, model, X, y), daemon=True)
+    if status_signal is not None: status_signal.emit(f"在独立进程中训练 {model.__class__.__name__} (可立即取消)...")
+    process.start()
+    send_conn.close()
+    try:
+        while not recv_conn.poll(0.2):
+            if is_cancel_requested():
+                process.terminate()
+                raise OperationCancelled("操作已取消")
+            if not process.is_alive(): break
+        try: status, payload = recv_conn.recv()
+        except EOFError: raise RuntimeError(f"训练进程意外退出 (exit code {process.exitcode}).") from None
+    finally:
+        process.join(timeout=5)
+        recv_conn.close()
+    if status != 'ok': raise RuntimeError(f"子进程训练失败:\n{payload}")
+    return payload
+
+def fit_cancellable(model, X, y, progress_signal=None, status_signal=None):
+    """ Fits `model` so that a cancel request stops the CPU work within about a second:
+        LightGBM/XGBoost via training callbacks, random forests in warm-start chunks of trees,
+        stochastic MLPs one partial_fit epoch at a time, anything else in a killable process.
+        Boosters with early stopping set hold out part of X as their eval set (see _early_stopping_split).
+        Returns the fitted model (the same object, except for the child-process path). """
+    from sklearn.ensemble._forest import BaseForest
+    from sklearn.neural_network import MLPClassifier, MLPRegressor
+    if lgb and isinstance(model, lgb.LGBMModel):
+        fit_kwargs = {}
+        if early_stopping_rounds(model): X, y, fit_kwargs = _early_stopping_split(model, X, y)
+        model.fit(X, y, callbacks=[_lgbm_cancel_callback(progress_signal, model.n_estimators)], **fit_kwargs)
+    elif xgb and isinstance(model, xgb.XGBModel):
+        fit_kwargs = {}
+        if early_stopping_rounds(model): X, y, fit_kwargs = _early_stopping_split(model, X, y); fit_kwargs['verbose'] = False
+        model.set_params(callbacks=[_xgb_cancel_callback(progress_signal, model.n_estimators)])
+        try: model.fit(X, y, **fit_kwargs)
+        finally: model.set_params(callbacks=None) # Keep the fitted model picklable
+    elif isinstance(model, BaseForest):
+        _fit_forest_in_chunks(model, X, y, progress_signal)
+    elif isinstance(model, (MLPClassifier, MLPRegressor)) and model.solver != 'lbfgs':
+        _fit_mlp_in_epochs(model, X, y, progress_signal)
+    else:
+        model = _fit_in_child_process(model, X, y, status_signal)
+    return model
+
+
+# --- Model Evaluation ---
+def _cv_fit_fold(fold_no, estimator, X, y, train_idx, test_idx, want_proba, cancel_token=None, preprocessor=None, features=None):
+    """ Fits a fresh clone of `estimator` on one CV fold (runs in a loky worker process).
+        With a `preprocessor`, X is raw data and a clone of it is fitted on the fold's training rows only. """
+    from sklearn.base import clone
+    global _process_cancel_token
+    previous_token, _process_cancel_token = _process_cancel_token, cancel_token
+    try:
+        X_train, X_test = X.iloc[train_idx], X.iloc[test_idx]
+        if preprocessor is not None:
+            fold_preprocessor = clone(preprocessor)
+            X_train = model_input.select_features(fold_preprocessor.fit_transform(X_train), features, fold_preprocessor)
+            X_test = model_input.select_features(fold_preprocessor.transform(X_test), features, fold_preprocessor)
+        model = clone(estimator)
+        start = time.perf_counter()
+        model = fit_cancellable(model, X_train, y.iloc[train_idx])
+        fit_seconds = time.perf_counter() - start
+    finally:
+        _process_cancel_token = previous_token
+    y_pred = model.predict(X_test)
+    y_proba = None
+    if want_proba and hasattr(model, "predict_proba"):
+        try: y_proba = model.predict_proba(X_test)
+        except Exception: y_proba = None
+    return {'fold': fold_no, 'y_true': y.iloc[test_idx].to_numpy(), 'y_pred': y_pred,
+            'y_proba': y_proba, 'fit_seconds': fit_seconds}
+
+# --- Metrics Engine ---
+def _label_codes(y_true, y_pred):
+    """ Codes of y_true / y_pred in one shared, sorted label set: (codes_true, codes_pred, labels).
+        Small integer ranges (the usual factorized targets) are mapped with bincount, without sorting. """
+    a, b = np.asarray(y_true), np.asarray(y_pred)
+    if a.dtype.kind in 'biu' and b.dtype.kind in 'biu' and len(a) and len(b):
+        lo, hi = int(min(a.min(), b.min())), int(max(a.max(), b.max()))
+        if hi - lo < 1 << 16:
+            present = np.flatnonzero(np.bincount(a - lo, minlength=hi - lo + 1) + np.bincount(b - lo, minlength=hi - lo + 1))
+            if len(present) == hi - lo + 1: return (a - lo).astype(np.int64, copy=False), (b - lo).astype(np.int64, copy=False), present + lo # Contiguous: no remap
+            remap = np.full(hi - lo + 1, -1, dtype=np.int64); remap[present] = np.arange(len(present))
+            return remap[a - lo], remap[b - lo], present + lo
+    codes, labels = pd.factorize(np.concatenate([a, b]), sort=True)
+    return codes[:len(a)], codes[len(a):], np.asarray(labels)
+
+class _SortedScores:
+    """ One argsort of a score column with its tie groups: everything rank-based metrics need. Ranks for any
+        row multiplicities (bootstrap weights) are group-wise cumulative counts, so a resample never re-sorts. """
+    def __init__(self, values):
+        self.order = np.argsort(values)
+        ordered = values[self.order]
+        self.starts = np.flatnonzero(np.concatenate([[True], ordered[1:] != ordered[:-1]])) if len(ordered) else np.zeros(0, np.int64)
+        self._group = None
+
+    @property
+    def group(self):
+        """ Tie group of each row (row order); built on first use, only resampled Spearman needs it. """
+        if self._group is None:
+            new_group = np.zeros(len(self.order), dtype=np.int64); new_group[self.starts[1:]] = 1
+            self._group = np.empty(len(self.order), dtype=np.int64)
+            self._group[self.order] = np.cumsum(new_group)
+        return self._group
+
+    def group_counts(self, weights=None):
+        """ Rows in every tie group; weights (resamples x rows) give one row of summed weights per resample. """
+        if weights is None: return np.diff(np.append(self.starts, len(self.order))).astype(np.float64)
+        ordered = weights[:, self.order]
+        return ordered if len(self.starts) == len(self.order) else np.add.reduceat(ordered, self.starts, axis=1)
+
+    def group_ranks(self, weights=None):
+        """ 1-based average rank of every tie group (per resample with weights). """
+        counts = self.group_counts(weights)
+        return np.cumsum(counts, axis=-1) - (counts - 1) / 2
+
+    def sorted_ranks(self):
+        """ Average rank of every row in sorted order. """
+        counts = np.diff(np.append(self.starts, len(self.order)))
+        if len(counts) == len(self.order): return np.arange(1.0, len(self.order) + 1) # No ties
+        return np.repeat(self.group_ranks(), counts)
+
+    def rank_sum(self, mask, weights=None):
+        """ Sum of the ranks of the rows in `mask` (per resample with weights): the Mann-Whitney statistic. """
+        in_mask = mask[self.order]
+        if weights is None: return float(np.dot(self.group_ranks(), np.add.reduceat(in_mask.astype(np.float64), self.starts)))
+        ordered = weights[:, self.order]
+        counts, in_group = (ordered, ordered * in_mask) if len(self.starts) == len(self.order) else \
+            (np.add.reduceat(ordered, self.starts, axis=1), np.add.reduceat(ordered * in_mask, self.starts, axis=1))
+        ranks = np.cumsum(counts, axis=1); ranks -= (counts - 1) / 2
+        return np.einsum('ij,ij->i', ranks, in_group)
+
+def _mann_whitney_auc(sorted_scores, positive, weights=None):
+    """ ROC AUC (ties count half, as roc_auc_score) from a _SortedScores and the positive-class mask. """
+    n_pos = positive.sum() if weights is None else weights @ positive
+    n_neg = (len(positive) - n_pos) if weights is None else weights.sum(axis=1) - n_pos
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (sorted_scores.rank_sum(positive, weights) - n_pos * (n_pos + 1) / 2) / (n_pos * n_neg)
+
+def _binary_auc(scores, positive):
+    """ ROC AUC of one score column. Non-negative scores (probabilities) skip the argsort: their float bits
+        order like uint64, so the label rides in a shifted-in low bit and one np.sort orders both (negatives
+        first within ties). Each positive then counts the negatives before it; tied pairs count half. """
+    scores = np.asarray(scores, dtype=np.float64)
+    if not len(scores) or not scores.min() >= 0: return _mann_whitney_auc(_SortedScores(np.ascontiguousarray(scores)), positive)
+    keys = ((scores + 0.0).view(np.uint64) << np.uint64(1)) | positive.astype(np.uint64) # + 0.0: -0.0 -> 0.0
+    keys.sort()
+    is_pos = (keys & np.uint64(1)).astype(bool)
+    n_pos = int(is_pos.sum()); n_neg = len(keys) - n_pos
+    if not n_pos or not n_neg: return np.nan
+    u = float(np.flatnonzero(is_pos).sum(dtype=np.float64)) - n_pos * (n_pos - 1) / 2 # Negatives before each positive, tied ones included
+    values = keys >> np.uint64(1)
+    starts = np.flatnonzero(np.concatenate([[True], values[1:] != values[:-1]]))
+    if len(starts) < len(keys): # Ties: a tied negative counts half, not one
+        ends = np.append(starts[1:], len(keys))
+        tied = ends - starts > 1
+        cum_pos = np.concatenate([[0], np.cumsum(is_pos)])
+        pos_in = cum_pos[ends[tied]] - cum_pos[starts[tied]]
+        u -= 0.5 * float(np.dot(pos_in, (ends[tied] - starts[tied]) - pos_in))
+    return u / (n_pos * n_neg)
+
+def _contingency_spearman(confusion):
+    """ Spearman rho between true and predicted labels from their contingency table(s) (..., k, k): rows with
+        the same label tie, so the ranks are functions of the label counts and no row is touched. """
+    confusion = confusion.astype(np.float64)
+    true_count, pred_count = confusion.sum(axis=-1), confusion.sum(axis=-2)
+    n = true_count.sum(axis=-1, keepdims=True)
+    rank_true = np.cumsum(true_count, axis=-1) - (true_count - 1) / 2 - (n + 1) / 2 # Centred: the mean rank is (n+1)/2
+    rank_pred = np.cumsum(pred_count, axis=-1) - (pred_count - 1) / 2 - (n + 1) / 2
+    cov = np.einsum('...i,...ij,...j->...', rank_true, confusion, rank_pred)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return cov / np.sqrt((true_count * rank_true ** 2).sum(axis=-1) * (pred_count * rank_pred ** 2).sum(axis=-1))
+
+def _pearson(x, y):
+    """ Pearson correlation of x and y; NaN when either is constant. """
+    dx, dy = x - x.mean(), y - y.mean()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return float(np.dot(dx, dy) / np.sqrt(np.dot(dx, dx) * np.dot(dy, dy)))
+
+def _resampled_spearman(sorted_x, sorted_y, weights):
+    """ Spearman rho per resample (weights: resamples x rows) from two _SortedScores. Whatever the weights, the
+        weighted mean of the average ranks is (W + 1) / 2, so the variances come from the tie groups alone and
+        only the covariance touches every row. """
+    total = weights.sum(axis=1, keepdims=True)
+    centred, variance = [], []
+    for ss in (sorted_x, sorted_y):
+        counts = ss.group_counts(weights)
+        ranks = np.cumsum(counts, axis=1); ranks -= counts / 2; ranks -= total / 2 # cumsum - (c - 1) / 2 - (W + 1) / 2, in place
+        centred.append(ranks); variance.append(np.einsum('ij,ij,ij->i', counts, ranks, ranks))
+    cov = np.einsum('ij,ij,ij->i', weights, np.take(centred[0], sorted_x.group, axis=1), np.take(centred[1], sorted_y.group, axis=1))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return cov / np.sqrt(variance[0] * variance[1])
+
+def _confusion_scores(confusion, pos, binary):
+    """ Accuracy, precision, recall and F1 from confusion counts (..., k, k), rows = true label. Binary uses
+        label code `pos` (None: absent, scores 0); otherwise support-weighted averages, as sklearn 'weighted'. """
+    n = confusion.sum(axis=(-2, -1))
+    tp = np.diagonal(confusion, axis1=-2, axis2=-1).astype(np.float64)
+    true_count, pred_count = confusion.sum(axis=-1), confusion.sum(axis=-2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        precision = np.where(pred_count > 0, tp / pred_count, 0.0)
+        recall = np.where(true_count > 0, tp / true_count, 0.0)
+        f1 = np.where(pred_count + true_count > 0, 2 * tp / (pred_count + true_count), 0.0)
+        scores = {'Accuracy': tp.sum(axis=-1) / n}
+        if binary:
+            zero = np.zeros_like(scores['Accuracy'])
+            scores.update({'Precision': precision[..., pos] if pos is not None else zero, 'Recall': recall[..., pos] if pos is not None else zero,
+                           'F1-Score': f1[..., pos] if pos is not None else zero})
+        else:
+            support = true_count / n[..., None]
+            scores.update({'Precision': (precision * support).sum(axis=-1), 'Recall': (recall * support).sum(axis=-1),
+                           'F1-Score': (f1 * support).sum(axis=-1)})
+    return scores
+
+class MetricsEngine:
+    """ All evaluation metrics of one test set from intermediates built once: label codes and the confusion
+        matrix (accuracy / precision / recall / F1, Spearman of labels), one sort per score column (AUC,
+        regression Spearman) and the residuals (R², MAE, MSE). Results match the sklearn/scipy functions
+        _calculate_metrics used to call. From METRICS_PARALLEL_MIN_ROWS rows the sorts run on threads (numpy
+        releases the GIL while sorting). bootstrap() adds percentile confidence intervals from vectorized
+        resampling. """
+    def __init__(self, y_true, y_pred, y_pred_proba, problem_type, n_jobs=None):
+        self.problem_type = problem_type
+        self.n_jobs = n_jobs or os.cpu_count() or 1
+        self.y_true = np.asarray(y_true); self.y_pred = np.asarray(y_pred)
+        self.proba = np.asarray(y_pred_proba) if y_pred_proba is not None else None
+        self.n = len(self.y_true)
+        self.notes = {} # Metric -> 'N/A (...)' text when it cannot be computed
+        if problem_type == 'classification':
+            self.codes_true, self.codes_pred, self.labels = _label_codes(self.y_true, self.y_pred)
+            k = len(self.labels)
+            self.confusion = np.bincount(self.codes_true * k + self.codes_pred, minlength=k * k).reshape(k, k)
+            self.n_classes = int((self.confusion.sum(axis=1) > 0).sum()) # Classes present in y_true
+            self.binary = self.n_classes <= 2
+            pos = np.flatnonzero(self.labels == 1) if self.labels.dtype.kind in 'biuf' else []
+            self.pos = int(pos[0]) if len(pos) else None # sklearn's default pos_label=1
+        else:
+            self.residual = self.y_pred.astype(np.float64) - self.y_true.astype(np.float64)
+
+    def _auc_tasks(self):
+        """ (metric name, N/A text or None, [(positive mask, score column)]) of the AUC this test set supports. """
+        if self.proba is None: return 'AUC', 'N/A (No probabilities)', []
+        if self.n_classes == 2:
+            if self.proba.ndim != 2 or self.proba.shape[1] < 2: return 'AUC', 'N/A (Proba shape)', []
+            positive = np.flatnonzero(self.confusion.sum(axis=1) > 0)[-1] # Larger label, as roc_auc_score
+            return 'AUC', None, [(self.codes_true == positive, self.proba[:, 1])]
+        if self.n_classes > 2:
+            if self.proba.ndim != 2 or self.proba.shape[1] != self.n_classes: return 'AUC (OvR)', 'N/A (Proba shape)', []
+            present = self.labels[self.confusion.sum(axis=1) > 0]
+            if present.dtype.kind not in 'biuf' or not np.array_equal(present, np.arange(self.n_classes)):
+                return 'AUC', "N/A (y_true labels must be 0..n_classes-1 for OvR AUC)", []
+            return 'AUC (OvR)', None, [(self.y_true == c, self.proba[:, c]) for c in range(self.n_classes)]
+        return None, None, []
+
+    def _map(self, func, items):
+        """ list(map(func, items)), on threads for large test sets. """
+        items = list(items)
+        if self.n < METRICS_PARALLEL_MIN_ROWS or self.n_jobs < 2 or len(items) < 2: return [func(item) for item in items]
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(self.n_jobs, len(items))) as pool:
+            return list(pool.map(func, items))
+
+    def compute(self):
+        """ The metrics dict shown on the results page (same keys and N/A texts as before). """
+        metrics = {}
+        if self.problem_type == 'classification':
+            metrics.update({k: float(v) for k, v in _confusion_scores(self.confusion, self.pos, self.binary).items()})
+            auc_name, note, auc_tasks = self._auc_tasks()
+            if note: metrics[auc_name] = note
+            elif auc_name:
+                aucs = self._map(lambda task: _binary_auc(task[1], task[0]), auc_tasks)
+                prevalence = [mask.sum() for mask, _ in auc_tasks]
+                metrics[auc_name] = float(np.dot(aucs, prevalence) / sum(prevalence)) # Support-weighted over classes (OvR)
+            rho = float(_contingency_spearman(self.confusion))
+        else:
+            sse, sst = float(np.dot(self.residual, self.residual)), float(np.var(self.y_true.astype(np.float64)) * self.n)
+            metrics['R²'] = (1 - sse / sst) if sst > 0 else (1.0 if sse == 0 else 0.0) # r2_score's force_finite
+            metrics['MAE'] = float(np.abs(self.residual).mean())
+            metrics['MSE'] = sse / self.n
+            metrics['RMSE'] = float(np.sqrt(metrics['MSE']))
+            sorted_true, sorted_pred = self._map(lambda v: _SortedScores(np.ascontiguousarray(v, dtype=np.float64)), (self.y_true, self.y_pred))
+            rank_true = np.empty(self.n); rank_true[sorted_true.order] = sorted_true.sorted_ranks()
+            rho = _pearson(rank_true[sorted_pred.order], sorted_pred.sorted_ranks()) # Pairs in y_pred order
+        metrics['Spearman Rho'] = rho if not np.isnan(rho) else 'N/A'
+        return metrics
+
+    def _row_statistics(self, rows):
+        """ Resampling function for the row-level metrics (AUC, Spearman, regression) on test rows `rows`:
+            maps a weight matrix (resamples x rows, each row's multiplicity) to {metric: value per resample}. """
+        if self.problem_type == 'classification':
+            auc_name, note, tasks = self._auc_tasks()
+            aucs = [(mask[rows], _SortedScores(np.ascontiguousarray(score[rows]))) for mask, score in tasks] if not note else []
+        else:
+            y_true, residual = self.y_true[rows].astype(np.float64), self.residual[rows]
+            sorted_true, sorted_pred = _SortedScores(y_true), _SortedScores(np.ascontiguousarray(self.y_pred[rows], dtype=np.float64))
+
+        def statistics(weights):
+            out = {}
+            if self.problem_type == 'classification':
+                if aucs:
+                    support = np.stack([weights @ mask for mask, _ in aucs])
+                    out[auc_name] = (np.stack([_mann_whitney_auc(ss, mask, weights) for mask, ss in aucs]) * support).sum(axis=0) / support.sum(axis=0)
+                return out # Spearman of labels comes from the confusion draws
+            else:
+                total = weights.sum(axis=1)
+                sse, sum_y = weights @ (residual * residual), weights @ y_true
+                sst = weights @ (y_true * y_true) - sum_y * sum_y / total
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    out['R²'] = np.where(sst > 0, 1 - sse / sst, np.where(sse == 0, 1.0, 0.0))
+                out['MAE'] = weights @ np.abs(residual) / total
+                out['MSE'] = sse / total
+                out['RMSE'] = np.sqrt(out['MSE'])
+                out['Spearman Rho'] = _resampled_spearman(sorted_true, sorted_pred, weights)
+            return out
+        return statistics
+
+    def bootstrap(self, metrics, n_resamples=BOOTSTRAP_DEFAULT_RESAMPLES, confidence=BOOTSTRAP_CONFIDENCE, seed=42):
+        """ Percentile confidence intervals for the numeric entries of `metrics` (from compute()).
+            Accuracy / precision / recall / F1 and, for classes, Spearman resample the confusion cells: a
+            multinomial draw of n rows over them is exactly a row resample of the test set. The other metrics
+            resample rows through weight matrices (bincount of drawn row indices), in vectorized batches spread
+            over threads; on test sets over BOOTSTRAP_MAX_ROWS they use an m-out-of-n bootstrap on a random
+            subset, rescaling the spread by sqrt(m / n) around the full-set value.
+            Returns {'confidence', 'resamples', 'rows', 'intervals'}. """
+        seeds = np.random.SeedSequence(seed).spawn(2)
+        rng = np.random.default_rng(seeds[0])
+        samples = {}
+        if self.problem_type == 'classification':
+            k = len(self.labels)
+            draws = rng.multinomial(self.n, self.confusion.ravel() / self.n, size=n_resamples).reshape(n_resamples, k, k)
+            samples.update(_confusion_scores(draws, self.pos, self.binary))
+            samples['Spearman Rho'] = _contingency_spearman(draws)
+
+        m = min(self.n, BOOTSTRAP_MAX_ROWS)
+        row_samples, subset_values = {}, None
+        if self.problem_type != 'classification' or self._auc_tasks()[2]: # Row-level metrics to resample
+            rows = np.sort(rng.choice(self.n, m, replace=False)) if m < self.n else np.arange(self.n)
+            statistics = self._row_statistics(rows)
+            batch = max(1, BOOTSTRAP_BATCH_CELLS // m)
+            sizes = [min(batch, n_resamples - start) for start in range(0, n_resamples, batch)]
+
+            def resample(task):
+                size, seed_seq = task
+                drawn = np.random.default_rng(seed_seq).integers(0, m, (size, m)) + m * np.arange(size)[:, None]
+                return statistics(np.bincount(drawn.ravel(), minlength=size * m).reshape(size, m).astype(np.float64))
+            pool = concurrent.futures.ThreadPoolExecutor(max_workers=max(1, min(self.n_jobs, len(sizes))))
+            futures = [pool.submit(resample, task) for task in zip(sizes, seeds[1].spawn(len(sizes)))]
+            try:
+                batches = []
+                for future in futures:
+                    batches.append(future.result())
+                    check_cancelled()
+            finally:
+                pool.shutdown(cancel_futures=True) # Cancel / error: drop the batches not started yet
+            row_samples = {name: np.concatenate([b[name] for b in batches]) for name in batches[0]}
+            if m < self.n: subset_values = statistics(np.ones((1, m)))
+
+        alpha = (1 - confidence) / 2
+        intervals = {}
+        for name, value in metrics.items():
+            if not isinstance(value, (float, np.floating)) or np.isnan(value): continue
+            values = samples.get(name) if name in samples else row_samples.get(name)
+            if values is None or not np.isfinite(values).any(): continue
+            low, high = np.nanquantile(values, [alpha, 1 - alpha])
+            if subset_values is not None and name in row_samples: # m-out-of-n: spread around the subset value, rescaled
+                scale, center = np.sqrt(m / self.n), float(subset_values[name][0])
+                low, high = value + scale * (low - center), value + scale * (high - center)
+            intervals[name] = (float(low), float(high))
+        return {'confidence': confidence, 'resamples': n_resamples, 'rows': m, 'intervals': intervals}
+
+# --- Incremental Training ---
+def incremental_source(file_path):
+    """ Where incremental training streams `file_path` from: its dataset-cache entry (memory-mapped Feather,
+        no parsing) or the CSV file itself. Returns (kind, path); raises ValueError for other formats. """
+    cached = dataset_cache.cached_path(file_path)
+    if cached is not None: return 'feather', cached
+    if file_path.lower().endswith('.csv'): return 'csv', file_path
+    raise ValueError("增量训练需要 CSV 文件或其本地数据缓存; Excel 文件请先另存为 CSV。")
+
+def iter_source_chunks(source, columns, chunk_rows=INCREMENTAL_CHUNK_ROWS):
+    """ Streams `columns` of an incremental_source() as DataFrame chunks of `chunk_rows` rows; only the
+        current chunk is parsed (CSV) or copied out of the mapping (Feather). """
+    kind, path = source
+    if kind == 'feather':
+        table = pa.ipc.open_file(pa.memory_map(path)).read_all().select(list(columns)) # Zero-copy view of the file
+        for start in range(0, table.num_rows, chunk_rows):
+            yield table.slice(start, chunk_rows).to_pandas()
+    else:
+        with pd.read_csv(path, usecols=list(columns), chunksize=chunk_rows) as reader:
+            yield from reader
+
+def holdout_mask(first_row, n_rows, fraction=INCREMENTAL_EVAL_FRACTION):
+    """ Rows of the evaluation stream among rows first_row..first_row+n_rows-1 of a file: a fixed multiplicative
+        hash of the row number, so every pass over the file holds out the same rows. """
+    rows = np.arange(first_row, first_row + n_rows, dtype=np.uint64)
+    return rows * np.uint64(2654435761) % np.uint64(2**32) < np.uint64(fraction * 2**32)
+
+def _xgb_chunk_iter(chunks, cache_prefix):
+    """ xgboost.DataIter over `chunks()` (a fresh iterator of (X, y) per pass), for ExtMemQuantileDMatrix. """
+    class _ChunkIter(xgb.DataIter):
+        def __init__(self):
+            self._chunks = None
+            super().__init__(cache_prefix=cache_prefix)
+
+        def next(self, input_data):
+            if self._chunks is None: self._chunks = iter(chunks())
+            try: X, y = next(self._chunks)
+            except StopIteration: return False
+            input_data(data=X, label=y)
+            return True
+
+        def reset(self): self._chunks = None
+    return _ChunkIter()
+
+def xgb_train_external_memory(model, chunks, eval_set, n_classes=None, progress_signal=None):
+    """ Trains an XGBoost sklearn model on a DMatrix built from `chunks` with external memory (quantised pages
+        cached in a temp dir, so the raw rows are never all in RAM), then loads the booster into `model`.
+        `eval_set`: (X, y) for early stopping, a callable returning it once the DMatrix is built, or None.
+        Returns (model, evals_result). """
+    params = {k: v for k, v in model.get_xgb_params().items() if v is not None and k not in ('use_label_encoder', 'n_jobs', 'random_state')}
+    params['seed'] = model.random_state or 0
+    if n_classes and n_classes > 2: params.update(objective='multi:softprob', num_class=n_classes, eval_metric='mlogloss')
+    evals_result, patience = {}, early_stopping_rounds(model)
+    with tempfile.TemporaryDirectory(prefix="mlclient_xgb_") as cache_dir:
+        train = xgb.ExtMemQuantileDMatrix(_xgb_chunk_iter(chunks, os.path.join(cache_dir, "train")), enable_categorical=True)
+        if callable(eval_set): eval_set = eval_set()
+        evals = [(xgb.QuantileDMatrix(eval_set[0], eval_set[1], ref=train, enable_categorical=True), 'validation_0')] if eval_set else []
+        booster = xgb.train(params, train, num_boost_round=model.n_estimators, evals=evals, evals_result=evals_result,
+                            early_stopping_rounds=patience if patience and evals else None, verbose_eval=False,
+                            callbacks=[_xgb_cancel_callback(progress_signal, model.n_estimators)])
+        del train, evals # Release the page cache before its directory is removed
+    model.load_model(bytearray(booster.save_raw('json'))) # Keeps the sklearn API (predict_proba, pickling, batch_score)
+    return model, evals_result
+
+# --- Hyperparameter Search ---
+# Searchable parameters per algorithm: (kind, example shown in the empty field). Keys match the get_params widgets.
+SEARCH_PARAM_SPECS = {
+    "随机森林": {'n_estimators': ('int', "100, 300, 500"), 'max_depth': ('int_or_none', "None, 10, 20"),
+                 'min_samples_split': ('int', "2..20"), 'min_samples_leaf': ('int', "1..10"),
+                 'criterion': ('choice', "gini, entropy (回归: squared_error, friedman_mse)")},
+    "神经网络(MLP)": {'hidden_layer_sizes': ('layers', "64,32; 128; 128,64"), 'activation': ('choice', "relu, tanh"),
+                    'solver': ('choice', "adam, sgd"), 'alpha': ('float', "0.00001..0.01 log"), 'max_iter': ('int', "200, 500")},
+    "SGD 线性模型": {'penalty': ('choice', "l2, l1, elasticnet"), 'alpha': ('float', "0.000001..0.01 log"), 'max_iter': ('int', "5, 20, 100")},
+    "LightGBM": {'n_estimators': ('int', "100..1000"), 'learning_rate': ('float', "0.01..0.3 log"),
+                 'max_depth': ('int', "-1, 6, 10"), 'num_leaves': ('int', "15..255 log")},
+    "XGBoost": {'n_estimators': ('int', "100..1000"), 'learning_rate': ('float', "0.01..0.3 log"), 'max_depth': ('int', "3..10"),
+                'subsample': ('float', "0.6..1.0"), 'colsample_bytree': ('float', "0.6..1.0")},
+}
+
+def _parse_search_value(token, kind):
+    token = token.strip()
+    if kind == 'choice': return token
+    if kind == 'layers': return tuple(int(v) for v in token.replace(' ', '').split(',') if v)
+    if kind == 'int_or_none' and token.lower() in ('none', '-1', '无'): return None
+    return int(token) if kind in ('int', 'int_or_none') else float(token)
+
+def parse_search_space(texts, kinds):
+    """ Search space from the per-parameter text fields: empty (keep the fixed value), a list `50, 100, 200`
+        (layer sizes separated by `;`) or a range `lo..hi`, sampled log-uniformly with `lo..hi log`.
+        Returns {param: ('values', [...]) | ('range', lo, hi, log)}; raises ValueError naming the bad field. """
+    space = {}
+    for param, text in texts.items():
+        text = text.strip(); kind = kinds[param]
+        if not text: continue
+        try:
+            if '..' in text and kind in ('int', 'int_or_none', 'float'):
+                lo_text, _, rest = text.partition('..')
+                hi_text, *flags = rest.split() or ['']
+                number_kind = 'float' if kind == 'float' else 'int'
+                lo, hi = _parse_search_value(lo_text, number_kind), _parse_search_value(hi_text, number_kind)
+                if flags not in ([], ['log']) or hi < lo or (flags and lo <= 0): raise ValueError
+                space[param] = ('range', lo, hi, bool(flags))
+            else:
+                values = [_parse_search_value(t, kind) for t in text.split(';' if kind == 'layers' else ',') if t.strip()]
+                if not values or () in values: raise ValueError
+                space[param] = ('values', list(dict.fromkeys(values)))
+        except ValueError:
+            raise ValueError(f"参数 '{param}' 的搜索空间格式错误: {text}") from None
+    return space
+
+def _grid_values(dim):
+    if dim[0] == 'values': return dim[1]
+    _, lo, hi, log = dim
+    points = np.geomspace(lo, hi, SEARCH_GRID_POINTS) if log else np.linspace(lo, hi, SEARCH_GRID_POINTS)
+    return list(dict.fromkeys(int(round(v)) for v in points)) if isinstance(lo, int) else [float(v) for v in points]
+
+def _sample_value(dim, rng):
+    if dim[0] == 'values': return dim[1][rng.integers(len(dim[1]))]
+    _, lo, hi, log = dim
+    value = np.exp(rng.uniform(np.log(lo), np.log(hi))) if log else rng.uniform(lo, hi)
+    return int(round(value)) if isinstance(lo, int) else float(value)
+
+def search_configs(space, method, n_trials, seed=42):
+    """ Up to `n_trials` distinct configurations: the grid in shuffled order (a truncated grid still spreads over
+        the space) or random samples. Small discrete spaces may yield fewer. """
+    rng = np.random.default_rng(seed)
+    if method == 'grid':
+        grid = list(itertools.product(*(_grid_values(dim) for dim in space.values())))
+        return [dict(zip(space, grid[i])) for i in rng.permutation(len(grid))[:n_trials]]
+    configs, seen = [], set()
+    for _ in range(20 * n_trials):
+        if len(configs) >= n_trials: break
+        config = {param: _sample_value(dim, rng) for param, dim in space.items()}
+        if repr(config) not in seen: seen.add(repr(config)); configs.append(config)
+    return configs
+
+def halving_brackets(method, n_configs, max_rows, min_rows=SEARCH_MIN_ROWS, eta=SEARCH_HALVING_FACTOR):
+    """ Rung schedules [[(configs, rows), ...], ...], one list per bracket.
+        'halving': one bracket starting all configs on the fewest rows; each rung keeps the best 1/eta with eta
+        times the rows, the last rung uses all rows. 'hyperband': brackets from many configs on few rows to a few
+        on all rows, sharing the `n_configs` budget. Anything else: every config on all rows. """
+    if method not in ('halving', 'hyperband'): return [[(n_configs, max_rows)]]
+    s_max = 0
+    while eta ** (s_max + 1) <= n_configs and max_rows // eta ** (s_max + 1) >= min_rows: s_max += 1
+    if method == 'halving': counts = {s_max: n_configs}
+    else:
+        weights = {s: -(-(s_max + 1) * eta ** s // (s + 1)) for s in range(s_max, -1, -1)}
+        counts = {s: max(1, round(n_configs * w / sum(weights.values()))) for s, w in weights.items()}
+    return [[(max(1, n // eta ** r), max_rows // eta ** (s - r)) for r in range(s + 1)] for s, n in counts.items()]
+
+def search_trial_params(config, base_params):
+    """ set_params() arguments of one configuration (XGBoost's eta alias follows learning_rate). """
+    params = dict(config)
+    if 'learning_rate' in params and 'eta' in base_params: params['eta'] = params['learning_rate']
+    return params
+
+def _search_fit_trial(trial, estimator, X_train, y_train, X_val, y_val, cancel_token=None):
+    """ Fits one search trial and scores it on the validation rows (runs in a loky worker process).
+        A configuration that fails to fit is reported, not raised, so it just drops out of the search;
+        a trial stopped through `cancel_token` (time budget or cancel) comes back as interrupted. """
+    global _process_cancel_token
+    previous_token, _process_cancel_token = _process_cancel_token, cancel_token
+    start = time.perf_counter()
+    score, error, interrupted = None, None, False
+    try:
+        model = fit_cancellable(estimator, X_train, y_train)
+        score = float(model.score(X_val, y_val))
+    except OperationCancelled:
+        interrupted = True
+    except Exception as e:
+        error = f"{e.__class__.__name__}: {e}"
+    finally:
+        _process_cancel_token = previous_token
+    return {'trial': trial, 'score': score, 'error': error, 'interrupted': interrupted, 'fit_seconds': time.perf_counter() - start}
+
+# --- Model Comparison ---
+def _compare_fit_model(algo_name, estimator, X_train, y_train, cancel_token=None):
+    """ Fits one algorithm of a comparison run (runs in a loky worker process). A failure is reported, not
+        raised, so the other algorithms still finish; prediction is timed afterwards, one model at a time. """
+    global _process_cancel_token
+    previous_token, _process_cancel_token = _process_cancel_token, cancel_token
+    start = time.perf_counter()
+    model, error = None, None
+    try:
+        model = fit_cancellable(estimator, X_train, y_train)
+    except OperationCancelled:
+        raise
+    except Exception as e:
+        error = f"{e.__class__.__name__}: {e}"
+    finally:
+        _process_cancel_token = previous_token
+    return {'algorithm': algo_name, 'model': model, 'error': error, 'fit_seconds': time.perf_counter() - start}
+
 # =============================================================================
 # Main Application Window
 # =============================================================================
@@ -190,8 +2180,16 @@ class MLClientApp(QMainWindow):
         self.model = None;
         self.X_test_data_processed = None; self.y_test_data = None
         self.predictions = None; self.model_type = None; self.trained_feature_names = None
+        self.model_preprocessor = None; self.input_feature_names = None; self.label_mapping = None # Saved with the model
+        self.last_profile = None # Spans / profiler output of the last training job (性能报告 tab)
+        self.last_search = None # Leaderboard of the last hyperparameter search (搜索排行榜 tab)
+        self.last_comparison = None # Leaderboard of the last multi-model comparison (模型对比 tab)
+        self.data_profile = None # Background column profile of self.dataframe (see update_preprocess_info)
         self.current_theme = DEFAULT_THEME; self.progress_dialog = None
         self.theme_icon_color = 'gray'; self.theme_icon_color_disabled = 'darkGray'
+        self.job_executor = JobExecutor(parent=self); self.job_executor.start() # Warm worker processes
+        self.job_memory_log = [] # Per-job frame hand-off report (see show_memory_report)
+        self.job_executor.memory_report.connect(self._record_job_memory)
 
         # UI Setup
         self.central_widget = QWidget(); self.setCentralWidget(self.central_widget)
@@ -201,6 +2199,36 @@ class MLClientApp(QMainWindow):
         self.set_theme(self.current_theme)
         self.main_layout.addWidget(self.left_nav_widget, 1); self.main_layout.addWidget(self.main_stack, 5)
         self.main_stack.setCurrentIndex(0); self.update_nav_selection(0); self._update_ui_state()
+        self.startup_report_path = None; self._print_startup_report = False # Set from --startup-report
+        self.exit_after_startup = False # --exit-after-startup (benchmarks)
+        self.warmup_worker = None; self._painted = False # First paint triggers _start_warmup
+
+    def _start_warmup(self):
+        """ Builds the remaining pages and imports the ML stack on a background thread, now that the window is visible. """
+        self._build_pages()
+        mark_startup("pages built")
+        self.warmup_worker = Worker(warm_imports, GUI_WARM_IMPORTS)
+        self.warmup_worker.finished.connect(self._on_warmup_complete)
+        self.warmup_worker.error.connect(lambda err: print(f"Warning: background import failed: {err[1]}"))
+        self.warmup_worker.start()
+
+    def _on_warmup_complete(self, _log):
+        mark_startup("background imports done")
+        self._apply_plot_style()
+        if self._print_startup_report:
+            report = startup_report()
+            print(format_startup_report(report), file=sys.stderr)
+            if self.startup_report_path:
+                try:
+                    with open(self.startup_report_path, 'w', encoding='utf-8') as f: json.dump(report, f, indent=2)
+                except OSError as e: print(f"Warning: could not write startup report: {e}")
+        if self.exit_after_startup: QTimer.singleShot(0, self.close)
+
+    def paintEvent(self, event):
+        if not self._painted:
+            self._painted = True; mark_startup("first paint")
+            QTimer.singleShot(0, self._start_warmup)
+        super().paintEvent(event)
 
     # --- Theme and Style ---
     def set_theme(self, theme_name="light"):
@@ -230,11 +2258,11 @@ class MLClientApp(QMainWindow):
         if sys.platform == "darwin": font = QFont("San Francisco", 14)
         elif sys.platform.startswith("linux"): font = QFont("Noto Sans", 11)
         app.setFont(font)
+        self._apply_plot_style()
 
         if theme_name == "dark":
             app.setPalette(dark_palette)
             self.theme_icon_color = "#e0e0e0"; self.theme_icon_color_disabled = "#888888"
-            plt.style.use('dark_background')
             # More detailed dark QSS
             app.setStyleSheet("""
                 QMainWindow { background-color: #353535; }
@@ -307,7 +2335,6 @@ class MLClientApp(QMainWindow):
         else: # Light Theme
             app.setPalette(light_palette)
             self.theme_icon_color = "#333333"; self.theme_icon_color_disabled = "#aaaaaa"
-            plt.style.use('default')
             # More detailed light QSS
             app.setStyleSheet("""
                 QMainWindow { background-color: #ffffff; }
@@ -391,6 +2418,7 @@ class MLClientApp(QMainWindow):
         if hasattr(self, 'open_action'): self.open_action.setIcon(self._get_themed_icon('fa5s.folder-open', 'SP_DialogOpenButton'))
         if hasattr(self, 'save_model_action'): self.save_model_action.setIcon(self._get_themed_icon('fa5s.save', 'SP_DialogSaveButton'))
         if hasattr(self, 'load_model_action'): self.load_model_action.setIcon(self._get_themed_icon('fa5s.folder', 'SP_DialogOpenButton'))
+        if hasattr(self, 'clear_cache_action'): self.clear_cache_action.setIcon(self._get_themed_icon('fa5s.trash-alt', 'SP_TrashIcon'))
         if hasattr(self, 'exit_action'): self.exit_action.setIcon(self._get_themed_icon('fa5s.times-circle', 'SP_DialogCloseButton'))
 
         # --- Nav Buttons ---
@@ -416,6 +2444,10 @@ class MLClientApp(QMainWindow):
         self.open_action = QAction("打开文件 (&O)...", self)
         self.open_action.triggered.connect(self.load_data_dialog)
         file_menu.addAction(self.open_action)
+        self.clear_cache_action = QAction("清除数据缓存 (&C)", self)
+        self.clear_cache_action.triggered.connect(self.clear_dataset_cache)
+        self.clear_cache_action.setEnabled(dataset_cache.enabled)
+        file_menu.addAction(self.clear_cache_action)
         file_menu.addSeparator()
         self.exit_action = QAction("退出 (&X)", self)
         self.exit_action.triggered.connect(self.close)
@@ -428,8 +2460,15 @@ class MLClientApp(QMainWindow):
         self.load_model_action = QAction("加载模型 (&L)...", self)
         self.load_model_action.triggered.connect(self.load_model_dialog)
         model_menu.addAction(self.load_model_action)
+        model_menu.addSeparator()
+        self.predict_action = QAction("预测当前数据并导出 (&P)...", self)
+        self.predict_action.triggered.connect(self.predict_dataset_dialog)
+        model_menu.addAction(self.predict_action)
         # View Menu (Theme selection)
         view_menu = menu_bar.addMenu("视图 (&V)")
+        self.memory_report_action = QAction("作业内存报告 (&M)...", self)
+        self.memory_report_action.triggered.connect(self.show_memory_report)
+        view_menu.addAction(self.memory_report_action)
         theme_menu = view_menu.addMenu("主题 (&T)")
         self.light_theme_action = QAction("浅色", self, checkable=True)
         self.light_theme_action.setChecked(self.current_theme == "light")
@@ -451,6 +2490,7 @@ class MLClientApp(QMainWindow):
         # Initial state for model menu items
         self.save_model_action.setEnabled(False)
         self.load_model_action.setEnabled(True)
+        self.predict_action.setEnabled(False)
 
     def _create_left_nav_bar(self):
         self.left_nav_widget = QWidget()
@@ -478,20 +2518,25 @@ class MLClientApp(QMainWindow):
     def _create_main_panel(self):
         self.main_stack = QStackedWidget()
         self.main_stack.setContentsMargins(15, 15, 15, 15)
-        # Create Pages
+        # Only the welcome page is built before the window shows; _build_pages() replaces the placeholders
         self.page_welcome = self._create_welcome_page()
+        self.main_stack.addWidget(self.page_welcome)   # 0
+        for _ in range(5): self.main_stack.addWidget(QWidget()) # 1 preview, 2 preprocess, 3 config, 4 model, 5 results
+
+    def _build_pages(self):
+        """ Creates the preview..results pages in place of their placeholders (once). """
+        if hasattr(self, 'page_results'): return
         self.page_preview = self._create_preview_page()
         self.page_preprocess = self._create_preprocess_page()
         self.page_config = self._create_config_page()
         self.page_model = self._create_model_page()
         self.page_results = self._create_results_page() # Updated results page creation
-        # Add Pages in order
-        self.main_stack.addWidget(self.page_welcome)   # 0
-        self.main_stack.addWidget(self.page_preview)  # 1
-        self.main_stack.addWidget(self.page_preprocess)# 2
-        self.main_stack.addWidget(self.page_config)   # 3
-        self.main_stack.addWidget(self.page_model)    # 4
-        self.main_stack.addWidget(self.page_results)  # 5
+        pages = (self.page_preview, self.page_preprocess, self.page_config, self.page_model, self.page_results)
+        for index, page in enumerate(pages, start=1):
+            placeholder = self.main_stack.widget(index)
+            self.main_stack.removeWidget(placeholder); placeholder.deleteLater()
+            self.main_stack.insertWidget(index, page)
+        self._update_icons(); self._update_ui_state()
 
     def _create_welcome_page(self):
         page = QWidget(); layout = QVBoxLayout(page); layout.setAlignment(Qt.AlignmentFlag.AlignCenter)
@@ -526,17 +2571,18 @@ class MLClientApp(QMainWindow):
         # Left Side: Data Info and Column Selection
         left_widget = QWidget()
         left_layout = QVBoxLayout(left_widget)
-        left_layout.addWidget(QLabel("<b>数据信息概览:</b>"))
-        self.data_info_display = QTextEdit()
-        self.data_info_display.setReadOnly(True)
-        self.data_info_display.setFontFamily("monospace")
-        self.data_info_display.setFixedHeight(200)
-        left_layout.addWidget(self.data_info_display)
+        left_layout.addWidget(QLabel("<b>数据质量概览:</b> (后台逐列分析)"))
+        self.profile_summary_label = QLabel(""); self.profile_summary_label.setWordWrap(True)
+        left_layout.addWidget(self.profile_summary_label)
+        self.profile_table = QTableView(); self.profile_table.setAlternatingRowColors(True); self.profile_table.setSortingEnabled(True)
+        self.profile_table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers); self.profile_table.verticalHeader().setVisible(False)
+        self.profile_model = QStandardItemModel(); self.profile_table.setModel(self.profile_model); self.profile_table.setMinimumHeight(220)
+        left_layout.addWidget(self.profile_table, 2)
 
         left_layout.addWidget(QLabel("<b>选择要处理的列:</b> (按住Ctrl/Shift多选)"))
         self.preprocess_col_list = QListWidget()
         self.preprocess_col_list.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
-        left_layout.addWidget(self.preprocess_col_list)
+        left_layout.addWidget(self.preprocess_col_list, 1)
         splitter.addWidget(left_widget)
 
         # Right Side: Preprocessing Steps (Scrollable)
@@ -552,9 +2598,24 @@ class MLClientApp(QMainWindow):
         self.impute_strategy_combo.addItems(["不处理", "均值 (Mean)", "中位数 (Median)", "众数 (Most Frequent)", "常量 (Constant)"])
         self.impute_constant_value = QLineEdit("0")
         self.impute_constant_value.setEnabled(False)
-        self.impute_strategy_combo.currentTextChanged.connect(lambda text: self.impute_constant_value.setEnabled(text == "常量 (Constant)"))
+        self.impute_approx_checkbox = QCheckBox("近似统计 (流式草图, 适合超大数据)")
+        self.impute_approx_checkbox.setToolTip("中位数/众数按块用草图估计, 不对整列排序或计数。\n"
+                                               "中位数: 结果的秩与真实中位数相差不超过 误差上限 x 行数;\n"
+                                               "众数: 结果的出现次数比真实众数少不超过 误差上限 x 行数。")
+        self.impute_approx_checkbox.setEnabled(False)
+        self.impute_approx_error_spinbox = QDoubleSpinBox(); self.impute_approx_error_spinbox.setDecimals(2); self.impute_approx_error_spinbox.setRange(0.01, 5.0)
+        self.impute_approx_error_spinbox.setSingleStep(0.05); self.impute_approx_error_spinbox.setSuffix(" %"); self.impute_approx_error_spinbox.setValue(100 * APPROX_IMPUTE_DEFAULT_ERROR)
+        self.impute_approx_error_spinbox.setEnabled(False)
+        def on_impute_strategy(text):
+            self.impute_constant_value.setEnabled(text == "常量 (Constant)")
+            self.impute_approx_checkbox.setEnabled(IMPUTE_STRATEGIES.get(text) in ('median', 'most_frequent'))
+            self.impute_approx_error_spinbox.setEnabled(self.impute_approx_checkbox.isEnabled() and self.impute_approx_checkbox.isChecked())
+        self.impute_strategy_combo.currentTextChanged.connect(on_impute_strategy)
+        self.impute_approx_checkbox.toggled.connect(lambda: on_impute_strategy(self.impute_strategy_combo.currentText()))
         impute_form.addRow("填充策略:", self.impute_strategy_combo)
         impute_form.addRow("常量值:", self.impute_constant_value)
+        impute_form.addRow(self.impute_approx_checkbox)
+        impute_form.addRow("误差上限:", self.impute_approx_error_spinbox)
         right_layout.addWidget(impute_group)
 
         # --- Scaling ---
@@ -569,20 +2630,34 @@ class MLClientApp(QMainWindow):
         encode_group = QGroupBox("类别特征编码")
         encode_form = QFormLayout(encode_group)
         self.encode_strategy_combo = QComboBox()
-        self.encode_strategy_combo.addItems(["不处理", "独热编码 (One-Hot)", "序号编码 (Ordinal)"])
+        self.encode_strategy_combo.addItems(["不处理", "独热编码 (One-Hot)", "序号编码 (Ordinal)", NATIVE_CATEGORICAL_ENCODING])
+        self.encode_strategy_combo.setItemData(3, "保留为一个 category 列 (不展开), 由 LightGBM/XGBoost 直接按类别分裂", Qt.ItemDataRole.ToolTipRole)
         encode_form.addRow("编码方法:", self.encode_strategy_combo)
         right_layout.addWidget(encode_group)
 
+        # --- Execution ---
+        exec_group = QGroupBox("执行")
+        exec_form = QFormLayout(exec_group)
+        self.preprocess_jobs_spinbox = QSpinBox(); self.preprocess_jobs_spinbox.setRange(1, os.cpu_count() or 1); self.preprocess_jobs_spinbox.setValue(os.cpu_count() or 1)
+        self.preprocess_jobs_spinbox.setToolTip("按列分区在多个进程中并行拟合填充/缩放/编码 (宽表接近线性加速); 1 = 单进程。\n"
+                                                f"所选数据少于 {PREPROCESS_PARALLEL_MIN_CELLS:,} 个单元格时始终单进程执行。")
+        exec_form.addRow("并行进程数:", self.preprocess_jobs_spinbox)
+        right_layout.addWidget(exec_group)
+
         right_layout.addStretch(1)
         scroll_area.setWidget(right_widget)
         splitter.addWidget(scroll_area)
 
         main_layout.addWidget(splitter)
 
-        # Action Button
+        # Action Button (the label reports which steps the last run served from the step cache)
+        action_layout = QHBoxLayout()
+        self.preprocess_cache_label = QLabel(""); self.preprocess_cache_label.setStyleSheet("color: gray;")
+        action_layout.addWidget(self.preprocess_cache_label, 1)
         self.apply_preprocess_button = QPushButton(" 应用预处理步骤")
         self.apply_preprocess_button.clicked.connect(self.run_preprocessing)
-        main_layout.addWidget(self.apply_preprocess_button, 0, Qt.AlignmentFlag.AlignRight)
+        action_layout.addWidget(self.apply_preprocess_button)
+        main_layout.addLayout(action_layout)
 
         splitter.setSizes([350, 450])
         return page
@@ -632,7 +2707,7 @@ class MLClientApp(QMainWindow):
         # Algorithm Selection
         algo_layout = QHBoxLayout(); algo_layout.addWidget(QLabel("选择算法:"))
         self.algo_combo = QComboBox()
-        algo_items = ["随机森林", "神经网络(MLP)"]
+        algo_items = ["随机森林", "神经网络(MLP)", "SGD 线性模型"]
         if lgb: algo_items.append("LightGBM")
         if xgb: algo_items.append("XGBoost")
         self.algo_combo.addItems(algo_items)
@@ -643,6 +2718,7 @@ class MLClientApp(QMainWindow):
         self.param_widgets = {
             "随机森林": self._create_rf_params(),
             "神经网络(MLP)": self._create_mlp_params(),
+            "SGD 线性模型": self._create_sgd_params(),
         }
         if lgb: self.param_widgets["LightGBM"] = self._create_lgbm_params()
         if xgb: self.param_widgets["XGBoost"] = self._create_xgb_params()
@@ -650,6 +2726,9 @@ class MLClientApp(QMainWindow):
         for widget in self.param_widgets.values(): self.param_stack.addWidget(widget)
         self.algo_combo.currentTextChanged.connect(self.switch_param_widget)
         layout.addWidget(self.param_stack)
+        self.native_categorical_checkbox = QCheckBox("类别特征原生处理 (跳过独热/序号编码)")
+        self.native_categorical_checkbox.setToolTip("LightGBM/XGBoost 直接使用 category 类型的类别列; 选择这两种算法时自动启用")
+        layout.addWidget(self.native_categorical_checkbox)
 
         # --- Cross-Validation Option ---
         cv_group = QGroupBox("交叉验证设置 (可选)")
@@ -661,6 +2740,72 @@ class MLClientApp(QMainWindow):
         cv_layout.addWidget(self.cv_checkbox); cv_layout.addWidget(QLabel("折数 (K):")); cv_layout.addWidget(self.cv_folds_spinbox); cv_layout.addStretch()
         layout.addWidget(cv_group)
 
+        # --- Bootstrap confidence intervals for the test-set metrics (see MetricsEngine.bootstrap) ---
+        self.bootstrap_group = QGroupBox("指标置信区间 (自助法, 可选)"); self.bootstrap_group.setCheckable(True); self.bootstrap_group.setChecked(False)
+        self.bootstrap_group.setToolTip(f"对测试集重采样, 给出各指标的 {BOOTSTRAP_CONFIDENCE:.0%} 百分位置信区间; "
+                                        f"超过 {BOOTSTRAP_MAX_ROWS:,} 行时 AUC/回归指标在随机子集上重采样并按 √(m/n) 缩放。")
+        bootstrap_layout = QHBoxLayout(self.bootstrap_group)
+        self.bootstrap_spinbox = QSpinBox(); self.bootstrap_spinbox.setRange(100, 100_000); self.bootstrap_spinbox.setSingleStep(500)
+        self.bootstrap_spinbox.setValue(BOOTSTRAP_DEFAULT_RESAMPLES)
+        bootstrap_layout.addWidget(QLabel("重采样次数:")); bootstrap_layout.addWidget(self.bootstrap_spinbox); bootstrap_layout.addStretch()
+        layout.addWidget(self.bootstrap_group)
+
+        # --- Hyperparameter Search (optional): candidate lists / ranges per parameter ---
+        self.search_group = QGroupBox("超参数搜索 (可选)"); self.search_group.setCheckable(True); self.search_group.setChecked(False)
+        search_layout = QVBoxLayout(self.search_group)
+        budget_layout = QHBoxLayout()
+        self.search_method_combo = QComboBox(); self.search_method_combo.addItems(SEARCH_METHODS)
+        self.search_trials_spinbox = QSpinBox(); self.search_trials_spinbox.setRange(1, 1000); self.search_trials_spinbox.setValue(20)
+        self.search_time_spinbox = QSpinBox(); self.search_time_spinbox.setRange(0, 7 * 24 * 3600); self.search_time_spinbox.setSuffix(" 秒"); self.search_time_spinbox.setSpecialValueText("不限")
+        self.search_cores_spinbox = QSpinBox(); self.search_cores_spinbox.setRange(1, os.cpu_count() or 1); self.search_cores_spinbox.setValue(os.cpu_count() or 1)
+        for label, widget in (("方法:", self.search_method_combo), ("配置数:", self.search_trials_spinbox),
+                              ("时间预算:", self.search_time_spinbox), ("核数:", self.search_cores_spinbox)):
+            budget_layout.addWidget(QLabel(label)); budget_layout.addWidget(widget)
+        budget_layout.addStretch(); search_layout.addLayout(budget_layout)
+        search_hint = QLabel("每个参数填写候选列表 (100, 300) 或范围 (0.01..0.3, 加 log 为对数采样); 留空则使用上方的固定值。")
+        search_hint.setWordWrap(True); search_layout.addWidget(search_hint)
+        self.search_space_stack = QStackedWidget(); self.search_space_fields = {}
+        for algo in self.param_widgets:
+            form_widget = QWidget(); form = QFormLayout(form_widget); self.search_space_fields[algo] = {}
+            for param, (kind, example) in SEARCH_PARAM_SPECS[algo].items():
+                field = QLineEdit(); field.setPlaceholderText(f"例: {example}")
+                form.addRow(f"{param}:", field); self.search_space_fields[algo][param] = field
+            self.search_space_stack.addWidget(form_widget)
+        search_layout.addWidget(self.search_space_stack)
+        layout.addWidget(self.search_group)
+
+        # --- Model Comparison: one shared split, the checked algorithms trained concurrently (模型对比 tab) ---
+        self.compare_group = QGroupBox("多模型对比 (同一拆分, 并行训练)"); self.compare_group.setCheckable(True); self.compare_group.setChecked(False)
+        self.compare_group.setToolTip("数据准备、训练/测试拆分与预处理只做一次, 勾选的算法按各自的参数设置在共享核数内同时训练; "
+                                      "最佳模型成为当前模型。忽略交叉验证设置。")
+        compare_layout = QHBoxLayout(self.compare_group); self.compare_checkboxes = {}
+        for algo in self.param_widgets:
+            box = QCheckBox(algo); box.setChecked(True); compare_layout.addWidget(box); self.compare_checkboxes[algo] = box
+        self.compare_cores_spinbox = QSpinBox(); self.compare_cores_spinbox.setRange(1, os.cpu_count() or 1); self.compare_cores_spinbox.setValue(os.cpu_count() or 1)
+        compare_layout.addWidget(QLabel("核数:")); compare_layout.addWidget(self.compare_cores_spinbox); compare_layout.addStretch()
+        layout.addWidget(self.compare_group)
+
+        # --- Incremental (out-of-core) training: streams the loaded file from disk chunk by chunk ---
+        self.incremental_group = QGroupBox("增量训练 (从磁盘分块读取, 用于超出内存的数据)"); self.incremental_group.setCheckable(True); self.incremental_group.setChecked(False)
+        self.incremental_group.setToolTip(f"按块读取已加载的 CSV 文件 (或其本地缓存), 不在内存中构建完整数据; 约 {INCREMENTAL_EVAL_FRACTION:.0%} 的行 (按行号固定) "
+                                          f"作为评估流。支持: {', '.join(INCREMENTAL_ALGORITHMS)}; 忽略交叉验证设置。")
+        incremental_layout = QHBoxLayout(self.incremental_group)
+        self.incremental_chunk_spinbox = QSpinBox(); self.incremental_chunk_spinbox.setRange(1000, 10_000_000); self.incremental_chunk_spinbox.setSingleStep(10_000)
+        self.incremental_chunk_spinbox.setValue(INCREMENTAL_CHUNK_ROWS)
+        self.incremental_epochs_spinbox = QSpinBox(); self.incremental_epochs_spinbox.setRange(1, 100); self.incremental_epochs_spinbox.setValue(1)
+        self.incremental_epochs_spinbox.setToolTip("数据遍数 (MLP / SGD / LightGBM); XGBoost 使用外存 DMatrix, 按迭代次数训练")
+        for label, widget in (("每块行数:", self.incremental_chunk_spinbox), ("遍数:", self.incremental_epochs_spinbox)):
+            incremental_layout.addWidget(QLabel(label)); incremental_layout.addWidget(widget)
+        incremental_layout.addStretch(); layout.addWidget(self.incremental_group)
+
+        # --- Profiling Option (stage timings are always recorded, see the 性能报告 tab) ---
+        profile_layout = QHBoxLayout(); profile_layout.addWidget(QLabel("性能剖析:"))
+        self.profile_combo = QComboBox()
+        self.profile_combo.addItems([name for name, mode in PROFILE_MODES.items()
+                                     if mode != 'pyinstrument' or importlib.util.find_spec('pyinstrument') is not None])
+        self.profile_combo.setToolTip("训练时额外记录函数级剖析 (会使训练变慢)")
+        profile_layout.addWidget(self.profile_combo); profile_layout.addStretch(); layout.addLayout(profile_layout)
+
         layout.addStretch(1)
         # Train Button
         self.train_button = QPushButton(" 开始训练模型")
@@ -697,15 +2842,28 @@ class MLClientApp(QMainWindow):
         })
         return widget
 
+    def _create_sgd_params(self):
+        widget = QWidget(); layout = QFormLayout(widget); widget.setObjectName("param_sgd")
+        penalty = QComboBox(); penalty.addItems(["l2", "l1", "elasticnet"]); layout.addRow("正则化 (penalty):", penalty)
+        alpha = QDoubleSpinBox(); alpha.setDecimals(6); alpha.setRange(0.0, 1.0); alpha.setSingleStep(0.0001); alpha.setValue(0.0001); layout.addRow("正则化强度 (alpha):", alpha)
+        max_iter = QSpinBox(); max_iter.setRange(1, 10000); max_iter.setValue(1000); layout.addRow("最大轮数 (max_iter):", max_iter)
+        layout.addRow(QLabel("分类使用 log_loss (可输出概率), 回归使用 squared_error; 建议对数值列做标准化。"))
+        widget.setProperty("get_params", lambda model_type: {
+            'penalty': penalty.currentText(), 'alpha': alpha.value(), 'max_iter': max_iter.value()
+        })
+        return widget
+
     def _create_lgbm_params(self):
         widget = QWidget(); layout = QFormLayout(widget); widget.setObjectName("param_lgbm")
         n_est = QSpinBox(); n_est.setRange(10, 5000); n_est.setValue(100); layout.addRow("迭代次数 (n_estimators):", n_est)
         lr = QDoubleSpinBox(); lr.setDecimals(4); lr.setRange(0.0001, 1.0); lr.setSingleStep(0.01); lr.setValue(0.1); layout.addRow("学习率 (learning_rate):", lr)
         max_d = QSpinBox(); max_d.setRange(-1, 100); max_d.setValue(-1); max_d.setSpecialValueText("无限制 (-1)"); layout.addRow("最大深度 (max_depth):", max_d)
         num_leaves = QSpinBox(); num_leaves.setRange(2, 1000); num_leaves.setValue(31); layout.addRow("叶子节点数 (num_leaves):", num_leaves)
+        early_stop = self._create_early_stopping_spinbox(); layout.addRow("早停轮数 (early_stopping_rounds):", early_stop)
         widget.setProperty("get_params", lambda model_type: {
             'n_estimators': n_est.value(), 'learning_rate': lr.value(),
-            'max_depth': max_d.value() if max_d.value()!=-1 else -1, 'num_leaves': num_leaves.value()
+            'max_depth': max_d.value() if max_d.value()!=-1 else -1, 'num_leaves': num_leaves.value(),
+            'early_stopping_rounds': early_stop.value()
         })
         return widget
 
@@ -716,17 +2874,29 @@ class MLClientApp(QMainWindow):
         max_d = QSpinBox(); max_d.setRange(0, 100); max_d.setValue(6); layout.addRow("最大深度 (max_depth):", max_d)
         subsample = QDoubleSpinBox(); subsample.setRange(0.1, 1.0); subsample.setSingleStep(0.1); subsample.setValue(1.0); layout.addRow("样本采样比 (subsample):", subsample)
         colsample = QDoubleSpinBox(); colsample.setRange(0.1, 1.0); colsample.setSingleStep(0.1); colsample.setValue(1.0); layout.addRow("特征采样比 (colsample_bytree):", colsample)
+        early_stop = self._create_early_stopping_spinbox(); layout.addRow("早停轮数 (early_stopping_rounds):", early_stop)
         widget.setProperty("get_params", lambda model_type: {
             'n_estimators': n_est.value(), 'learning_rate': lr.value(), 'eta': lr.value(),
-            'max_depth': max_d.value(), 'subsample': subsample.value(), 'colsample_bytree': colsample.value()
+            'max_depth': max_d.value(), 'subsample': subsample.value(), 'colsample_bytree': colsample.value(),
+            'early_stopping_rounds': early_stop.value()
         })
         return widget
 
+    def _create_early_stopping_spinbox(self):
+        early_stop = QSpinBox(); early_stop.setRange(0, 1000); early_stop.setValue(50); early_stop.setSpecialValueText("关闭 (0)")
+        early_stop.setToolTip(f"从训练数据中留出 {BOOSTING_VALIDATION_FRACTION:.0%} 作为验证集; 验证指标连续这么多轮没有改善时停止训练, "
+                              "模型使用最佳迭代。迭代次数 (n_estimators) 即为上限。")
+        return early_stop
+
     def switch_param_widget(self, algo_name):
         """ Show the parameter widget for the selected algorithm """
         if algo_name in self.param_widgets:
             widget_to_show = self.param_widgets[algo_name]
             self.param_stack.setCurrentWidget(widget_to_show)
+            if hasattr(self, 'search_space_stack'): self.search_space_stack.setCurrentIndex(list(self.param_widgets).index(algo_name))
+            if hasattr(self, 'native_categorical_checkbox'):
+                is_boosting = algo_name in BOOSTING_ALGORITHMS
+                self.native_categorical_checkbox.setEnabled(is_boosting); self.native_categorical_checkbox.setChecked(is_boosting)
         else:
             pass # Silently ignore if widget doesn't exist (shouldn't happen)
 
@@ -742,10 +2912,39 @@ class MLClientApp(QMainWindow):
         # Tab 2: Evaluation Metrics
         self.tab_metrics = QWidget(); metrics_layout = QVBoxLayout(self.tab_metrics); metrics_layout.addWidget(QLabel("模型评估指标:")); self.metrics_display = QTextEdit(); self.metrics_display.setReadOnly(True); self.metrics_display.setFontFamily("monospace"); metrics_layout.addWidget(self.metrics_display); self.results_tabs.addTab(self.tab_metrics, "评估指标")
 
-        # Tab 3: Feature Importance
-        self.tab_importance = QWidget(); importance_layout = QVBoxLayout(self.tab_importance); importance_layout.addWidget(QLabel("特征重要性:"))
-        self.importance_figure = Figure(figsize=(7, 5), dpi=100) # Adjusted size
-        self.importance_canvas = FigureCanvas(self.importance_figure); importance_layout.addWidget(self.importance_canvas); self.results_tabs.addTab(self.tab_importance, "特征重要性")
+        # Tab 3: Feature Importance (canvas created on first plot, see _ensure_importance_canvas)
+        self.tab_importance = QWidget(); self.importance_layout = QVBoxLayout(self.tab_importance); self.importance_layout.addWidget(QLabel("特征重要性:"))
+        self.importance_layout.addStretch(1); self.results_tabs.addTab(self.tab_importance, "特征重要性")
+
+        # Tab: Learning Curve (validation metric per boosting round with early stopping, or per chunk in incremental training)
+        self.tab_curve = QWidget(); self.curve_layout = QVBoxLayout(self.tab_curve); self.curve_layout.addWidget(QLabel("学习曲线 (验证集 / 评估流):"))
+        self.curve_layout.addStretch(1); self.results_tabs.addTab(self.tab_curve, "学习曲线")
+
+        # Tab 4: Performance Report (stage spans of the last training job, optional profiler output)
+        self.tab_profile = QWidget(); profile_layout = QVBoxLayout(self.tab_profile)
+        self.profile_display = QTextEdit(); self.profile_display.setReadOnly(True); self.profile_display.setFont(QFont("Consolas", 9))
+        self.profile_display.setLineWrapMode(QTextEdit.LineWrapMode.NoWrap); profile_layout.addWidget(self.profile_display)
+        profile_buttons = QHBoxLayout()
+        self.export_trace_button = QPushButton("导出 Chrome Trace..."); self.export_trace_button.clicked.connect(self.export_chrome_trace)
+        self.export_profile_button = QPushButton("导出剖析数据..."); self.export_profile_button.clicked.connect(self.export_profile_data)
+        profile_buttons.addWidget(self.export_trace_button); profile_buttons.addWidget(self.export_profile_button); profile_buttons.addStretch()
+        profile_layout.addLayout(profile_buttons); self.results_tabs.addTab(self.tab_profile, "性能报告")
+
+        # Tab 5: Search Leaderboard (trials of the last hyperparameter search, sortable by any column)
+        self.tab_search = QWidget(); search_tab_layout = QVBoxLayout(self.tab_search)
+        self.search_summary_label = QLabel("未进行超参数搜索。"); self.search_summary_label.setWordWrap(True); search_tab_layout.addWidget(self.search_summary_label)
+        self.search_table = QTableView(); self.search_table.setAlternatingRowColors(True); self.search_table.setSortingEnabled(True)
+        self.search_table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers); self.search_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Interactive)
+        self.search_model = QStandardItemModel(); self.search_table.setModel(self.search_model); search_tab_layout.addWidget(self.search_table)
+        self.results_tabs.addTab(self.tab_search, "搜索排行榜")
+
+        # Tab 6: Model Comparison (one row per algorithm of the last comparison run, sortable by any column)
+        self.tab_compare = QWidget(); compare_tab_layout = QVBoxLayout(self.tab_compare)
+        self.compare_summary_label = QLabel("未进行多模型对比。"); self.compare_summary_label.setWordWrap(True); compare_tab_layout.addWidget(self.compare_summary_label)
+        self.compare_table = QTableView(); self.compare_table.setAlternatingRowColors(True); self.compare_table.setSortingEnabled(True)
+        self.compare_table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers); self.compare_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Interactive)
+        self.compare_model = QStandardItemModel(); self.compare_table.setModel(self.compare_model); compare_tab_layout.addWidget(self.compare_table)
+        self.results_tabs.addTab(self.tab_compare, "模型对比")
 
         # REMOVED: Confusion Matrix Tab
         # REMOVED: ROC Curve Tab
@@ -759,6 +2958,7 @@ class MLClientApp(QMainWindow):
     # --- UI Interaction ---
     def switch_main_panel(self, index):
         if not (0 <= index < self.main_stack.count()): return
+        self._build_pages()
         current_data = self.processed_dataframe if self.processed_dataframe is not None else self.dataframe
         can_proceed = True
         required_step = ""
@@ -817,6 +3017,7 @@ class MLClientApp(QMainWindow):
         # Menu Items
         self.save_model_action.setEnabled(model_trained)
         self.load_model_action.setEnabled(True)
+        self.predict_action.setEnabled(model_trained and data_loaded)
 
         # Nav Buttons
         self.nav_buttons["preview"].setEnabled(data_loaded)
@@ -849,8 +3050,7 @@ class MLClientApp(QMainWindow):
             df_to_show = self.processed_dataframe if self.processed_dataframe is not None else self.dataframe
             if df_to_show is not None:
                 rows, cols = df_to_show.shape
-                limit_msg = f" (显示前 {MAX_PREVIEW_ROWS} 行)" if rows > MAX_PREVIEW_ROWS else ""
-                self.rows_cols_label.setText(f"{rows} 行 x {cols} 列{limit_msg}")
+                self.rows_cols_label.setText(f"{rows:,} 行 x {cols} 列")
                 fname = self.current_file_path.split('/')[-1] if self.current_file_path else "数据"
                 status = " (已处理)" if self.processed_dataframe is not None else ""
                 self.preview_label.setText(f"预览: {fname}{status}")
@@ -879,6 +3079,7 @@ class MLClientApp(QMainWindow):
                 self.progress_dialog.canceled.connect(worker.stop)
                 worker.finished.connect(self._finish_progress)
                 worker.error.connect(self._finish_progress)
+                worker.cancelled.connect(self._finish_progress)
             else:
                 print("Warning: Progress dialog started without a worker to connect to.")
 
@@ -888,6 +3089,53 @@ class MLClientApp(QMainWindow):
             self.progress_dialog.setRange(0, max_val)
             self.progress_dialog.setValue(0)
 
+    def _create_job(self, func, *args, priority=0):
+        """ Job for `func` on the warm process pool, or a Worker thread if the pool is unavailable.
+            DataFrame arguments are never deep-copied: the pool maps their snapshot read-only, a thread gets
+            a shallow copy (with Copy-on-Write only the columns the job writes are duplicated). """
+        if self.job_executor.available: return ProcessJob(self.job_executor, func, *args, priority=priority)
+        frames = [a for a in args if isinstance(a, pd.DataFrame)]
+        worker = Worker(func, *(a.copy(deep=False) if isinstance(a, pd.DataFrame) else a for a in args))
+        if frames:
+            frame_bytes = sum(int(df.memory_usage(deep=True).sum()) for df in frames)
+            self._record_job_memory(worker, {'frames': len(frames), 'frame_bytes': frame_bytes, 'exported_bytes': 0,
+                                             'zero_copy_bytes': frame_bytes, 'copied_bytes': 0, 'saved_bytes': frame_bytes})
+        return worker
+
+    def _record_job_memory(self, job, report):
+        """ Logs how a job's input frames were handed over. Saved = the GUI-side df.copy() that is no longer
+            made; the zero-copy bytes are the part of those frames the worker maps instead of converting, listed
+            on their own (they are already counted in the frame bytes). """
+        entry = dict(report, job=job.func.__name__.strip('_'), time=datetime.datetime.now().strftime("%H:%M:%S"))
+        entry.setdefault('saved_bytes', entry.get('frame_bytes', 0))
+        self.job_memory_log.append(entry)
+        if getattr(job, 'background', False): return # Profiling jobs do not take over the status bar
+        self.status_bar.showMessage(f"作业数据交接: 节省约 {entry['saved_bytes'] / 1024**2:.1f} MB 内存 (未复制)，"
+                                    f"其中 {entry.get('zero_copy_bytes', 0) / 1024**2:.1f} MB 由作业直接映射.", 5000)
+
+    def show_memory_report(self):
+        """ Shows the per-job memory report (bytes handed off without copying). """
+        mb = lambda b: f"{b / 1024**2:10.1f}"
+        lines = [f"{'时间':<9}{'作业':<24}{'数据(MB)':>10}{'新导出(MB)':>12}{'零拷贝(MB)':>12}{'转换复制(MB)':>14}{'节省(MB)':>10}"]
+        for e in self.job_memory_log:
+            lines.append(f"{e['time']:<9}{e['job']:<24}{mb(e['frame_bytes'])}{mb(e['exported_bytes']):>12}"
+                         f"{mb(e.get('zero_copy_bytes', 0)):>12}{mb(e.get('copied_bytes', 0)):>14}{mb(e['saved_bytes'])}")
+        if not self.job_memory_log: lines.append("(尚无作业)")
+        total = sum(e['saved_bytes'] for e in self.job_memory_log)
+        lines += ["", f"合计节省: {total / 1024**2:.1f} MB",
+                  "数据: 交给作业的 DataFrame 大小 (以前每次都会 df.copy())。新导出: 首次交接时写入快照文件的字节 (同一版本的数据只导出一次)。",
+                  "零拷贝: 工作进程直接只读映射的列。转换复制: 需要转换 (如含 NaN、类别列) 而复制的列。",
+                  "节省: 不再复制的数据 (= 数据列)；零拷贝与转换复制只是其在工作进程中的构成，不再另计。"]
+        dialog = QDialog(self); dialog.setWindowTitle("作业内存报告"); dialog.resize(820, 420)
+        text = QTextEdit(); text.setReadOnly(True); text.setFont(QFont("Consolas", 9)); text.setPlainText("\n".join(lines))
+        layout = QVBoxLayout(dialog); layout.addWidget(text)
+        dialog.exec()
+
+    def closeEvent(self, event):
+        if self.warmup_worker is not None: self.warmup_worker.wait() # Imports cannot be interrupted
+        self.job_executor.shutdown()
+        super().closeEvent(event)
+
     def _finish_progress(self):
         """ Closes the progress dialog if it exists. """
         if self.progress_dialog is not None:
@@ -902,34 +3150,53 @@ class MLClientApp(QMainWindow):
         self.status_bar.showMessage(f"开始加载: {file_path.split('/')[-1]}...")
         self.load_button_welcome.setEnabled(False); self.open_action.setEnabled(False)
 
-        self.load_worker = Worker(self._load_data_thread, file_path)
+        self.load_worker = self._create_job(self._load_data_thread, file_path, priority=JOB_PRIORITY_LOAD)
         self.load_worker.finished.connect(self._on_data_loaded)
         self.load_worker.error.connect(self._on_load_error)
         self.load_worker.finished.connect(self._reset_load_buttons_state)
         self.load_worker.error.connect(self._reset_load_buttons_state)
+        self.load_worker.cancelled.connect(self._reset_load_buttons_state)
+        self.load_worker.cancelled.connect(lambda: self.status_bar.showMessage("加载已取消.", 5000))
 
         self._start_progress(f"加载文件: {file_path.split('/')[-1]}", worker=self.load_worker)
         self.load_worker.start()
 
+    def clear_dataset_cache(self):
+        """ Deletes all cached dataset sidecars and memoized preprocessing steps after confirmation. """
+        step_cache = PreprocessStepCache()
+        size_mb = (dataset_cache.size_bytes() + step_cache.size_bytes()) / 1024**2
+        reply = QMessageBox.question(self, "清除数据缓存", f"缓存目录: {dataset_cache.cache_dir}\n预处理步骤缓存: {step_cache.cache_dir}\n"
+                                     f"当前占用: {size_mb:.1f} MB\n\n确定要删除所有缓存的数据集和预处理结果吗？",
+                                     QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No, QMessageBox.StandardButton.No)
+        if reply == QMessageBox.StandardButton.No: return
+        freed = dataset_cache.clear() + step_cache.clear()
+        self.status_bar.showMessage(f"数据缓存已清除，释放 {freed / 1024**2:.1f} MB.", 5000)
+
     def _reset_load_buttons_state(self):
         """ Re-enables data loading buttons. """
         self.load_button_welcome.setEnabled(True)
         self.open_action.setEnabled(True)
 
-    def _load_data_thread(self, progress_signal, status_signal, file_path):
+    @classmethod
+    def _load_data_thread(cls, progress_signal, status_signal, file_path):
         status_signal.emit(f"读取: {file_path.split('/')[-1]}...")
-        progress_signal.emit(10)
+        progress_signal.emit(5)
         try:
+            cached_df = dataset_cache.load(file_path)
+            if cached_df is not None:
+                status_signal.emit("从本地缓存加载 (文件未变化，跳过解析)...")
+                progress_signal.emit(100)
+                return cached_df, file_path
+
             ext = file_path.lower().split('.')[-1]
             if ext == 'csv':
-                read_func = pd.read_csv
+                # Streamed + downcast per chunk, progress follows the byte offset
+                df = read_csv_chunked(file_path, progress_signal, status_signal)
             elif ext in ['xlsx', 'xls']:
-                read_func = pd.read_excel
+                df = pd.read_excel(file_path)
             else:
                 raise ValueError(f"不支持的文件类型: {ext}")
-
-            df = read_func(file_path)
-            progress_signal.emit(70)
+            progress_signal.emit(90)
 
             if df.empty: raise ValueError("文件数据为空.")
 
@@ -950,8 +3217,10 @@ class MLClientApp(QMainWindow):
                     df.columns = cols
                     status_signal.emit("警告: 使用备用方法重命名重复列。")
 
+            if dataset_cache.enabled:
+                status_signal.emit("写入本地数据缓存...")
+                dataset_cache.store(file_path, df)
 
-            progress_signal.emit(90)
             status_signal.emit("文件读取完成.")
             progress_signal.emit(100)
             return df, file_path
@@ -1010,7 +3279,7 @@ class MLClientApp(QMainWindow):
         if hasattr(self, 'feature_cols_list'): self.feature_cols_list.clear()
         if hasattr(self, 'target_col_label'): self.target_col_label.setText("<i>(未选择)</i>")
         if hasattr(self, 'preprocess_col_list'): self.preprocess_col_list.clear()
-        if hasattr(self, 'data_info_display'): self.data_info_display.clear()
+        self._reset_data_profile()
 
     def _reset_model_state(self):
         """ Resets only variables related to trained model and results displays. """
@@ -1020,12 +3289,19 @@ class MLClientApp(QMainWindow):
         self.predictions = None
         self.model_type = None
         self.trained_feature_names = None
+        self.model_preprocessor = None; self.input_feature_names = None; self.label_mapping = None
 
         if hasattr(self, 'prediction_model'): self.prediction_model.update_dataframe(None)
         if hasattr(self, 'metrics_display'): self.metrics_display.clear()
+        self.last_profile = None
+        if hasattr(self, 'profile_display'): self.display_profile_report()
+        self.last_search = None
+        if hasattr(self, 'search_model'): self.display_search_leaderboard()
+        self.last_comparison = None
+        if hasattr(self, 'compare_model'): self.display_comparison_leaderboard()
 
         # Clear plot figures (Only Importance plot remains)
-        for fig_name in ['importance_figure']: # Removed 'cm_figure', 'roc_figure'
+        for fig_name in ['importance_figure', 'curve_figure']: # Removed 'cm_figure', 'roc_figure'
              if hasattr(self, fig_name):
                  fig = getattr(self, fig_name)
                  fig.clear()
@@ -1042,35 +3318,109 @@ class MLClientApp(QMainWindow):
 
     # --- Preprocessing ---
     def update_preprocess_info(self):
-        """ Updates the data info display and column list on the preprocess page. """
+        """ Updates the column list and the data-quality profile on the preprocess page. The profile is computed
+            by background jobs (one block of columns each, see profile_columns), cached for the current
+            dataframe object and rendered block by block as results arrive; reopening the page reuses it. """
         if self.dataframe is None:
-            if hasattr(self, 'data_info_display'): self.data_info_display.setText("请先加载数据。")
+            self._reset_data_profile()
+            if hasattr(self, 'profile_summary_label'): self.profile_summary_label.setText("请先加载数据。")
             if hasattr(self, 'preprocess_col_list'): self.preprocess_col_list.clear()
             return
 
-        if not hasattr(self, 'data_info_display') or not hasattr(self, 'preprocess_col_list'):
+        if not hasattr(self, 'profile_table') or not hasattr(self, 'preprocess_col_list'):
             print("Warning: Preprocessing UI elements not ready.")
             return
 
-        info_str_io = io.StringIO()
-        self.dataframe.info(buf=info_str_io)
-        info_str = "<b>基本信息:</b>\n" + info_str_io.getvalue() + "\n\n"
-
-        missing = self.dataframe.isnull().sum()
-        missing = missing[missing > 0]
-        if not missing.empty:
-            missing_percent = (missing / len(self.dataframe)) * 100
-            missing_df = pd.DataFrame({'缺失数量': missing, '缺失比例 (%)': missing_percent.round(2)})
-            if missing_df.index.name == 'index': missing_df.index.name = '列名' # Avoid confusion
-            info_str += "<b>缺失值统计 (仅显示含缺失列):</b>\n" + missing_df.to_string() + "\n"
-        else:
-            info_str += "<b>无缺失值。</b>\n"
-
-        self.data_info_display.setText(info_str)
-
         self.preprocess_col_list.clear()
         self.preprocess_col_list.addItems(self.dataframe.columns.astype(str))
 
+        profile = self.data_profile
+        if profile is not None and profile['frame']() is self.dataframe:
+            self._render_data_profile(); return
+        self._reset_data_profile()
+        columns = list(self.dataframe.columns)
+        self.data_profile = {'frame': weakref.ref(self.dataframe), 'columns': columns, 'rows': len(self.dataframe),
+                             'name_items': {}, 'stats': {}, 'pending': deque(profile_blocks(self.dataframe)), 'jobs': [], 'failed': 0}
+        self._fill_profile_model()
+        self._start_profile_jobs()
+
+    def _start_profile_jobs(self):
+        """ Keeps up to one profiling job per pool worker but one (one thread without the pool) in flight. The
+            free worker takes user-started jobs right away; with a single worker they wait for one block at most. """
+        profile = self.data_profile
+        df = profile['frame']() if profile else None
+        if df is None: return
+        limit = max(1, self.job_executor.max_workers - 1) if self.job_executor.available else 1
+        while profile['pending'] and len(profile['jobs']) < limit:
+            block = profile['pending'].popleft()
+            frame = self.job_executor.snapshots.get(df)[0].select(block) if self.job_executor.available else df # Worker maps only the block
+            job = self._create_job(self._profile_columns_thread, frame, block, priority=JOB_PRIORITY_PROFILE)
+            job.background = True
+            job.finished.connect(lambda stats, job=job: self._on_profile_block(job, stats))
+            job.error.connect(lambda error, job=job: self._on_profile_block(job, None, error))
+            profile['jobs'].append(job)
+            job.start()
+
+    def _on_profile_block(self, job, stats, error=None):
+        profile = self.data_profile
+        if profile is None or job not in profile['jobs']: return # Stale: the dataframe changed meanwhile
+        profile['jobs'].remove(job)
+        if stats is None:
+            profile['failed'] += 1; print(f"Warning: data profiling failed for a column block: {error[1] if error else '?'}")
+        else:
+            profile['stats'].update(stats)
+            self._render_data_profile(stats)
+        self._start_profile_jobs()
+        if not profile['jobs'] and not profile['pending']: self._render_data_profile()
+
+    def _reset_data_profile(self):
+        """ Drops the cached profile and stops its outstanding jobs (queued ones never reach the pool). """
+        profile, self.data_profile = self.data_profile, None
+        for job in (profile['jobs'] if profile else []):
+            if job.isRunning(): job.stop()
+        if hasattr(self, 'profile_model'): self.profile_model.clear()
+        if hasattr(self, 'profile_summary_label'): self.profile_summary_label.setText("")
+
+    def _fill_profile_model(self):
+        """ One row per column (name and dtype right away, statistics as profiling blocks finish). """
+        profile = self.data_profile
+        self.profile_model.clear(); self.profile_model.setHorizontalHeaderLabels(PROFILE_TABLE_HEADERS)
+        for col, dtype in self.dataframe.dtypes.items():
+            name = QStandardItem(str(col)); profile['name_items'][col] = name
+            self.profile_model.appendRow([name, QStandardItem(str(dtype))] + [QStandardItem() for _ in PROFILE_TABLE_HEADERS[2:]])
+        self._render_data_profile()
+
+    def _render_data_profile(self, stats=None):
+        """ Fills the rows of `stats` (all profiled columns if None) and refreshes the summary line. Numbers stay
+            numeric so sorting by a column is by value; rows are found through their name item (sorting moves them). """
+        profile = self.data_profile
+        if profile is None or not hasattr(self, 'profile_model'): return
+        def number(value, digits=4):
+            return None if value is None or (isinstance(value, float) and not np.isfinite(value)) else round(value, digits) if isinstance(value, float) else value
+        for col, st in (stats if stats is not None else profile['stats']).items():
+            row = profile['name_items'][col].row()
+            top = ", ".join(f"{value} ({count:,})" for value, count in st['top']) if 'top' in st else "(近似唯一)" if st['distinct'] else ""
+            values = (100 * st['nulls'] / st['rows'] if st['rows'] else 0.0, st['distinct'], st.get('min'), st.get('max'), st.get('mean'), st.get('std'),
+                      top, st['memory'] / 1024**2)
+            for j, value in enumerate(values, start=2):
+                item = self.profile_model.item(row, j)
+                if not isinstance(value, str): value = number(value) # Datetime min/max and top values are text
+                if value is not None: item.setData(value, Qt.ItemDataRole.DisplayRole)
+                if j == 2 and st['nulls']: item.setForeground(QColor("darkorange"))
+
+        done, total = len(profile['stats']), len(profile['columns'])
+        with_nulls = sum(1 for st in profile['stats'].values() if st['nulls'])
+        memory = sum(st['memory'] for st in profile['stats'].values())
+        text = f"{profile['rows']:,} 行 x {total:,} 列; 含缺失值的列: {with_nulls:,}; 已分析列内存: {memory / 1024**2:,.1f} MB"
+        if done < total: text += f" — 正在分析 {done:,}/{total:,} 列..."
+        if profile['failed']: text += f" ({profile['failed']} 个列块分析失败)"
+        self.profile_summary_label.setText(text)
+
+    @classmethod
+    def _profile_columns_thread(cls, progress_signal, status_signal, df, columns):
+        """ Worker function: profile_columns for one block of columns. """
+        return profile_columns(df, columns)
+
     def run_preprocessing(self):
         """ Starts the preprocessing worker thread. """
         if self.dataframe is None: QMessageBox.warning(self, "错误", "请先加载数据。"); return
@@ -1087,6 +3437,7 @@ class MLClientApp(QMainWindow):
 
         impute_strat = self.impute_strategy_combo.currentText()
         impute_const = self.impute_constant_value.text() if impute_strat == "常量 (Constant)" else None
+        impute_approx = self.impute_approx_error_spinbox.value() / 100 if self.impute_approx_error_spinbox.isEnabled() else None
         scale_strat = self.scale_strategy_combo.currentText()
         encode_strat = self.encode_strategy_combo.currentText()
 
@@ -1096,116 +3447,64 @@ class MLClientApp(QMainWindow):
 
         params = {
             'selected_cols': selected_cols,
-            'impute_strategy': impute_strat, 'impute_constant': impute_const,
-            'scale_strategy': scale_strat, 'encode_strategy': encode_strat
+            'impute_strategy': impute_strat, 'impute_constant': impute_const, 'impute_approx_error': impute_approx,
+            'scale_strategy': scale_strat, 'encode_strategy': encode_strat,
+            'parallel_jobs': self.preprocess_jobs_spinbox.value()
         }
 
         self.status_bar.showMessage("开始预处理...");
         self._update_ui_state()
 
-        self.preprocess_worker = Worker(self._preprocess_data_thread, self.dataframe.copy(), params)
+        self.preprocess_worker = self._create_job(self._preprocess_data_thread, self.dataframe, params, priority=JOB_PRIORITY_PREPROCESS)
         self.preprocess_worker.finished.connect(self._on_preprocessing_complete)
         self.preprocess_worker.error.connect(self._on_preprocessing_error)
         self.preprocess_worker.finished.connect(self._update_ui_state)
         self.preprocess_worker.error.connect(self._update_ui_state)
+        self.preprocess_worker.cancelled.connect(self._update_ui_state)
+        self.preprocess_worker.cancelled.connect(lambda: self.status_bar.showMessage("预处理已取消.", 5000))
 
         self._start_progress("正在应用预处理...", worker=self.preprocess_worker)
         self.preprocess_worker.start()
 
-    def _preprocess_data_thread(self, progress_signal, status_signal, df, params):
-        """ Worker function to apply preprocessing steps directly to the DataFrame. """
+    @classmethod
+    def _preprocess_data_thread(cls, progress_signal, status_signal, df, params):
+        """ Worker function: fits the preprocessing pipeline on the frame and returns (processed frame, fitted
+            ColumnTransformer, step cache report). Training refits a clone of it on the training split only.
+            With params['parallel_jobs'] > 1, large selections are fitted column-parallel (fit_transform_column_parallel).
+            Step results are memoized (PreprocessStepCache): a rerun with one option changed only recomputes
+            that step and what follows it, for the columns it applies to. """
         status_signal.emit("准备预处理...")
         progress_signal.emit(5)
+        step_cache = PreprocessStepCache()
+        preprocessor = build_preprocessor(df, params, status_signal, memory=step_cache)
+        steps = ", ".join(params[k] for k in ('impute_strategy', 'scale_strategy', 'encode_strategy') if params[k] != "不处理") or "无"
+        status_signal.emit(f"拟合预处理流水线 ({len(preprocessor.transformers)} 列; 步骤: {steps})...")
+        check_cancelled()
+        progress_signal.emit(10)
 
-        selected_cols = params['selected_cols']
-        numeric_features_selected = df[selected_cols].select_dtypes(include=np.number).columns.tolist()
-        categorical_features_selected = df[selected_cols].select_dtypes(exclude=np.number).columns.tolist()
-
-        df_processed = df # Modify the copy directly
-
-        # --- 1. Imputation ---
-        impute_strat_map = { "均值 (Mean)": 'mean', "中位数 (Median)": 'median',
-                             "众数 (Most Frequent)": 'most_frequent', "常量 (Constant)": 'constant'}
-        impute_key = params['impute_strategy']
-
-        if impute_key in impute_strat_map:
-            strategy = impute_strat_map[impute_key]
-            fill_val_param = params['impute_constant']
-            status_signal.emit(f"应用填充: {impute_key}")
-
-            # Apply to selected numeric cols
-            if numeric_features_selected:
-                num_fill_value = None
-                if strategy == 'constant':
-                    try: num_fill_value = float(fill_val_param)
-                    except (ValueError, TypeError):
-                        status_signal.emit(f"警告: 无法将常量 '{fill_val_param}' 转为数值，数值列跳过常量填充。")
-                        num_imputer = SimpleImputer(strategy='mean') # Fallback to mean? Or raise error?
-                        df_processed[numeric_features_selected] = num_imputer.fit_transform(df_processed[numeric_features_selected])
-                    else:
-                        num_imputer = SimpleImputer(strategy=strategy, fill_value=num_fill_value)
-                        df_processed[numeric_features_selected] = num_imputer.fit_transform(df_processed[numeric_features_selected])
-                else:
-                     num_imputer = SimpleImputer(strategy=strategy)
-                     df_processed[numeric_features_selected] = num_imputer.fit_transform(df_processed[numeric_features_selected])
-
-            # Apply to selected categorical cols
-            if categorical_features_selected:
-                 cat_strategy = 'most_frequent' if strategy != 'constant' else 'constant'
-                 cat_fill_value = fill_val_param if strategy == 'constant' else 'missing'
-                 cat_imputer = SimpleImputer(strategy=cat_strategy, fill_value=cat_fill_value)
-                 df_processed[categorical_features_selected] = cat_imputer.fit_transform(df_processed[categorical_features_selected])
-
-        progress_signal.emit(35)
-
-        # --- 2. Scaling ---
-        scale_key = params['scale_strategy']
-        scaler = None
-        if scale_key == "标准化 (StandardScaler)": scaler = StandardScaler()
-        elif scale_key == "归一化 (MinMaxScaler)": scaler = MinMaxScaler()
-
-        if scaler and numeric_features_selected:
-            status_signal.emit(f"应用缩放: {scale_key} 到数值列")
-            df_processed[numeric_features_selected] = scaler.fit_transform(df_processed[numeric_features_selected])
-        progress_signal.emit(65)
-
-        # --- 3. Encoding ---
-        encode_key = params['encode_strategy']
-        current_categorical_selected = df_processed[selected_cols].select_dtypes(exclude=np.number).columns.tolist()
-
-        if not current_categorical_selected:
-            if encode_key != "不处理": status_signal.emit("编码步骤跳过：选择中无类别列")
-        elif encode_key == "独热编码 (One-Hot)":
-             status_signal.emit(f"应用编码: {encode_key} 到类别列")
-             encoder = OneHotEncoder(handle_unknown='ignore', sparse_output=False)
-             try:
-                encoded_data = encoder.fit_transform(df_processed[current_categorical_selected])
-                new_col_names = encoder.get_feature_names_out(current_categorical_selected)
-                encoded_df = pd.DataFrame(encoded_data, index=df_processed.index, columns=new_col_names)
-
-                df_processed = df_processed.drop(columns=current_categorical_selected)
-                df_processed = pd.concat([df_processed, encoded_df], axis=1)
-             except Exception as e:
-                 status_signal.emit(f"错误: OneHot 编码失败 - {e}")
-                 raise
-
-        elif encode_key == "序号编码 (Ordinal)":
-             status_signal.emit(f"应用编码: {encode_key} 到类别列")
-             encoder = OrdinalEncoder(handle_unknown='use_encoded_value', unknown_value=-1)
-             try:
-                df_processed[current_categorical_selected] = encoder.fit_transform(df_processed[current_categorical_selected])
-             except Exception as e:
-                 status_signal.emit(f"错误: Ordinal 编码失败 - {e}")
-                 raise
+        n_jobs = min(params.get('parallel_jobs') or 1, len(preprocessor.transformers))
+        if n_jobs > 1 and len(df) * len(preprocessor.transformers) >= PREPROCESS_PARALLEL_MIN_CELLS:
+            transformed = fit_transform_column_parallel(preprocessor, df, n_jobs, step_cache, _ProgressRange(progress_signal, 10, 90), status_signal)
+        else:
+            transformed = preprocessor.fit_transform(df)
+        df_processed = _restore_column_order(model_input.to_native_categorical(transformed, preprocessor), df.columns) # Input is a read-only snapshot; output is new
+        set_step_memory(preprocessor, None)
+        check_cancelled()
+        bounds = [getattr(t, 'named_steps', {}).get('impute') for _, t, _ in preprocessor.transformers_]
+        bounds = [b.error_bounds_.max() for b in bounds if hasattr(b, 'error_bounds_') and len(b.error_bounds_)]
+        if bounds: status_signal.emit(f"近似填充: 实际误差上限 {100 * max(bounds):.3g}% (设定 {100 * params['impute_approx_error']:.3g}%)")
 
         progress_signal.emit(95)
-        status_signal.emit("预处理完成.")
+        step_cache.evict()
+        report = step_cache.report()
+        status_signal.emit(f"预处理完成 (缓存命中 {report['hits']}/{report['steps']} 个步骤).")
         progress_signal.emit(100)
-        return df_processed
+        return df_processed, preprocessor, report
 
-    def _on_preprocessing_complete(self, result_df):
-        self.processed_dataframe = result_df
-        self.status_bar.showMessage("预处理步骤已应用.", 5000)
+    def _on_preprocessing_complete(self, result):
+        self.processed_dataframe, self.preprocessor, cache_report = result
+        self.status_bar.showMessage(f"预处理步骤已应用 (缓存命中 {cache_report['hits']}/{cache_report['steps']} 个步骤).", 5000)
+        self._show_preprocess_cache_report(cache_report)
 
         self.preview_model.update_dataframe(self.processed_dataframe)
         try: self.preview_table.resizeColumnsToContents()
@@ -1221,6 +3520,18 @@ class MLClientApp(QMainWindow):
         self._update_ui_state()
         self.switch_main_panel(3)
 
+    def _show_preprocess_cache_report(self, report):
+        """ Which steps of the last preprocessing run were served from the step cache (summary + per-column tooltip). """
+        if not hasattr(self, 'preprocess_cache_label'): return
+        if not report['steps']:
+            self.preprocess_cache_label.setText("上次预处理: 无需拟合的步骤"); self.preprocess_cache_label.setToolTip(""); return
+        per_step = ", ".join(f"{step} {hits}/{total}" for step, (hits, total) in report['by_step'].items())
+        self.preprocess_cache_label.setText(f"上次预处理: 缓存命中 {report['hits']}/{report['steps']} 个步骤 ({per_step})")
+        lines = [f"{column}: " + " -> ".join(f"{step} {'(缓存)' if hit else '(重新计算)'}" for step, hit in steps)
+                 for column, steps in list(report['columns'].items())[:PREPROCESS_REPORT_MAX_COLUMNS]]
+        if len(report['columns']) > PREPROCESS_REPORT_MAX_COLUMNS: lines.append(f"... 另有 {len(report['columns']) - PREPROCESS_REPORT_MAX_COLUMNS} 列")
+        self.preprocess_cache_label.setToolTip("\n".join(lines))
+
     def _on_preprocessing_error(self, error_info):
         exc_type, exc_value, tb_str = error_info
         QMessageBox.critical(self, "预处理错误", f"应用预处理时出错:\n{exc_value}\n\n详细信息:\n{tb_str}")
@@ -1336,25 +3647,101 @@ class MLClientApp(QMainWindow):
         y_series = df_for_training[self.target_col]
         temp_model_type = self._infer_problem_type(y_series)
         if temp_model_type is None: return
+        if self.compare_group.isChecked(): self._run_model_comparison(df_for_training, temp_model_type); return
 
         params = self._get_current_params(algo_name, temp_model_type)
         if params is None: return
 
         use_cv = self.cv_checkbox.isChecked()
         cv_folds = self.cv_folds_spinbox.value() if use_cv else 5 # Use 5 as default for CV if checked
+        bootstrap = self.bootstrap_spinbox.value() if self.bootstrap_group.isChecked() else 0
+        search = self._get_search_settings(algo_name) if self.search_group.isChecked() else None
+        if self.search_group.isChecked() and search is None: return
+        native_categorical = algo_name in BOOSTING_ALGORITHMS and self.native_categorical_checkbox.isChecked()
+        native_features = [f for f in self.feature_cols if f in model_input.native_categories(self.preprocessor)]
+        if native_features and algo_name not in BOOSTING_ALGORITHMS:
+            QMessageBox.warning(self, "参数错误", f"特征 {', '.join(native_features)} 使用了“{NATIVE_CATEGORICAL_ENCODING}”编码，只能用 LightGBM/XGBoost 训练。\n"
+                                                  "请选择这两种算法，或在“数据预处理”页面改用独热/序号编码。"); return
+
+        incremental = self.incremental_group.isChecked()
+        if incremental and algo_name not in INCREMENTAL_ALGORITHMS:
+            QMessageBox.warning(self, "参数错误", f"增量训练不支持 {algo_name}。\n可选算法: {', '.join(INCREMENTAL_ALGORITHMS)}"); return
+        if incremental and search is not None:
+            QMessageBox.warning(self, "参数错误", "增量训练与超参数搜索不能同时使用。"); return
+        if incremental and not self.current_file_path:
+            QMessageBox.warning(self, "参数错误", "增量训练需要从文件加载的数据。"); return
 
         self.status_bar.showMessage(f"准备训练 {algo_name}...");
         self._update_ui_state()
 
-        self.train_worker = Worker(self._train_model_thread, df_for_training.copy(), self.feature_cols[:], self.target_col, algo_name, params, use_cv, cv_folds)
+        raw_df = self.dataframe if self.processed_dataframe is not None and self.preprocessor is not None else None
+        profile_mode = PROFILE_MODES.get(self.profile_combo.currentText())
+        if incremental:
+            self.train_worker = self._create_job(self._incremental_train_thread, self.current_file_path, self.feature_cols[:], self.target_col, algo_name, params,
+                                                self.incremental_epochs_spinbox.value(), self.incremental_chunk_spinbox.value(),
+                                                self.preprocessor if raw_df is not None else None, profile_mode, bootstrap, priority=JOB_PRIORITY_TRAIN)
+        elif search is not None:
+            space, settings = search
+            self.train_worker = self._create_job(self._search_model_thread, df_for_training, self.feature_cols[:], self.target_col, algo_name, params, space, settings,
+                                                use_cv, cv_folds, raw_df, self.preprocessor if raw_df is not None else None, profile_mode, native_categorical,
+                                                bootstrap, priority=JOB_PRIORITY_TRAIN)
+        else:
+            self.train_worker = self._create_job(self._train_model_thread, df_for_training, self.feature_cols[:], self.target_col, algo_name, params, use_cv, cv_folds,
+                                                raw_df, self.preprocessor if raw_df is not None else None, profile_mode, native_categorical, bootstrap,
+                                                priority=JOB_PRIORITY_TRAIN)
+        self._start_train_worker(f"正在增量训练 {algo_name}..." if incremental else f"正在搜索 {algo_name} 超参数..." if search is not None else f"正在训练 {algo_name}...")
+
+    def _start_train_worker(self, title):
+        """ Connects self.train_worker to the results page and progress dialog, then starts it. """
         self.train_worker.finished.connect(self._on_training_complete)
         self.train_worker.error.connect(self._on_training_error)
         self.train_worker.finished.connect(self._update_ui_state)
         self.train_worker.error.connect(self._update_ui_state)
-
-        self._start_progress(f"正在训练 {algo_name}...", worker=self.train_worker)
+        self.train_worker.cancelled.connect(self._update_ui_state)
+        self.train_worker.cancelled.connect(lambda: self.status_bar.showMessage("训练已取消.", 5000))
+        self._start_progress(title, worker=self.train_worker)
         self.train_worker.start()
 
+    def _run_model_comparison(self, df_for_training, model_type):
+        """ Starts _compare_models_thread for the algorithms checked in the comparison group, each with the
+            parameters of its own parameter page. """
+        algorithms = [algo for algo, box in self.compare_checkboxes.items() if box.isChecked()]
+        if len(algorithms) < 2:
+            QMessageBox.warning(self, "参数错误", "多模型对比请至少勾选两种算法。"); return
+        if self.incremental_group.isChecked() or self.search_group.isChecked():
+            QMessageBox.warning(self, "参数错误", "多模型对比不能与增量训练或超参数搜索同时使用。"); return
+        native_features = [f for f in self.feature_cols if f in model_input.native_categories(self.preprocessor)]
+        if native_features and any(algo not in BOOSTING_ALGORITHMS for algo in algorithms):
+            QMessageBox.warning(self, "参数错误", f"特征 {', '.join(native_features)} 使用了“{NATIVE_CATEGORICAL_ENCODING}”编码，只能用 LightGBM/XGBoost 训练。\n"
+                                                  "请只勾选这两种算法，或在“数据预处理”页面改用独热/序号编码。"); return
+        params = {}
+        for algo in algorithms:
+            params[algo] = self._get_current_params(algo, model_type)
+            if params[algo] is None: return
+        native_categorical = all(algo in BOOSTING_ALGORITHMS for algo in algorithms) and self.native_categorical_checkbox.isChecked()
+        bootstrap = self.bootstrap_spinbox.value() if self.bootstrap_group.isChecked() else 0
+
+        self.status_bar.showMessage(f"准备对比 {len(algorithms)} 种算法...")
+        self._update_ui_state()
+        raw_df = self.dataframe if self.processed_dataframe is not None and self.preprocessor is not None else None
+        self.train_worker = self._create_job(self._compare_models_thread, df_for_training, self.feature_cols[:], self.target_col, params,
+                                            self.compare_cores_spinbox.value(), raw_df, self.preprocessor if raw_df is not None else None,
+                                            PROFILE_MODES.get(self.profile_combo.currentText()), native_categorical, bootstrap, priority=JOB_PRIORITY_TRAIN)
+        self._start_train_worker(f"正在对比 {', '.join(algorithms)}...")
+
+    def _get_search_settings(self, algo_name):
+        """ (space, settings) for _search_model_thread from the search group, or None after telling the user what is wrong. """
+        fields = self.search_space_fields.get(algo_name, {})
+        try:
+            space = parse_search_space({param: field.text() for param, field in fields.items()},
+                                       {param: kind for param, (kind, _) in SEARCH_PARAM_SPECS[algo_name].items()})
+        except ValueError as e:
+            QMessageBox.warning(self, "搜索空间错误", f"{e}\n\n列表写作 100, 300, 500; 范围写作 0.01..0.3 (对数采样: 0.01..0.3 log)。"); return None
+        if not space:
+            QMessageBox.warning(self, "搜索空间错误", "请至少为一个参数填写候选值或范围。"); return None
+        return space, {'method': SEARCH_METHODS[self.search_method_combo.currentText()], 'n_trials': self.search_trials_spinbox.value(),
+                       'time_budget': self.search_time_spinbox.value(), 'cores': self.search_cores_spinbox.value()}
+
     def _validate_before_training(self):
         df_to_use = self.processed_dataframe if self.processed_dataframe is not None else self.dataframe
         if df_to_use is None: QMessageBox.warning(self, "验证错误", "数据不可用，请先加载或预处理数据。"); return False
@@ -1386,26 +3773,27 @@ class MLClientApp(QMainWindow):
 
         return True
 
+    @staticmethod
+    def infer_problem_type(y_series):
+        """ Infers problem type (classification/regression) from the target column; raises ValueError if unclear. """
+        if pd.api.types.is_bool_dtype(y_series):
+            return 'classification'
+        if pd.api.types.is_float_dtype(y_series):
+            return 'regression'
+        if pd.api.types.is_integer_dtype(y_series):
+            n_unique = y_series.nunique()
+            if n_unique > 20: return 'regression'
+            print("Inferred binary classification." if n_unique <= 2 else f"Inferred multi-class classification ({n_unique} classes).")
+            return 'classification'
+        if _is_text_dtype(y_series.dtype) or isinstance(y_series.dtype, pd.CategoricalDtype):
+            if y_series.dropna().empty: raise ValueError("目标列只包含缺失值.")
+            return 'classification'
+        raise ValueError(f"无法自动确定目标列 '{y_series.name}' 的问题类型 (dtype: {y_series.dtype}, unique: {y_series.nunique()}).")
+
     def _infer_problem_type(self, y_series):
-        """Infers problem type (classification/regression) based on target column."""
+        """ GUI wrapper of infer_problem_type(): reports failures in a message box and returns None. """
         try:
-            if pd.api.types.is_float_dtype(y_series):
-                return 'regression'
-            if pd.api.types.is_integer_dtype(y_series) and y_series.nunique() > 20:
-                return 'regression'
-            if pd.api.types.is_object_dtype(y_series) or \
-               pd.api.types.is_categorical_dtype(y_series) or \
-               pd.api.types.is_bool_dtype(y_series):
-                 if y_series.dropna().empty:
-                      raise ValueError("目标列只包含缺失值.")
-                 return 'classification'
-            if pd.api.types.is_integer_dtype(y_series) and y_series.nunique() <= 20:
-                if y_series.nunique() <= 2:
-                     print("Inferred binary classification.")
-                else:
-                     print(f"Inferred multi-class classification ({y_series.nunique()} classes).")
-                return 'classification'
-            raise ValueError(f"无法自动确定目标列 '{y_series.name}' 的问题类型 (dtype: {y_series.dtype}, unique: {y_series.nunique()}).")
+            return self.infer_problem_type(y_series)
         except Exception as e:
             QMessageBox.critical(self, "类型推断错误", f"无法确定目标变量类型: {e}")
             return None
@@ -1433,83 +3821,466 @@ class MLClientApp(QMainWindow):
             return None
 
 
-    def _train_model_thread(self, progress_signal, status_signal, df, features, target, algo_name, params, use_cv, cv_folds):
-        """ Trains the model (single split or placeholder CV) and evaluates. """
-        status_signal.emit("准备数据..."); progress_signal.emit(5)
+    @classmethod
+    def _prepare_training_data(cls, status_signal, df, features, target, raw_df=None, preprocessor=None, native_categorical=False,
+                               sparse_onehot=False):
+        """ Model inputs and encoded target for a training job.
+            Returns (X, y, problem_type, label_mapping, model_preprocessor, input_features, features); with `raw_df`
+            and a fitted page `preprocessor`, X holds the raw input columns and model_preprocessor is its unfitted
+            restriction to `features` (None when some feature is not one of its outputs). With `native_categorical`
+            (boosters), encoded categoricals are replaced by one category-dtype feature each, which changes `features`.
+            `sparse_onehot`: wide one-hot encodings reach the model as a CSR matrix (see restrict_preprocessor). """
         X = df[features]
         y = df[target]
+        model_preprocessor, input_features = None, list(features)
+        native = native_categorical_preprocessor(preprocessor if raw_df is not None else None, features,
+                                                 df if raw_df is None else raw_df) if native_categorical else None
+        if native is not None:
+            model_preprocessor, input_features, features = native
+            X = (df if raw_df is None else raw_df)[input_features]
+            native_cols = [cols[0] for _, t, cols in model_preprocessor.transformers if 'native' in getattr(t, 'named_steps', {})]
+            status_signal.emit(f"类别特征原生处理 (不编码): {', '.join(map(str, native_cols))}")
+        elif preprocessor is not None and raw_df is not None:
+            model_preprocessor, raw_inputs = restrict_preprocessor(preprocessor, features, sparse_onehot)
+            if model_preprocessor is None:
+                status_signal.emit("警告: 部分特征不是预处理流水线的输出，直接使用已处理数据 (预处理不随模型保存)。")
+            else:
+                input_features = raw_inputs
+                X = raw_df[input_features]
+                if model_preprocessor.sparse_threshold == 1.0: status_signal.emit("独热编码列较多: 以稀疏矩阵 (CSR) 输入模型")
 
         status_signal.emit("推断问题类型...");
-        problem_type = self._infer_problem_type(y)
-        if problem_type is None: raise ValueError("无法确定问题类型.")
+        problem_type = cls.infer_problem_type(y)
         status_signal.emit(f"问题类型: {problem_type}")
 
-        y_original = y.copy()
         label_mapping = None
         if problem_type == 'classification' and not pd.api.types.is_numeric_dtype(y):
             status_signal.emit("目标列进行数值编码...")
             y, label_mapping = pd.factorize(y)
             y = pd.Series(y, index=X.index)
             print("标签映射:", dict(enumerate(label_mapping)))
-        progress_signal.emit(10)
-
-        X_train, X_test, y_train, y_test = None, None, None, None
-        cv_scores = None
-
-        if use_cv:
-            status_signal.emit(f"准备 {cv_folds}-折交叉验证...")
-            status_signal.emit(f"注意: 交叉验证评估逻辑未完全实现，将执行标准训练/测试评估。")
-            # Fall through to standard split...
-
-        if X_train is None:
-             status_signal.emit("拆分训练/测试数据...")
-             stratify_param = y if problem_type == 'classification' and y.nunique() > 1 else None
-             try:
-                 X_train, X_test, y_train, y_test = train_test_split(
-                     X, y, test_size=0.25, random_state=42, stratify=stratify_param
-                 )
-             except ValueError as e:
-                 status_signal.emit(f"警告: 分层拆分失败 ({e})，使用非分层拆分。")
-                 X_train, X_test, y_train, y_test = train_test_split(
-                     X, y, test_size=0.25, random_state=42
-                 )
-        progress_signal.emit(15)
-
-        model = self._instantiate_model(algo_name, problem_type, params, status_signal)
-        if model is None: raise ValueError("模型初始化失败.")
-        progress_signal.emit(20)
-
-        status_signal.emit(f"训练 {model.__class__.__name__}...")
-        try:
-             model.fit(X_train, y_train)
-        except Exception as fit_error:
-             status_signal.emit(f"错误: 模型训练失败 - {fit_error}")
-             raise RuntimeError(f"模型训练失败: {fit_error}") from fit_error
-
-        progress_signal.emit(80)
-        status_signal.emit("训练完成.")
-
-        status_signal.emit("在测试集上预测与评估...")
-        y_pred = model.predict(X_test)
-        y_pred_proba = None
-        if problem_type == 'classification' and hasattr(model, "predict_proba"):
+        return X, y, problem_type, label_mapping, model_preprocessor, input_features, features
+
+    @classmethod
+    def _train_model_thread(cls, progress_signal, status_signal, df, features, target, algo_name, params, use_cv, cv_folds,
+                            raw_df=None, preprocessor=None, profile_mode=None, native_categorical=False, bootstrap=0):
+        """ Trains the model (single split, optionally K-fold CV) and evaluates.
+            With `raw_df` and the fitted page `preprocessor`, the features are rebuilt from the raw columns by a
+            clone of the preprocessor fitted on the training rows only (no test-set leakage into scaler/imputer
+            statistics); that fitted pipeline is returned for saving with the model.
+            Every stage is a timed span (results["profile"]); `profile_mode` adds a cProfile/pyinstrument capture.
+            `native_categorical`: see _prepare_training_data (LightGBM/XGBoost only).
+            `bootstrap` > 0: that many resamples give confidence intervals for the test metrics (results["metrics_ci"]). """
+        from sklearn.model_selection import train_test_split
+        recorder, capture = SpanRecorder(), {}
+        with profile_capture(profile_mode, capture), recorder.span("train job", algorithm=algo_name, rows=len(df)):
+            status_signal.emit("准备数据..."); progress_signal.emit(5)
+            with recorder.span("prepare data"):
+                X, y, problem_type, label_mapping, model_preprocessor, input_features, features = cls._prepare_training_data(
+                    status_signal, df, features, target, raw_df, preprocessor, native_categorical, algo_name in SPARSE_INPUT_ALGORITHMS)
+            progress_signal.emit(10)
+
+            X_train, X_test, y_train, y_test = None, None, None, None
+            cv_results = None
+
+            if use_cv:
+                with recorder.span("cross validation", folds=cv_folds):
+                    cv_results = cls._run_cross_validation(_ProgressRange(progress_signal, 10, 60), status_signal,
+                                                            X, y, algo_name, problem_type, params, cv_folds, model_preprocessor, features)
+                # Remaining hold-out fit/evaluation reports into 60-100%
+                progress_signal = _ProgressRange(progress_signal, 60, 100)
+
+            if X_train is None:
+                 status_signal.emit("拆分训练/测试数据...")
+                 stratify_param = y if problem_type == 'classification' and y.nunique() > 1 else None
+                 with recorder.span("train_test_split"):
+                     try:
+                         X_train, X_test, y_train, y_test = train_test_split(
+                             X, y, test_size=0.25, random_state=42, stratify=stratify_param
+                         )
+                     except ValueError as e:
+                         status_signal.emit(f"警告: 分层拆分失败 ({e})，使用非分层拆分。")
+                         X_train, X_test, y_train, y_test = train_test_split(
+                             X, y, test_size=0.25, random_state=42
+                         )
+            if model_preprocessor is not None:
+                 status_signal.emit("在训练集上拟合预处理流水线...")
+                 with recorder.span("preprocess (fit on train)"):
+                     X_train = model_input.select_features(model_preprocessor.fit_transform(X_train), features, model_preprocessor)
+                 with recorder.span("preprocess (test)"):
+                     X_test = model_input.select_features(model_preprocessor.transform(X_test), features, model_preprocessor)
+            progress_signal.emit(15)
+
+            with recorder.span("instantiate model"):
+                model = cls._instantiate_model(algo_name, problem_type, params, status_signal)
+            if model is None: raise ValueError("模型初始化失败.")
+            progress_signal.emit(20)
+
+            status_signal.emit(f"训练 {model.__class__.__name__}...")
             try:
-                y_pred_proba = model.predict_proba(X_test)
-            except Exception as e:
-                status_signal.emit(f"警告: 获取预测概率失败 - {e}")
-        progress_signal.emit(85)
+                 with recorder.span("fit", estimator=model.__class__.__name__, rows=X_train.shape[0], features=X_train.shape[1]):
+                     model = fit_cancellable(model, X_train, y_train, _ProgressRange(progress_signal, 20, 80), status_signal)
+            except OperationCancelled:
+                 raise
+            except Exception as fit_error:
+                 status_signal.emit(f"错误: 模型训练失败 - {fit_error}")
+                 raise RuntimeError(f"模型训练失败: {fit_error}") from fit_error
+
+            progress_signal.emit(80)
+            boosting = boosting_summary(model)
+            if boosting:
+                status_signal.emit(f"早停: 最佳迭代 {boosting['best_iteration']} / 训练 {boosting['rounds_trained']} 轮 (上限 {boosting['n_estimators']})")
+            status_signal.emit("训练完成.")
+
+            status_signal.emit("在测试集上预测与评估...")
+            with recorder.span("predict", rows=X_test.shape[0]):
+                y_pred = model.predict(X_test)
+            y_pred_proba = None
+            if problem_type == 'classification' and hasattr(model, "predict_proba"):
+                try:
+                    with recorder.span("predict_proba", rows=X_test.shape[0]):
+                        y_pred_proba = model.predict_proba(X_test)
+                except Exception as e:
+                    status_signal.emit(f"警告: 获取预测概率失败 - {e}")
+            progress_signal.emit(85)
 
-        metrics = self._calculate_metrics(y_test, y_pred, y_pred_proba, problem_type, status_signal)
-        progress_signal.emit(90)
+            with recorder.span("metrics", bootstrap=bootstrap):
+                metrics, metrics_ci = cls._evaluate(y_test, y_pred, y_pred_proba, problem_type, status_signal, bootstrap)
+            progress_signal.emit(90)
 
-        importance, importance_names = self._get_feature_importance(model, X.columns)
-        progress_signal.emit(95)
+            with recorder.span("feature importance"):
+                importance, importance_names = cls._get_feature_importance(model, features)
+            progress_signal.emit(95)
 
         status_signal.emit("处理完成.")
         progress_signal.emit(100)
 
         return {"model": model,
                 "metrics": metrics,
+                "metrics_ci": metrics_ci,
+                "feature_importance": importance,
+                "feature_names": importance_names,
+                "X_test_processed": X_test,
+                "y_test": y_test,
+                "y_pred": y_pred,
+                "y_pred_proba": y_pred_proba,
+                "model_type": problem_type,
+                "label_mapping": label_mapping,
+                "cv_results": cv_results,
+                "preprocessor": model_preprocessor,
+                "input_feature_names": input_features,
+                "boosting": boosting,
+                "profile": {'spans': recorder.ordered(), **capture}
+                }
+
+    @classmethod
+    def _incremental_train_thread(cls, progress_signal, status_signal, file_path, features, target, algo_name, params,
+                                  epochs=1, chunk_rows=INCREMENTAL_CHUNK_ROWS, preprocessor=None, profile_mode=None, bootstrap=0):
+        """ Out-of-core training: streams `file_path` from disk in chunks (see incremental_source) instead of
+            materialising df[features]. Rows picked by holdout_mask form the evaluation stream, the rest train the
+            model chunk by chunk: MLP / SGD via partial_fit, LightGBM by continued boosting on each chunk, XGBoost on
+            an external-memory DMatrix fed by a chunk iterator. With the fitted page `preprocessor`, its restriction
+            to `features` is fitted on the training rows of the first chunk. Memory is bounded by a few chunks.
+            Returns the same keys as _train_model_thread plus "incremental" (row counts, per-chunk eval curve). """
+        recorder, capture = SpanRecorder(), {}
+        with profile_capture(profile_mode, capture), recorder.span("incremental train job", algorithm=algo_name, chunk_rows=chunk_rows):
+            source = incremental_source(file_path)
+            status_signal.emit(f"扫描目标列 ({'本地缓存' if source[0] == 'feather' else 'CSV'})..."); progress_signal.emit(2)
+            with recorder.span("scan target"):
+                y_all = pd.concat([chunk[target] for chunk in iter_source_chunks(source, [target], chunk_rows)], ignore_index=True)
+            problem_type = cls.infer_problem_type(y_all)
+            status_signal.emit(f"问题类型: {problem_type} ({len(y_all):,} 行)")
+            n_rows, classes = len(y_all), None
+            if problem_type == 'classification':
+                classes = np.asarray(y_all.dropna().unique())
+                try: classes = np.sort(classes)
+                except TypeError: pass # Mixed label types keep first-seen order
+            del y_all
+
+            model_preprocessor, inputs = None, list(features)
+            if preprocessor is not None:
+                model_preprocessor, inputs = restrict_preprocessor(preprocessor, features, algo_name in SPARSE_INPUT_ALGORITHMS)
+                if model_preprocessor is None: raise ValueError("增量训练: 部分特征不是预处理流水线的输出，无法从原始文件重建。")
+            model = cls._instantiate_model(algo_name, problem_type, params, status_signal)
+            if model is None: raise ValueError("模型初始化失败.")
+            counts = {'rows_train': 0, 'rows_eval': 0, 'rows_skipped': 0, 'chunks': 0, 'chunks_skipped': 0}
+
+            def chunks(progress=None, pass_rows=n_rows):
+                """ One pass over the file: (X, y, held_out) per chunk, preprocessed, rows without a target dropped. """
+                first_row = 0
+                for chunk in iter_source_chunks(source, list(dict.fromkeys(inputs + [target])), chunk_rows):
+                    check_cancelled()
+                    held = holdout_mask(first_row, len(chunk)); first_row += len(chunk)
+                    if classes is not None: y = pd.Categorical(chunk[target], categories=classes).codes.astype(np.int64); valid = y >= 0
+                    else: y = pd.to_numeric(chunk[target], errors='coerce').to_numpy(dtype=float); valid = ~np.isnan(y)
+                    X = chunk[inputs]
+                    if model_preprocessor is not None:
+                        if not hasattr(model_preprocessor, 'transformers_'):
+                            with recorder.span("preprocess (fit on first chunk)", rows=int((valid & ~held).sum())):
+                                model_preprocessor.fit(X[valid & ~held])
+                        X = model_input.select_features(model_preprocessor.transform(X), features, model_preprocessor)
+                    yield X[valid], y[valid], held[valid], int((~valid).sum()) # Boolean rows work for DataFrames and CSR alike
+                    if progress is not None: progress.emit(min(100, 100 * first_row // max(pass_rows, 1)))
+
+            curve, boosting, metric = [], None, "Accuracy" if problem_type == 'classification' else "R²"
+            train_progress = _ProgressRange(progress_signal, 5, 85)
+            if xgb and isinstance(model, xgb.XGBModel):
+                eval_parts, passes = [], [0]
+                def train_chunks():
+                    collect = passes[0] == 0; passes[0] += 1
+                    for X, y, held, skipped in chunks(_ProgressRange(train_progress, 0, 40) if collect else None):
+                        if collect:
+                            counts['chunks'] += 1; counts['rows_skipped'] += skipped; counts['rows_train'] += int((~held).sum())
+                            if sum(len(part[1]) for part in eval_parts) < INCREMENTAL_EVAL_SAMPLE_ROWS: eval_parts.append((X[held], y[held]))
+                        yield X[~held], y[~held]
+                status_signal.emit(f"构建外存 DMatrix (每块 {chunk_rows:,} 行)...")
+                with recorder.span("fit (external memory)", rows=n_rows):
+                    eval_set = None
+                    if early_stopping_rounds(model):
+                        def eval_set(): # Called after the iterator's first pass has collected the sample
+                            if hasattr(eval_parts[0][0], 'tocsr'):
+                                from scipy import sparse
+                                X_eval = sparse.vstack([part[0] for part in eval_parts]).tocsr()
+                            else: X_eval = pd.concat([part[0] for part in eval_parts])
+                            return X_eval, np.concatenate([part[1] for part in eval_parts])
+                    model, evals_result = xgb_train_external_memory(model, train_chunks, eval_set, len(classes) if classes is not None else None,
+                                                                    _ProgressRange(train_progress, 40, 100))
+                if evals_result:
+                    metric_name, values = next(iter(evals_result['validation_0'].items()))
+                    boosting = {'best_iteration': int(model.best_iteration) + 1, 'rounds_trained': len(values), 'n_estimators': model.n_estimators,
+                                'patience': early_stopping_rounds(model), 'metric': metric_name, 'curve': [float(v) for v in values]}
+            else:
+                if lgb and isinstance(model, lgb.LGBMModel):
+                    n_chunks = max(1, -(-n_rows // chunk_rows)) * epochs
+                    total_rounds = model.n_estimators
+                    model.set_params(n_estimators=max(1, total_rounds // n_chunks), early_stopping_round=None) # Rounds added per chunk
+                    status_signal.emit(f"LightGBM: 每块继续训练 {model.n_estimators} 轮 (共约 {total_rounds} 轮)")
+                elif hasattr(model, 'early_stopping'):
+                    model.set_params(early_stopping=False) # partial_fit refuses it; the evaluation stream scores the model instead
+                booster, rows_seen = None, 0
+                for epoch in range(epochs):
+                    with recorder.span("epoch", epoch=epoch + 1):
+                        epoch_progress = _ProgressRange(train_progress, 100 * epoch // epochs, 100 * (epoch + 1) // epochs)
+                        for X, y, held, skipped in chunks(epoch_progress):
+                            if epoch == 0: counts['rows_skipped'] += skipped
+                            X_fit, y_fit = X[~held], y[~held]
+                            counts['chunks'] += epoch == 0
+                            if len(y_fit) == 0: continue
+                            if lgb and isinstance(model, lgb.LGBMModel):
+                                if classes is not None and len(np.unique(y_fit)) < len(classes):
+                                    counts['chunks_skipped'] += 1; status_signal.emit("警告: 数据块缺少部分类别，跳过 (LightGBM 每块需包含全部类别)。"); continue
+                                model.fit(X_fit, y_fit, init_model=booster, callbacks=[_lgbm_cancel_callback(None, 0)]); booster = model.booster_
+                            elif classes is not None: model.partial_fit(X_fit, y_fit, classes=np.arange(len(classes)))
+                            else: model.partial_fit(X_fit, y_fit)
+                            rows_seen += len(y_fit); counts['rows_train'] += len(y_fit) if epoch == 0 else 0
+                            if held.any():
+                                curve.append((rows_seen, float(model.score(X[held], y[held]))))
+                                status_signal.emit(f"第 {epoch + 1}/{epochs} 遍, 已训练 {rows_seen:,} 行: 本块留出行 {metric} {curve[-1][1]:.4f}")
+                if lgb and isinstance(model, lgb.LGBMModel):
+                    if booster is None: raise ValueError("没有可训练的数据块 (每块都缺少部分类别)，请增大每块行数。")
+                    model.set_params(n_estimators=booster.current_iteration())
+
+            status_signal.emit("在评估流上预测与评估..."); progress_signal.emit(85)
+            y_true, y_pred, y_proba, X_preview = [], [], [], None
+            with recorder.span("evaluate (stream)"):
+                for X, y, held, _ in chunks(_ProgressRange(progress_signal, 85, 95)):
+                    if not held.any(): continue
+                    X_eval = X[held]
+                    if X_preview is None: X_preview = head_rows(X_eval, MAX_PREVIEW_ROWS)
+                    y_true.append(y[held]); y_pred.append(model.predict(X_eval))
+                    if classes is not None and hasattr(model, 'predict_proba'): y_proba.append(model.predict_proba(X_eval))
+            if not y_true: raise ValueError("评估流为空 (文件行数过少)。")
+            y_test, y_pred = pd.Series(np.concatenate(y_true)), np.concatenate(y_pred)
+            y_pred_proba = np.concatenate(y_proba) if y_proba else None
+            counts['rows_eval'] = len(y_test)
+            with recorder.span("metrics", bootstrap=bootstrap):
+                metrics, metrics_ci = cls._evaluate(y_test, y_pred, y_pred_proba, problem_type, status_signal, bootstrap)
+            importance, importance_names = cls._get_feature_importance(model, features)
+            progress_signal.emit(100)
+
+        status_signal.emit("处理完成.")
+        return {"model": model,
+                "metrics": metrics,
+                "metrics_ci": metrics_ci,
+                "feature_importance": importance,
+                "feature_names": importance_names,
+                "X_test_processed": X_preview,
+                "y_test": y_test,
+                "y_pred": y_pred,
+                "y_pred_proba": y_pred_proba,
+                "model_type": problem_type,
+                "label_mapping": classes,
+                "cv_results": None,
+                "preprocessor": model_preprocessor,
+                "input_feature_names": inputs,
+                "boosting": boosting,
+                "incremental": {'source': source[0], 'chunk_rows': chunk_rows, 'epochs': epochs, 'curve': curve, 'metric': metric, **counts},
+                "profile": {'spans': recorder.ordered(), **capture}
+                }
+
+    @classmethod
+    def _search_model_thread(cls, progress_signal, status_signal, df, features, target, algo_name, base_params, space, settings,
+                             use_cv, cv_folds, raw_df=None, preprocessor=None, profile_mode=None, native_categorical=False, bootstrap=0):
+        """ Hyperparameter search, then a normal training run (_train_model_thread) with the best configuration.
+            Trials are scored on a validation part of the training rows, so the final test rows stay unseen.
+            `settings`: method (SEARCH_METHODS value), n_trials, time_budget (seconds, 0 = none) and cores. """
+        from sklearn.base import clone
+        from sklearn.model_selection import train_test_split
+        search_start = time.perf_counter()
+        deadline = search_start + settings['time_budget'] if settings['time_budget'] else None
+        status_signal.emit("准备搜索数据...")
+        X, y, problem_type, _, model_preprocessor, _, search_features = cls._prepare_training_data(
+            status_signal, df, features, target, raw_df, preprocessor, native_categorical, algo_name in SPARSE_INPUT_ALGORITHMS)
+
+        def split(X, y, test_size, seed):
+            stratify = y if problem_type == 'classification' and y.nunique() > 1 else None
+            try: return train_test_split(X, y, test_size=test_size, random_state=seed, stratify=stratify)
+            except ValueError: return train_test_split(X, y, test_size=test_size, random_state=seed)
+        X_train, _, y_train, _ = split(X, y, 0.25, 42) # Same split as the final run
+        X_fit, X_val, y_fit, y_val = split(X_train, y_train, SEARCH_VALIDATION_FRACTION, 7)
+        if model_preprocessor is not None:
+            status_signal.emit("拟合搜索用预处理流水线...")
+            search_preprocessor = clone(model_preprocessor)
+            X_fit = model_input.select_features(search_preprocessor.fit_transform(X_fit), search_features, search_preprocessor)
+            X_val = model_input.select_features(search_preprocessor.transform(X_val), search_features, search_preprocessor)
+
+        method = settings['method']
+        configs = search_configs(space, 'grid' if method == 'grid' else 'random', settings['n_trials'])
+        brackets = halving_brackets(method, len(configs), X_fit.shape[0])
+        estimator = cls._instantiate_model(algo_name, problem_type, base_params, status_signal)
+        if estimator is None: raise ValueError("模型初始化失败.")
+        total = sum(n for bracket in brackets for n, _ in bracket)
+        status_signal.emit(f"{len(configs)} 个候选配置, 共 {total} 次试验 ({X_fit.shape[0]:,} 训练行 / {X_val.shape[0]:,} 验证行)...")
+
+        # Trials get their own token, set on cancel or at the deadline, so running fits stop too (not just queued ones)
+        job_token, trial_token, stop_watch = current_cancel_token(), CancelToken(), threading.Event()
+        def watch_budget():
+            while not stop_watch.wait(0.2):
+                if (job_token is not None and job_token.is_set()) or (deadline is not None and time.perf_counter() > deadline):
+                    trial_token.set(); return
+        watcher = threading.Thread(target=watch_budget, daemon=True); watcher.start()
+        try:
+            board, done, out_of_time = cls._run_search_brackets(status_signal, _ProgressRange(progress_signal, 0, 80), brackets, configs,
+                                                                estimator, base_params, settings['cores'], (X_fit, y_fit, X_val, y_val), trial_token)
+        finally:
+            stop_watch.set(); watcher.join(); trial_token.discard()
+        if out_of_time: status_signal.emit("已达到时间预算，停止搜索。")
+
+        scored = [e for e in board.values() if e['score'] is not None]
+        if not scored:
+            errors = [e['error'] for e in board.values() if e['error']]
+            if out_of_time: raise RuntimeError("时间预算内没有完成任何试验，请增加时间预算。")
+            raise RuntimeError("超参数搜索没有成功的试验" + (f": {errors[0]}" if errors else ""))
+        leaderboard = sorted(board.values(), key=lambda e: (e['score'] is not None, e['rows'], e['score'] or 0.0), reverse=True)
+        best, search_seconds = leaderboard[0], time.perf_counter() - search_start
+        status_signal.emit(f"最佳配置: 试验 #{best['trial']} (验证得分 {best['score']:.4f}), 使用全部训练数据重新训练...")
+
+        results = cls._train_model_thread(_ProgressRange(progress_signal, 80, 100), status_signal, df, features, target, algo_name,
+                                          {**base_params, **search_trial_params(best['params'], base_params)}, use_cv, cv_folds,
+                                          raw_df, preprocessor, profile_mode, native_categorical, bootstrap)
+        results["search"] = {'method': method, 'metric': 'Accuracy' if problem_type == 'classification' else 'R²',
+                             'params': list(space), 'leaderboard': leaderboard, 'best_trial': best['trial'],
+                             'n_configs': len(configs), 'n_trials': done, 'out_of_time': out_of_time,
+                             'seconds': search_seconds}
+        return results
+
+    @classmethod
+    def _compare_models_thread(cls, progress_signal, status_signal, df, features, target, algorithms, cores=None,
+                               raw_df=None, preprocessor=None, profile_mode=None, native_categorical=False, bootstrap=0):
+        """ Multi-model comparison. Data preparation, the train/test split and the preprocessing fit run once;
+            the `algorithms` ({name: params}) are then fitted concurrently on a loky pool with `cores` split
+            between them (split_core_budget), and each is timed predicting the test rows, one at a time so the
+            latencies do not compete for cores. The best model by Accuracy / R² becomes the result (same keys as
+            _train_model_thread) and results["comparison"] holds the leaderboard: metrics, fit seconds,
+            inference latency and pickled model size per algorithm. """
+        from sklearn.model_selection import train_test_split
+        recorder, capture = SpanRecorder(), {}
+        job_start = time.perf_counter()
+        with profile_capture(profile_mode, capture), recorder.span("compare job", algorithms=len(algorithms), rows=len(df)):
+            status_signal.emit("准备数据 (所有算法共用)..."); progress_signal.emit(2)
+            with recorder.span("prepare data"):
+                X, y, problem_type, label_mapping, model_preprocessor, input_features, features = cls._prepare_training_data(
+                    status_signal, df, features, target, raw_df, preprocessor, native_categorical,
+                    all(algo in SPARSE_INPUT_ALGORITHMS for algo in algorithms))
+            status_signal.emit("拆分训练/测试数据...")
+            with recorder.span("train_test_split"):
+                stratify = y if problem_type == 'classification' and y.nunique() > 1 else None
+                try: X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.25, random_state=42, stratify=stratify)
+                except ValueError as e:
+                    status_signal.emit(f"警告: 分层拆分失败 ({e})，使用非分层拆分。")
+                    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.25, random_state=42)
+            if model_preprocessor is not None:
+                status_signal.emit("在训练集上拟合预处理流水线...")
+                with recorder.span("preprocess (fit on train)"):
+                    X_train = model_input.select_features(model_preprocessor.fit_transform(X_train), features, model_preprocessor)
+                with recorder.span("preprocess (test)"):
+                    X_test = model_input.select_features(model_preprocessor.transform(X_test), features, model_preprocessor)
+            prepare_seconds = time.perf_counter() - job_start
+            progress_signal.emit(10)
+
+            estimators, n_jobs = {}, {}
+            for algo, params in algorithms.items():
+                estimators[algo] = cls._instantiate_model(algo, problem_type, params, status_signal)
+                if estimators[algo] is None: raise ValueError(f"模型初始化失败: {algo}")
+            outer, threads = split_core_budget(len(estimators), cores)
+            for algo, est in estimators.items():
+                if 'n_jobs' in est.get_params(): n_jobs[algo] = est.get_params()['n_jobs']; est.set_params(n_jobs=threads)
+            status_signal.emit(f"并行训练 {len(estimators)} 个模型 ({outer} 进程 x {threads} 线程, {X_train.shape[0]:,} 训练行)...")
+            board = {algo: {'algorithm': algo, 'metrics': {}, 'fit_seconds': None, 'predict_seconds': None, 'latency_us': None,
+                            'size_bytes': None, 'error': None} for algo in estimators}
+            fitted, fit_progress = {}, _ProgressRange(progress_signal, 10, 80)
+            with recorder.span("fit (concurrent)", models=len(estimators), processes=outer, threads=threads), \
+                 joblib.parallel_config(backend='loky', inner_max_num_threads=threads):
+                tasks = joblib.Parallel(n_jobs=outer, return_as='generator_unordered')(
+                    joblib.delayed(_compare_fit_model)(algo, est, X_train, y_train, current_cancel_token()) for algo, est in estimators.items())
+                try:
+                    for result in tasks:
+                        check_cancelled()
+                        algo = result['algorithm']
+                        board[algo].update(fit_seconds=result['fit_seconds'], error=result['error'])
+                        if result['model'] is not None: fitted[algo] = result['model']
+                        status_signal.emit(f"{algo}: " + (f"训练完成 ({result['fit_seconds']:.1f}s)" if result['error'] is None else f"失败 - {result['error']}"))
+                        fit_progress.emit(100 * sum(e['fit_seconds'] is not None for e in board.values()) // len(board))
+                finally:
+                    tasks.close() # Abort fits not yet started (cancel / error)
+            if not fitted:
+                raise RuntimeError("所有算法都训练失败: " + "; ".join(f"{e['algorithm']}: {e['error']}" for e in board.values()))
+
+            outputs, eval_progress = {}, _ProgressRange(progress_signal, 80, 95)
+            for i, (algo, model) in enumerate(fitted.items()):
+                check_cancelled()
+                if algo in n_jobs: model.set_params(n_jobs=n_jobs[algo]) # Predict (and save) with the usual thread count
+                status_signal.emit(f"{algo}: 在测试集上预测与评估...")
+                with recorder.span("evaluate", algorithm=algo, rows=X_test.shape[0]):
+                    start = time.perf_counter()
+                    y_pred = model.predict(X_test)
+                    predict_seconds = time.perf_counter() - start
+                    y_pred_proba = None
+                    if problem_type == 'classification' and hasattr(model, "predict_proba"):
+                        try: y_pred_proba = model.predict_proba(X_test)
+                        except Exception as e: status_signal.emit(f"警告: {algo} 获取预测概率失败 - {e}")
+                    metrics, metrics_ci = cls._evaluate(y_test, y_pred, y_pred_proba, problem_type, status_signal, bootstrap)
+                board[algo].update(metrics=metrics, predict_seconds=predict_seconds, latency_us=1e6 * predict_seconds / max(X_test.shape[0], 1),
+                                   size_bytes=len(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL)))
+                outputs[algo] = (y_pred, y_pred_proba, metrics_ci)
+                eval_progress.emit(100 * (i + 1) // len(fitted))
+
+            metric = 'Accuracy' if problem_type == 'classification' else 'R²'
+            def rank_key(entry):
+                score = entry['metrics'].get(metric)
+                return (isinstance(score, float) and not np.isnan(score), score if isinstance(score, float) else 0.0)
+            leaderboard = sorted(board.values(), key=rank_key, reverse=True)
+            best = leaderboard[0]['algorithm']
+            model, (y_pred, y_pred_proba, metrics_ci) = fitted[best], outputs[best]
+            boosting = boosting_summary(model)
+            with recorder.span("feature importance"):
+                importance, importance_names = cls._get_feature_importance(model, features)
+
+        status_signal.emit(f"对比完成, 最佳: {best} ({metric} {board[best]['metrics'].get(metric, float('nan')):.4f})")
+        progress_signal.emit(100)
+        return {"model": model,
+                "metrics": board[best]['metrics'],
+                "metrics_ci": metrics_ci,
                 "feature_importance": importance,
                 "feature_names": importance_names,
                 "X_test_processed": X_test,
@@ -1517,11 +4288,110 @@ class MLClientApp(QMainWindow):
                 "y_pred": y_pred,
                 "y_pred_proba": y_pred_proba,
                 "model_type": problem_type,
-                "label_mapping": label_mapping
+                "label_mapping": label_mapping,
+                "cv_results": None,
+                "preprocessor": model_preprocessor,
+                "input_feature_names": input_features,
+                "boosting": boosting,
+                "comparison": {'metric': metric, 'leaderboard': leaderboard, 'best': best, 'processes': outer, 'threads': threads,
+                               'rows_train': X_train.shape[0], 'rows_test': X_test.shape[0], 'prepare_seconds': prepare_seconds,
+                               'seconds': time.perf_counter() - job_start},
+                "profile": {'spans': recorder.ordered(), **capture}
                 }
 
-    def _instantiate_model(self, algo_name, problem_type, params, status_signal):
+    @classmethod
+    def _run_search_brackets(cls, status_signal, progress_signal, brackets, configs, estimator, base_params, cores, data, trial_token):
+        """ Runs the rungs of every bracket (see halving_brackets) on a loky pool; each rung promotes its best
+            trials to the next. Returns (leaderboard entries by trial, trials run, stopped by the time budget). """
+        from sklearn.base import clone
+        X_fit, y_fit, X_val, y_val = data
+        total = sum(n for bracket in brackets for n, _ in bracket)
+        board, done, out_of_time = {}, 0, False
+        unused = iter(range(len(configs)))
+        for bracket in brackets:
+            trials = list(itertools.islice(unused, bracket[0][0]))
+            for rung, (_, rows) in enumerate(bracket):
+                if not trials: break
+                if trial_token.is_set(): out_of_time = True; break
+                outer, threads = split_core_budget(len(trials), cores)
+                status_signal.emit(f"第 {rung + 1}/{len(bracket)} 轮: {len(trials)} 个配置 x {rows:,} 行 ({outer} 进程 x {threads} 线程)...")
+                estimators = {t: clone(estimator).set_params(**search_trial_params(configs[t], base_params)) for t in trials}
+                for t, est in estimators.items():
+                    if 'n_jobs' in est.get_params(): est.set_params(n_jobs=threads)
+                X_rung, y_rung = head_rows(X_fit, rows), y_fit.iloc[:rows] # Split rows are shuffled: a prefix is a random subsample
+                with joblib.parallel_config(backend='loky', inner_max_num_threads=threads):
+                    tasks = joblib.Parallel(n_jobs=outer, return_as='generator_unordered')(
+                        joblib.delayed(_search_fit_trial)(t, estimators[t], X_rung, y_rung, X_val, y_val, trial_token) for t in trials)
+                    try:
+                        for result in tasks:
+                            check_cancelled()
+                            if result['interrupted']: out_of_time = True; break # Deadline: keep the last finished rung's scores
+                            t = result['trial']; done += 1
+                            entry = board.setdefault(t, {'trial': t + 1, 'params': configs[t], 'fit_seconds': 0.0})
+                            entry.update(score=result['score'], rows=rows, rung=rung + 1, error=result['error'],
+                                         status="失败" if result['error'] else "完成", fit_seconds=entry['fit_seconds'] + result['fit_seconds'])
+                            score_text = f"{result['score']:.4f}" if result['score'] is not None else result['error']
+                            status_signal.emit(f"试验 #{t + 1} ({rows:,} 行): {score_text}")
+                            progress_signal.emit(100 * done // total)
+                    finally:
+                        tasks.close() # Abort trials not yet started (cancel / budget / error)
+                if out_of_time: break
+                ranked = sorted((t for t in trials if t in board and board[t]['rung'] == rung + 1 and board[t]['score'] is not None),
+                                key=lambda t: board[t]['score'], reverse=True)
+                if rung + 1 < len(bracket):
+                    trials = ranked[:bracket[rung + 1][0]]
+                    for t in ranked[len(trials):]: board[t]['status'] = f"淘汰 (第 {rung + 1} 轮)"
+            if out_of_time: break
+        return board, done, out_of_time
+
+    @classmethod
+    def _run_cross_validation(cls, progress_signal, status_signal, X, y, algo_name, problem_type, params, cv_folds,
+                              preprocessor=None, features=None):
+        """ K-fold CV with folds fitted in parallel on a loky process pool.
+            Cores are split between concurrent folds and each estimator's own n_jobs.
+            With a `preprocessor` (unfitted), X is raw data and each fold fits its own copy on its training rows. """
+        from sklearn.model_selection import KFold, StratifiedKFold
+        stratify = problem_type == 'classification' and y.nunique() > 1 and y.value_counts().min() >= cv_folds
+        splitter = (StratifiedKFold if stratify else KFold)(n_splits=cv_folds, shuffle=True, random_state=42)
+        status_signal.emit(f"准备 {cv_folds}-折{'分层' if stratify else ''}交叉验证...")
+        progress_signal.emit(0)
+
+        fold_jobs, threads_per_fold = split_core_budget(cv_folds)
+        estimator = cls._instantiate_model(algo_name, problem_type, params, status_signal)
+        if estimator is None: raise ValueError("模型初始化失败.")
+        if 'n_jobs' in estimator.get_params(): estimator.set_params(n_jobs=threads_per_fold)
+
+        status_signal.emit(f"并行训练 {cv_folds} 折 ({fold_jobs} 进程 x {threads_per_fold} 线程)...")
+        want_proba = problem_type == 'classification'
+        folds = []
+        with joblib.parallel_config(backend='loky', inner_max_num_threads=threads_per_fold):
+            tasks = joblib.Parallel(n_jobs=fold_jobs, return_as='generator_unordered')(
+                joblib.delayed(_cv_fit_fold)(i + 1, estimator, X, y, train_idx, test_idx, want_proba, current_cancel_token(), preprocessor, features)
+                for i, (train_idx, test_idx) in enumerate(splitter.split(X, y if stratify else None)))
+            try:
+                for fold in tasks:
+                    check_cancelled()
+                    fold['metrics'] = cls._calculate_metrics(fold['y_true'], fold['y_pred'], fold['y_proba'], problem_type, status_signal)
+                    del fold['y_true'], fold['y_pred'], fold['y_proba']
+                    folds.append(fold)
+                    status_signal.emit(f"完成第 {fold['fold']} 折 ({len(folds)}/{cv_folds}), 耗时 {fold['fit_seconds']:.1f}s")
+                    progress_signal.emit(100 * len(folds) // cv_folds)
+            finally:
+                tasks.close() # Abort folds not yet started (cancel / error)
+
+        folds.sort(key=lambda f: f['fold'])
+        summary = {}
+        for key in folds[0]['metrics']:
+            values = [f['metrics'].get(key) for f in folds]
+            if all(isinstance(v, (int, float, np.number)) and not isinstance(v, bool) for v in values):
+                summary[key] = (float(np.mean(values)), float(np.std(values)))
+        return {'n_folds': cv_folds, 'stratified': stratify, 'folds': folds, 'summary': summary}
+
+    @classmethod
+    def _instantiate_model(cls, algo_name, problem_type, params, status_signal):
         """ Helper to instantiate the correct model based on name and type """
+        from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+        from sklearn.neural_network import MLPClassifier, MLPRegressor
         status_signal.emit(f"初始化模型: {algo_name}...")
         model = None
         base_params = {'random_state': 42}
@@ -1534,13 +4404,21 @@ class MLClientApp(QMainWindow):
                  mlp_params = {k: v for k, v in params.items() if k in ['hidden_layer_sizes', 'activation', 'solver', 'alpha', 'max_iter']}
                  model_params = {**base_params, **mlp_params, 'early_stopping': True, 'n_iter_no_change': 10}
                  model = MLPClassifier(**model_params) if problem_type == 'classification' else MLPRegressor(**model_params)
+            elif algo_name == "SGD 线性模型":
+                 from sklearn.linear_model import SGDClassifier, SGDRegressor
+                 sgd_params = {k: v for k, v in params.items() if k in ['penalty', 'alpha', 'max_iter']}
+                 model_params = {**base_params, **sgd_params, 'tol': 1e-3}
+                 model = SGDClassifier(loss='log_loss', **model_params) if problem_type == 'classification' else SGDRegressor(**model_params)
             elif algo_name == "LightGBM" and lgb:
                  lgbm_params = {k: v for k, v in params.items() if k in ['n_estimators', 'learning_rate', 'max_depth', 'num_leaves']}
+                 if params.get('early_stopping_rounds'): lgbm_params['early_stopping_round'] = params['early_stopping_rounds']
                  model_params = {**base_params, **lgbm_params, 'n_jobs': -1}
                  model = lgb.LGBMClassifier(**model_params) if problem_type == 'classification' else lgb.LGBMRegressor(**model_params)
             elif algo_name == "XGBoost" and xgb:
                  xgb_params = {k: v for k, v in params.items() if k in ['n_estimators', 'learning_rate', 'eta', 'max_depth', 'subsample', 'colsample_bytree']}
-                 model_params = {**base_params, **xgb_params, 'use_label_encoder': False, 'eval_metric': 'logloss' if problem_type=='classification' else 'rmse'}
+                 if params.get('early_stopping_rounds'): xgb_params['early_stopping_rounds'] = params['early_stopping_rounds']
+                 model_params = {**base_params, **xgb_params, 'use_label_encoder': False, 'eval_metric': 'logloss' if problem_type=='classification' else 'rmse',
+                                 'enable_categorical': True, 'tree_method': 'hist'} # Category-dtype columns split natively
 
                  if problem_type == 'classification':
                       objective = 'binary:logistic'
@@ -1559,57 +4437,32 @@ class MLClientApp(QMainWindow):
              print(f"Model instantiation error:\n{traceback.format_exc()}")
              return None
 
-    def _calculate_metrics(self, y_true, y_pred, y_pred_proba, problem_type, status_signal):
+    @classmethod
+    def _calculate_metrics(cls, y_true, y_pred, y_pred_proba, problem_type, status_signal):
         """ Calculates evaluation metrics based on problem type. """
-        metrics = {}
-        try:
-            if problem_type == 'classification':
-                metrics['Accuracy'] = accuracy_score(y_true, y_pred)
-                n_classes = pd.Series(y_true).nunique() # Use pandas nunique on Series
-                avg_strat = 'binary' if n_classes <= 2 else 'weighted'
-                metrics['Precision'] = precision_score(y_true, y_pred, average=avg_strat, zero_division=0)
-                metrics['Recall'] = recall_score(y_true, y_pred, average=avg_strat, zero_division=0)
-                metrics['F1-Score'] = f1_score(y_true, y_pred, average=avg_strat, zero_division=0)
-
-                if y_pred_proba is not None:
-                    try:
-                        if n_classes == 2:
-                            if y_pred_proba.ndim == 2 and y_pred_proba.shape[1] >= 2:
-                                metrics['AUC'] = roc_auc_score(y_true, y_pred_proba[:, 1])
-                            else: metrics['AUC'] = 'N/A (Proba shape)'
-                        elif n_classes > 2:
-                             # Check if y_true has labels for all classes in y_pred_proba for OvR
-                             present_classes = np.unique(y_true)
-                             if len(present_classes) < n_classes:
-                                 metrics['AUC (OvR)'] = f'N/A ({len(present_classes)}/{n_classes} cls present)'
-                             elif y_pred_proba.ndim == 2 and y_pred_proba.shape[1] == n_classes:
-                                metrics['AUC (OvR)'] = roc_auc_score(y_true, y_pred_proba, multi_class='ovr', average='weighted', labels=np.arange(n_classes))
-                             else: metrics['AUC (OvR)'] = 'N/A (Proba shape)'
-                    except ValueError as auc_error:
-                         metrics['AUC'] = f"N/A ({auc_error})"
-                         status_signal.emit(f"警告: 计算 AUC 失败 - {auc_error}")
-                else:
-                    metrics['AUC'] = 'N/A (No probabilities)'
-
-            else: # Regression
-                metrics['R²'] = r2_score(y_true, y_pred)
-                metrics['MAE'] = mean_absolute_error(y_true, y_pred)
-                metrics['MSE'] = mean_squared_error(y_true, y_pred)
-                metrics['RMSE'] = np.sqrt(metrics['MSE'])
-
-            try:
-                corr, p_value = spearmanr(y_true, y_pred)
-                metrics['Spearman Rho'] = corr if not np.isnan(corr) else 'N/A'
-            except ValueError:
-                 metrics['Spearman Rho'] = 'N/A (Calc error)'
+        return cls._evaluate(y_true, y_pred, y_pred_proba, problem_type, status_signal)[0]
 
+    @classmethod
+    def _evaluate(cls, y_true, y_pred, y_pred_proba, problem_type, status_signal, bootstrap=0):
+        """ (metrics, confidence intervals or None): all metrics from one MetricsEngine, plus `bootstrap`
+            resamples of them when > 0. """
+        metrics, intervals = {}, None
+        try:
+            engine = MetricsEngine(y_true, y_pred, y_pred_proba, problem_type)
+            metrics = engine.compute()
+            if bootstrap:
+                status_signal.emit(f"自助法置信区间 ({bootstrap} 次重采样)...")
+                intervals = engine.bootstrap(metrics, bootstrap)
+        except OperationCancelled:
+            raise
         except Exception as e:
             status_signal.emit(f"错误: 计算指标失败 - {e}")
             print(f"Metrics calculation error:\n{traceback.format_exc()}")
-        return metrics
+        return metrics, intervals
 
 
-    def _get_feature_importance(self, model, feature_names):
+    @classmethod
+    def _get_feature_importance(cls, model, feature_names):
         """ Extracts feature importance if available from the model. """
         importances = None
         names = list(feature_names)
@@ -1641,13 +4494,24 @@ class MLClientApp(QMainWindow):
         self.trained_feature_names = results["feature_names"]
         y_pred_proba = results.get("y_pred_proba") # Still needed for AUC metric
         label_mapping = results.get("label_mapping")
+        self.model_preprocessor = results.get("preprocessor")
+        self.input_feature_names = results.get("input_feature_names")
+        self.label_mapping = list(label_mapping) if label_mapping is not None else None
 
         self.status_bar.showMessage("训练成功!", 5000)
 
         # Display results (Plots are removed)
         self.display_predictions(label_mapping)
-        self.display_metrics(results["metrics"])
+        self.display_metrics(results["metrics"], results.get("cv_results"), results.get("boosting"), results.get("incremental"), results.get("metrics_ci"))
         self.display_feature_importance(results["feature_importance"], self.trained_feature_names)
+        self.display_learning_curve(results.get("boosting"), results.get("incremental"))
+        self.last_profile = results.get("profile")
+        if hasattr(self, 'profile_display'): self.display_profile_report()
+        self.last_search = results.get("search")
+        if hasattr(self, 'search_model'): self.display_search_leaderboard()
+        self.last_comparison = results.get("comparison")
+        if hasattr(self, 'compare_model'): self.display_comparison_leaderboard()
+        if self.last_comparison and hasattr(self, 'tab_compare'): self.results_tabs.setCurrentWidget(self.tab_compare)
 
         # No CM/ROC plots to display or clear
 
@@ -1684,8 +4548,10 @@ class MLClientApp(QMainWindow):
             if hasattr(self, 'prediction_model'): self.prediction_model.update_dataframe(None)
             return
 
-        limit = min(MAX_PREVIEW_ROWS, len(self.X_test_data_processed))
-        df_display = self.X_test_data_processed.head(limit).copy()
+        limit = min(MAX_PREVIEW_ROWS, self.X_test_data_processed.shape[0])
+        df_display = head_rows(self.X_test_data_processed, limit)
+        if hasattr(df_display, 'tocsr'): df_display = pd.DataFrame(df_display.toarray(), columns=self.trained_feature_names, index=self.y_test_data.index[:limit])
+        else: df_display = df_display.copy()
 
         actual_encoded = self.y_test_data[:limit]
         pred_encoded = self.predictions[:limit]
@@ -1716,7 +4582,7 @@ class MLClientApp(QMainWindow):
                  try: self.predictions_table.resizeColumnsToContents()
                  except Exception as e: print(f"Warn: Resize prediction table failed: {e}")
 
-    def display_metrics(self, metrics):
+    def display_metrics(self, metrics, cv_results=None, boosting=None, incremental=None, metrics_ci=None):
         if not hasattr(self, 'metrics_display'): return
         if not metrics: self.metrics_display.setText("无可用评估指标。"); return
 
@@ -1724,20 +4590,102 @@ class MLClientApp(QMainWindow):
         problem_type_str = self.model_type or 'N/A'
 
         txt = f"模型: {model_name}\n类型: {problem_type_str}\n"
-        txt += "="*40 + "\n  评估指标 (测试集)\n" + "="*40 + "\n"
+        intervals = metrics_ci['intervals'] if metrics_ci else {}
+        ci_text = f"; [ ] 为 {metrics_ci['confidence']:.0%} 置信区间, {metrics_ci['resamples']} 次自助重采样" if intervals else ""
+        txt += "="*40 + f"\n  评估指标 (测试集{ci_text})\n" + "="*40 + "\n"
         for key, value in metrics.items():
             try:
-                if isinstance(value, (float, np.floating)):
+                if isinstance(value, (float, np.floating)) and key in intervals:
+                    txt += f"{key:<25}: {value:.4f}  [{intervals[key][0]:.4f}, {intervals[key][1]:.4f}]\n"
+                elif isinstance(value, (float, np.floating)):
                     txt += f"{key:<25}: {value:.4f}\n"
                 else:
                     txt += f"{key:<25}: {str(value)}\n"
             except Exception as format_exc:
                  txt += f"{key:<25}: Error ({format_exc})\n"
         txt += "="*40 + "\n"
+
+        if cv_results and cv_results.get('folds'):
+            kind = "分层" if cv_results.get('stratified') else ""
+            txt += f"\n" + "="*40 + f"\n  {cv_results['n_folds']}-折{kind}交叉验证 (均值 ± 标准差)\n" + "="*40 + "\n"
+            for key, (mean, std) in cv_results['summary'].items():
+                txt += f"{key:<25}: {mean:.4f} ± {std:.4f}\n"
+            txt += "-"*40 + "\n"
+            for fold in cv_results['folds']:
+                scores = ", ".join(f"{k}={v:.4f}" for k, v in fold['metrics'].items() if k in cv_results['summary'])
+                txt += f"第 {fold['fold']:>2} 折 ({fold['fit_seconds']:.1f}s): {scores}\n"
+            txt += "="*40 + "\n"
+
+        if boosting:
+            txt += "\n" + "="*40 + f"\n  早停 (验证集: {BOOSTING_VALIDATION_FRACTION:.0%} 训练数据)\n" + "="*40 + "\n"
+            txt += f"{'最佳迭代':<21}: {boosting['best_iteration']}\n" # CJK labels are two columns wide
+            txt += f"{'实际训练轮数':<19}: {boosting['rounds_trained']} / {boosting['n_estimators']}\n"
+            txt += f"{'验证 ' + boosting['metric']:<23}: {boosting['curve'][boosting['best_iteration'] - 1]:.4f}\n"
+            txt += "="*40 + "\n"
+
+        if incremental:
+            txt += "\n" + "="*40 + f"\n  增量训练 ({'本地缓存' if incremental['source'] == 'feather' else 'CSV'}, 每块 {incremental['chunk_rows']:,} 行)\n" + "="*40 + "\n"
+            txt += f"{'训练行 / 评估行':<20}: {incremental['rows_train']:,} / {incremental['rows_eval']:,}\n" # Metrics above: whole evaluation stream
+            txt += f"{'数据块 x 遍数':<21}: {incremental['chunks']} x {incremental['epochs']}\n"
+            if incremental['rows_skipped']: txt += f"{'跳过 (目标缺失)':<20}: {incremental['rows_skipped']:,} 行\n"
+            if incremental['chunks_skipped']: txt += f"{'跳过的数据块':<19}: {incremental['chunks_skipped']} (缺少部分类别)\n"
+            txt += "="*40 + "\n"
         self.metrics_display.setText(txt)
 
+    def _ensure_importance_canvas(self):
+        """ Creates the matplotlib figure on first use, so matplotlib is not imported at startup. """
+        if hasattr(self, 'importance_canvas'): return
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg as FigureCanvas
+        self._apply_plot_style()
+        self.importance_figure = Figure(figsize=(7, 5), dpi=100) # Adjusted size
+        self.importance_canvas = FigureCanvas(self.importance_figure)
+        self.importance_layout.takeAt(1) # Placeholder stretch
+        self.importance_layout.addWidget(self.importance_canvas)
+
+    def _ensure_curve_canvas(self):
+        """ Learning-curve figure, created on first use like the importance plot. """
+        if hasattr(self, 'curve_canvas'): return
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg as FigureCanvas
+        self._apply_plot_style()
+        self.curve_figure = Figure(figsize=(7, 5), dpi=100)
+        self.curve_canvas = FigureCanvas(self.curve_figure)
+        self.curve_layout.takeAt(1) # Placeholder stretch
+        self.curve_layout.addWidget(self.curve_canvas)
+
+    def display_learning_curve(self, boosting, incremental=None):
+        if not hasattr(self, 'curve_layout'): return
+        self._ensure_curve_canvas()
+        self.curve_figure.clear()
+        ax = self.curve_figure.add_subplot(111)
+        if not boosting and incremental and incremental['curve']:
+            rows, scores = zip(*incremental['curve'])
+            ax.plot(rows, scores, marker='.', label=f"各块留出行 {incremental['metric']}")
+            ax.set_xlabel('已训练行数'); ax.set_ylabel(incremental['metric']); ax.legend()
+            ax.set_title("学习曲线 (增量训练评估流)")
+            self.curve_figure.tight_layout()
+        elif not boosting:
+            ax.text(0.5, 0.5, "学习曲线仅在 LightGBM / XGBoost 启用早停或增量训练时可用",
+                    ha='center', va='center', transform=ax.transAxes, fontsize=10, wrap=True)
+        else:
+            rounds = np.arange(1, len(boosting['curve']) + 1)
+            ax.plot(rounds, boosting['curve'], label=f"验证 {boosting['metric']}")
+            ax.axvline(boosting['best_iteration'], color='tab:red', linestyle='--', label=f"最佳迭代 {boosting['best_iteration']}")
+            ax.set_xlabel('迭代轮数'); ax.set_ylabel(boosting['metric']); ax.legend()
+            ax.set_title(f"学习曲线 (早停耐心 {boosting['patience']} 轮)")
+            self.curve_figure.tight_layout()
+        self.curve_canvas.draw_idle()
+
+    def _apply_plot_style(self):
+        """ Matplotlib style for the current theme; nothing to do until matplotlib has been imported. """
+        if 'matplotlib' not in sys.modules: return
+        import matplotlib.style
+        matplotlib.style.use('dark_background' if self.current_theme == "dark" else 'default')
+
     def display_feature_importance(self, importances, feature_names):
-        if not hasattr(self,'importance_figure') or not hasattr(self,'importance_canvas'): return
+        if not hasattr(self, 'importance_layout'): return
+        self._ensure_importance_canvas()
         self.importance_figure.clear()
         ax = self.importance_figure.add_subplot(111)
 
@@ -1771,6 +4719,91 @@ class MLClientApp(QMainWindow):
 
         self.importance_canvas.draw_idle()
 
+    def display_profile_report(self):
+        """ Fills the 性能报告 tab from self.last_profile. """
+        profile = self.last_profile
+        self.export_trace_button.setEnabled(bool(profile and profile.get('spans')))
+        self.export_profile_button.setEnabled(bool(profile and ('pstats' in profile or 'html' in profile)))
+        if not profile: self.profile_display.setPlainText("训练模型后显示各阶段耗时与内存变化。"); return
+        txt = "训练各阶段耗时 (在作业进程中测量)\n" + "=" * 76 + "\n" + format_span_report(profile['spans']) + "\n"
+        if profile.get('text'):
+            txt += "\n" + "=" * 76 + f"\n{profile['mode']} 剖析结果:\n" + profile['text']
+        self.profile_display.setPlainText(txt)
+
+    def display_search_leaderboard(self):
+        """ Fills the 搜索排行榜 tab from self.last_search; numbers stay numeric so column sorting is by value. """
+        search = self.last_search
+        self.search_model.clear()
+        if not search: self.search_summary_label.setText("未进行超参数搜索。"); return
+        method_name = next((name for name, method in SEARCH_METHODS.items() if method == search['method']), search['method'])
+        self.search_summary_label.setText(
+            f"{method_name}: {search['n_configs']} 个配置, {search['n_trials']} 次试验, 耗时 {search['seconds']:.1f}s"
+            f"{' (已达到时间预算)' if search['out_of_time'] else ''}。验证指标: {search['metric']}。"
+            f"最佳为试验 #{search['best_trial']}, 已用全部训练数据重新训练为当前模型。")
+        self.search_model.setHorizontalHeaderLabels(["排名", "试验", search['metric'], "训练行数", "轮次", "耗时(s)", "状态"] + search['params'])
+        def cell(value):
+            item = QStandardItem()
+            item.setData(value if isinstance(value, (int, float)) and not isinstance(value, bool) else str(value), Qt.ItemDataRole.DisplayRole)
+            return item
+        for rank, entry in enumerate(search['leaderboard'], 1):
+            score = round(entry['score'], 4) if entry['score'] is not None else "-"
+            status = cell(entry['status'])
+            if entry['error']: status.setToolTip(entry['error'])
+            self.search_model.appendRow([cell(rank), cell(entry['trial']), cell(score), cell(entry['rows']), cell(entry['rung']),
+                                         cell(round(entry['fit_seconds'], 2)), status] + [cell(entry['params'].get(p)) for p in search['params']])
+        self.search_table.resizeColumnsToContents()
+
+    def display_comparison_leaderboard(self):
+        """ Fills the 模型对比 tab from self.last_comparison, like the search leaderboard. """
+        comparison = self.last_comparison
+        self.compare_model.clear()
+        if not comparison: self.compare_summary_label.setText("未进行多模型对比。"); return
+        self.compare_summary_label.setText(
+            f"{len(comparison['leaderboard'])} 种算法, 同一拆分 ({comparison['rows_train']:,} 训练行 / {comparison['rows_test']:,} 测试行), "
+            f"{comparison['processes']} 进程 x {comparison['threads']} 线程并行训练; 总耗时 {comparison['seconds']:.1f}s "
+            f"(其中数据准备 {comparison['prepare_seconds']:.1f}s, 只做一次)。按 {comparison['metric']} 排名, "
+            f"最佳 {comparison['best']} 已设为当前模型。推理延迟为单独测量的测试集预测耗时 / 行。")
+        metric_names = list(dict.fromkeys(k for e in comparison['leaderboard'] for k, v in e['metrics'].items() if isinstance(v, (float, np.floating))))
+        self.compare_model.setHorizontalHeaderLabels(["排名", "算法"] + metric_names + ["训练耗时(s)", "推理延迟(µs/行)", "模型大小(MB)", "状态"])
+        def cell(value):
+            item = QStandardItem()
+            item.setData(value if isinstance(value, (int, float)) and not isinstance(value, bool) else str(value), Qt.ItemDataRole.DisplayRole)
+            return item
+        def rounded(value, digits): return round(float(value), digits) if isinstance(value, (int, float, np.number)) else "-"
+        for rank, entry in enumerate(comparison['leaderboard'], 1):
+            status = cell("失败" if entry['error'] else "最佳" if entry['algorithm'] == comparison['best'] else "完成")
+            if entry['error']: status.setToolTip(entry['error'])
+            size_mb = entry['size_bytes'] / 2**20 if entry['size_bytes'] is not None else None
+            self.compare_model.appendRow([cell(rank), cell(entry['algorithm'])] + [cell(rounded(entry['metrics'].get(k), 4)) for k in metric_names]
+                                         + [cell(rounded(entry['fit_seconds'], 2)), cell(rounded(entry['latency_us'], 2)), cell(rounded(size_mb, 3)), status])
+        self.compare_table.resizeColumnsToContents()
+
+    def export_chrome_trace(self):
+        if not (self.last_profile and self.last_profile.get('spans')): return
+        default_name = f"training_trace_{datetime.datetime.now():%Y%m%d_%H%M%S}.json"
+        file_path, _ = QFileDialog.getSaveFileName(self, "导出 Chrome Trace", default_name, "Trace JSON (*.json)")
+        if not file_path: return
+        try:
+            with open(file_path, 'w', encoding='utf-8') as f: json.dump(spans_to_chrome_trace(self.last_profile['spans']), f)
+            self.status_bar.showMessage(f"已导出 (可在 chrome://tracing 或 ui.perfetto.dev 打开): {file_path}", 8000)
+        except OSError as e: QMessageBox.critical(self, "导出失败", f"无法写入文件: {e}")
+
+    def export_profile_data(self):
+        """ Saves the raw profiler output: .prof (cProfile, for snakeviz / pstats) or .html (pyinstrument). """
+        profile = self.last_profile or {}
+        is_html = 'html' in profile
+        if not (is_html or 'pstats' in profile): return
+        default_name = f"training_profile_{datetime.datetime.now():%Y%m%d_%H%M%S}" + (".html" if is_html else ".prof")
+        file_path, _ = QFileDialog.getSaveFileName(self, "导出剖析数据", default_name, "HTML (*.html)" if is_html else "cProfile (*.prof)")
+        if not file_path: return
+        try:
+            if is_html:
+                with open(file_path, 'w', encoding='utf-8') as f: f.write(profile['html'])
+            else:
+                with open(file_path, 'wb') as f: f.write(profile['pstats'])
+            self.status_bar.showMessage(f"剖析数据已导出: {file_path}", 5000)
+        except OSError as e: QMessageBox.critical(self, "导出失败", f"无法写入文件: {e}")
+
     # REMOVED: display_confusion_matrix method
     # REMOVED: display_roc_curve method
 
@@ -1786,17 +4819,11 @@ class MLClientApp(QMainWindow):
         if filePath:
             if not filePath.lower().endswith('.joblib'): filePath += '.joblib'
 
-            data_to_save = {
-                'model': self.model,
-                'trained_feature_names': self.trained_feature_names,
-                'target_name': self.target_col,
-                'model_type': self.model_type,
-                'app_version': VERSION,
-                # 'preprocessor': self.preprocessor # Still missing
-            }
+            data_to_save = self._model_bundle()
             print("--- Saving Model ---")
             print(f"Model: {self.model.__class__.__name__}")
             print(f"Features: {self.trained_feature_names}")
+            print(f"Input columns: {data_to_save['input_feature_names']} (preprocessor: {'yes' if self.model_preprocessor is not None else 'no'})")
             print(f"Target: {self.target_col}")
             print(f"Type: {self.model_type}")
             print("--------------------")
@@ -1804,11 +4831,60 @@ class MLClientApp(QMainWindow):
             try:
                 joblib.dump(data_to_save, filePath, compress=3)
                 self.status_bar.showMessage(f"模型已保存至: {filePath}", 5000)
-                QMessageBox.information(self, "保存成功", f"模型及相关信息已保存到:\n{filePath}\n\n"
-                                        "<b>重要提示:</b> 当前版本未保存预处理步骤。加载此模型后，需确保新数据经过完全相同的预处理。")
+                note = ("已包含在训练集上拟合的预处理流水线，可直接对原始数据评分。" if self.model_preprocessor is not None else
+                        "<b>重要提示:</b> 训练时未使用预处理流水线。加载此模型后，需确保新数据经过完全相同的处理。")
+                QMessageBox.information(self, "保存成功", f"模型及相关信息已保存到:\n{filePath}\n\n{note}")
             except Exception as e:
                 QMessageBox.critical(self, "保存失败", f"保存模型时发生错误: {e}\n\n详细信息:\n{traceback.format_exc()}")
 
+    def _model_bundle(self):
+        """ Everything needed to score new raw data: see model_input.prepare_model_input(). """
+        return {
+            'model': self.model,
+            'trained_feature_names': self.trained_feature_names,
+            'input_feature_names': self.input_feature_names or self.trained_feature_names,
+            'preprocessor': self.model_preprocessor, # ColumnTransformer fitted on the training split, or None
+            'label_mapping': self.label_mapping, # Class index -> original label, or None
+            'target_name': self.target_col,
+            'model_type': self.model_type,
+            'app_version': VERSION,
+        }
+
+    def predict_dataset_dialog(self):
+        """ Scores the loaded (raw) data with the current model and writes it with prediction columns to CSV. """
+        if self.model is None or self.dataframe is None: return
+        bundle = self._model_bundle()
+        # A model with a fitted pipeline scores the raw data; otherwise it needs the columns it was trained on
+        df = self.dataframe
+        if bundle['preprocessor'] is None and self.processed_dataframe is not None: df = self.processed_dataframe
+        missing = [c for c in bundle['input_feature_names'] if c not in df.columns]
+        if missing:
+            QMessageBox.critical(self, "预测失败", f"当前数据缺少模型需要的列:\n{', '.join(missing)}"); return
+
+        base = os.path.splitext(os.path.basename(self.current_file_path or "data"))[0]
+        out_path, _ = QFileDialog.getSaveFileName(self, "导出预测结果", f"{base}_预测.csv", "CSV 文件 (*.csv)")
+        if not out_path: return
+        self.predict_worker = self._create_job(self._predict_thread, df, bundle, out_path, priority=JOB_PRIORITY_PREDICT)
+        self.predict_worker.finished.connect(lambda n: self.status_bar.showMessage(f"已导出 {n:,} 行预测结果至: {out_path}", 8000))
+        self.predict_worker.error.connect(lambda e: QMessageBox.critical(self, "预测失败", f"预测时出错:\n{e[1]}\n\n详细信息:\n{e[2]}"))
+        self.predict_worker.cancelled.connect(lambda: self.status_bar.showMessage("预测已取消.", 5000))
+        self._start_progress("正在预测并导出...", worker=self.predict_worker)
+        self.predict_worker.start()
+
+    @classmethod
+    def _predict_thread(cls, progress_signal, status_signal, df, bundle, out_path):
+        """ Applies the model bundle chunk by chunk (one vectorized transform + predict per chunk, see
+            model_input.score_frame) and appends to CSV. """
+        n_rows = len(df)
+        for start in range(0, max(n_rows, 1), PREDICT_CHUNK_ROWS):
+            check_cancelled()
+            out = model_input.score_frame(df.iloc[start:start + PREDICT_CHUNK_ROWS], bundle)
+            out.to_csv(out_path, mode='w' if start == 0 else 'a', header=start == 0, index=False)
+            done = min(start + PREDICT_CHUNK_ROWS, n_rows)
+            status_signal.emit(f"已预测 {done:,}/{n_rows:,} 行...")
+            progress_signal.emit(100 * done // max(n_rows, 1))
+        return n_rows
+
     def load_model_dialog(self):
         filePath, _ = QFileDialog.getOpenFileName(self, "加载模型文件", "", "Joblib 模型文件 (*.joblib);;All Files (*)")
         if filePath:
@@ -1823,13 +4899,16 @@ class MLClientApp(QMainWindow):
                 if loaded_version != VERSION:
                      QMessageBox.warning(self, "版本不匹配", f"模型由不同版本的应用 ({loaded_version}) 保存。\n加载可能成功，但行为可能不完全一致。")
 
-                if 'preprocessor' not in loaded_data:
+                if loaded_data.get('preprocessor') is None:
                      QMessageBox.warning(self, "预处理警告", "加载的模型文件不包含预处理步骤信息。\n请确保当前使用的数据已经过与训练时 *完全相同* 的预处理，否则预测结果将不可靠。")
 
                 self._reset_model_state_full()
 
                 self.model = loaded_data['model']
                 self.trained_feature_names = loaded_data.get('trained_feature_names')
+                self.model_preprocessor = loaded_data.get('preprocessor')
+                self.input_feature_names = loaded_data.get('input_feature_names') or self.trained_feature_names
+                self.label_mapping = loaded_data.get('label_mapping')
                 loaded_target = loaded_data.get('target_name')
                 self.model_type = loaded_data.get('model_type')
 
@@ -1847,7 +4926,8 @@ class MLClientApp(QMainWindow):
                          self.target_col = loaded_target
                     if self.trained_feature_names:
                          self.feature_cols = [f for f in self.trained_feature_names if f in self.dataframe.columns]
-                         missing_loaded_feats = [f for f in self.trained_feature_names if f not in self.dataframe.columns]
+                         required = self.input_feature_names if self.model_preprocessor is not None else self.trained_feature_names
+                         missing_loaded_feats = [f for f in required if f not in self.dataframe.columns]
                          if missing_loaded_feats:
                              QMessageBox.warning(self, "特征缺失", f"当前加载的数据缺少模型训练时使用的部分特征:\n{', '.join(missing_loaded_feats)}\n请确保数据包含所有必需列或重新加载/预处理数据。")
                     self.update_config_lists()
@@ -1880,7 +4960,20 @@ if __name__ == '__main__':
     # import os
     # os.environ['QT_QPA_PLATFORM'] = 'xcb'
 
-    app = QApplication(sys.argv)
+    multiprocessing.freeze_support() # Child fit processes / loky workers in the frozen EXE
+
+    parser = argparse.ArgumentParser(description=f"{APP_NAME} v{VERSION}")
+    parser.add_argument("--startup-report", nargs='?', const="", metavar="JSON",
+                        help="print startup phase / deferred import timings to stderr (and write them as JSON)")
+    parser.add_argument("--exit-after-startup", action="store_true", help="close once the background imports are done (benchmarks)")
+    cli_args, qt_args = parser.parse_known_args()
+    mark_startup("imports")
+
+    app = QApplication(sys.argv[:1] + qt_args)
+    mark_startup("QApplication")
     window = MLClientApp()
+    window._print_startup_report = cli_args.startup_report is not None; window.startup_report_path = cli_args.startup_report or None
+    window.exit_after_startup = cli_args.exit_after_startup
+    mark_startup("main window")
     window.show()
     sys.exit(app.exec())
\ No newline at end of file